@@ -0,0 +1,1020 @@
+"""
+性能基准测试 - 手势控制粒子游戏热点路径
+用法:
+    python benchmark.py                          运行全部基准
+    python benchmark.py noise                    只运行指定分组
+    python benchmark.py --save baseline.json     保存结果作为基线
+    python benchmark.py --compare baseline.json  与基线对比，变慢超过阈值时返回非零退出码
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from particle_game import (AdaptiveHandTracker, BarnesHutTree, Config, EffectParticlePool, FrameBufferPool,
+                           GameManager, GestureAnalyzer, GestureFilter, HandGestureDetector, HandRegionOfInterest,
+                           HandTrackingWorker, LandmarkRecorder, LandmarkReplay, Monster, MonsterSwarmStage, MotionBlurBuffer, NoiseField,
+                           ParallelParticleSystem, ParticleRenderer, ParticleSystem, mp_hands_module, numba,
+                           prepare_inference_frame, run_headless)
+
+# 本次运行的全部结果（名称 -> 毫秒），用于保存基线和对比
+RESULTS: Dict[str, float] = {}
+# 超出误差界或内存预算的检查项，非空时以非零退出码结束
+CHECK_FAILURES: List[str] = []
+
+
+def measure(func: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> float:
+    """测量单次调用耗时（毫秒），取多轮中的最小值
+
+    Args:
+        func: 被测函数
+        repeat: 测量轮数
+        min_time: 每轮至少运行的秒数（自动决定调用次数）
+    """
+    func()  # 预热
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1000.0
+
+
+def report(name: str, ms: float, extra: str = ""):
+    """打印一行基准结果并记录"""
+    RESULTS[name] = ms
+    print(f"  {name:<44s} {ms:10.3f} ms  {extra}")
+
+
+def check_parity(name: str, error: float, bound: float):
+    """打印一致性误差，超出误差界时记录"""
+    passed = error <= bound
+    if not passed:
+        CHECK_FAILURES.append(name)
+    print(f"  一致性 {name}: {error:.2e}（误差界 {bound:.0e}）{'' if passed else '  超出误差界!'}")
+
+
+def check_equal(name: str, value, expected):
+    """打印检查值，与期望值不一致时记录"""
+    passed = value == expected
+    if not passed:
+        CHECK_FAILURES.append(name)
+    print(f"  检查 {name}: {value}（期望 {expected}）{'' if passed else '  不一致!'}")
+
+
+def check_budget(name: str, nbytes: int, budget: int):
+    """打印内存占用，超出预算时记录"""
+    passed = nbytes <= budget
+    if not passed:
+        CHECK_FAILURES.append(name)
+    print(f"  内存 {name}: {nbytes / 1e6:.2f} MB（预算 {budget / 1e6:.0f} MB）{'' if passed else '  超出预算!'}")
+
+
+def skip(reason: str):
+    """打印跳过原因"""
+    print(f"  跳过: {reason}")
+
+
+def bench_noise():
+    """噪声场：逐粒子标量调用 vs 整组数组求值 vs 查找表双线性采样"""
+    analytic = NoiseField(use_lut=False)
+    lut = NoiseField(use_lut=True)
+    rng = np.random.default_rng(0)
+
+    for n in (500, 5000, 20000, 100000):
+        x = rng.uniform(0, 1100, n)
+        y = rng.uniform(0, 1100, n)
+        if n <= 5000:
+            report(f"noise 标量逐个调用 N={n}", measure(lambda: [analytic.evaluate(a, b) for a, b in zip(x, y)]))
+        report(f"noise 数组求值 N={n}", measure(lambda: analytic.sample(x, y)))
+        error = np.abs(lut.sample(x, y) - analytic.evaluate(x, y)).max()
+        report(f"noise 查找表({lut.lut_size}²) N={n}", measure(lambda: lut.sample(x, y)), f"最大误差 {error:.4f}")
+
+    report("noise 查找表构建", measure(lambda: NoiseField(use_lut=True), repeat=3))
+
+
+def bench_render():
+    """粒子渲染：逐个cv2.circle vs 精灵批量叠加（默认窗口尺寸）"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    layer = np.zeros((height, width, 3), dtype=np.uint8)
+    renderer = ParticleRenderer()
+    rng = np.random.default_rng(0)
+    color = Config.PARTICLE_COLOR
+
+    def draw_circles(positions):
+        for x, y in positions.astype(int):
+            cv2.circle(layer, (int(x), int(y)), Config.PARTICLE_RADIUS, color, -1)
+            cv2.circle(layer, (int(x), int(y)), Config.PARTICLE_RADIUS + 2, color, 1)
+
+    for n in (500, 10000, 20000):
+        spread = rng.uniform((0, 0), (width, height), (n, 2))
+        cluster = rng.normal((width / 2, height / 2), 150, (n, 2))
+        report(f"render cv2.circle N={n}", measure(lambda: draw_circles(spread), repeat=3))
+        report(f"render 精灵叠加(分散) N={n}", measure(lambda: renderer.draw(layer, spread, color)))
+        report(f"render 精灵叠加(聚集) N={n}", measure(lambda: renderer.draw(layer, cluster, color)))
+
+    # 稠密混合与稀疏混合在非空背景上的结果应逐像素一致
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    cluster = rng.normal((width / 2, height / 2), 150, (3000, 2))
+    outputs = []
+    for pixels_per_stamp in (0, 10 ** 9):
+        forced = ParticleRenderer()
+        forced.DENSE_PIXELS_PER_STAMP = pixels_per_stamp
+        target = background.copy()
+        forced.draw(target, cluster, color)
+        outputs.append(target.astype(np.int16))
+    check_parity("render 稠密/稀疏混合", float(np.abs(outputs[0] - outputs[1]).max()), 0)
+
+
+def bench_trails():
+    """粒子拖尾（16帧）：记录开销，逐段cv2.line vs 批量polylines，整帧无拖尾/环形缓冲拖尾/运动模糊"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    layer = np.zeros((height, width, 3), dtype=np.uint8)
+    color = Config.PARTICLE_COLOR
+
+    def draw_lines(trails):
+        # 原实现：每个粒子的每一段各调用一次cv2.line
+        count = trails.shape[1]
+        for trail in trails:
+            for i in range(1, count):
+                alpha = i / count
+                cv2.line(layer, (int(trail[i - 1][0]), int(trail[i - 1][1])), (int(trail[i][0]), int(trail[i][1])),
+                         tuple(int(c * alpha) for c in color), 1)
+
+    saved = Config.PARTICLE_TRAIL_LENGTH
+    try:
+        for n in (1000, 5000):
+            Config.PARTICLE_TRAIL_LENGTH = 0
+            plain = make_system(n, "gather", "numpy")
+            Config.PARTICLE_TRAIL_LENGTH = 16
+            system = make_system(n, "gather", "numpy")
+            for _ in range(16):
+                system.update()
+            trails = system.get_trails(system.followers)
+            report(f"trails update 无拖尾 N={n}", measure(plain.update, repeat=3))
+            report(f"trails update 16帧拖尾 N={n}", measure(system.update, repeat=3))
+            report(f"trails 逐段cv2.line N={n}", measure(lambda: draw_lines(trails), repeat=3))
+            for steps in (Config.TRAIL_FADE_STEPS, 15):
+                report(f"trails polylines {steps}段渐隐 N={n}",
+                       measure(lambda: ParticleRenderer.draw_trails(layer, trails, color, fade_steps=steps)))
+
+            # 整帧粒子绘制（含图层清零）
+            renderer = ParticleRenderer()
+            motion_blur = MotionBlurBuffer()
+            positions = system.positions[system.followers]
+
+            def draw_plain():
+                layer.fill(0)
+                renderer.draw(layer, positions, color)
+
+            def draw_ring():
+                layer.fill(0)
+                ParticleRenderer.draw_trails(layer, trails, color)
+                renderer.draw(layer, positions, color)
+
+            def draw_blur():
+                layer.fill(0)
+                renderer.draw(motion_blur.begin(height, width), positions, color)
+                motion_blur.composite(layer)
+
+            plain_ms = measure(draw_plain, repeat=3)
+            report(f"trails 帧 无拖尾 N={n}", plain_ms)
+            report(f"trails 帧 环形缓冲拖尾 N={n}", measure(draw_ring, repeat=3))
+            report(f"trails 帧 运动模糊 N={n}", measure(draw_blur, repeat=3))
+    finally:
+        Config.PARTICLE_TRAIL_LENGTH = saved
+
+
+def traced_bytes(func: Callable[[], object], frames: int = 10) -> int:
+    """用tracemalloc测量稳态下每次调用的峰值分配字节数"""
+    func()  # 预热，让缓冲区完成首次分配
+    tracemalloc.start()
+    peak = 0
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func()
+        _, frame_peak = tracemalloc.get_traced_memory()
+        peak = max(peak, frame_peak - before)
+    tracemalloc.stop()
+    return peak
+
+
+def bench_buffers():
+    """帧缓冲：每帧新分配 vs 缓冲池复用（默认窗口尺寸）"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    pool = FrameBufferPool()
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    def allocate_frame():
+        layer = np.zeros((height, width, 3), dtype=np.uint8)
+        flipped = cv2.flip(frame, 1)
+        rgb = cv2.cvtColor(flipped, cv2.COLOR_BGR2RGB)
+        return layer, rgb
+
+    def pooled_frame():
+        pool.begin_frame()
+        layer = pool.acquire_layer(height, width)
+        flipped = cv2.flip(frame, 1, dst=pool.get("flipped", frame.shape))
+        rgb = cv2.cvtColor(flipped, cv2.COLOR_BGR2RGB, dst=pool.get("rgb", frame.shape))
+        return layer, rgb
+
+    report("buffers 每帧新分配(图层+翻转+转换)", measure(allocate_frame),
+           f"每帧分配 {traced_bytes(allocate_frame) / 1e6:.1f} MB")
+    report("buffers 缓冲池复用(图层+翻转+转换)", measure(pooled_frame),
+           f"每帧分配 {traced_bytes(pooled_frame)} 字节，池统计 {pool.get_stats()['frame_allocated_bytes']} 字节")
+
+
+def bench_detection():
+    """手部检测：不同推理分辨率下的预处理与单帧检测延迟（摄像头请求的全分辨率输入）"""
+    if mp_hands_module is None:
+        return skip("未安装MediaPipe")
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    for inference_width in (0, 1280, 960, 640, 480, 320):
+        detector = HandGestureDetector(inference_width=inference_width)
+        try:
+            rgb = detector.prepare_frame(frame)
+            label = f"{rgb.shape[1]}x{rgb.shape[0]}" + ("(不缩放)" if inference_width == 0 else "")
+            report(f"detection 缩放+颜色转换 {label}", measure(lambda: detector.prepare_frame(frame)))
+            report(f"detection 完整检测 {label}", measure(lambda: detector.process_frame(frame), repeat=3))
+        finally:
+            detector.release()
+
+
+def bench_roi():
+    """区域裁剪：全画面 vs 手周围区域的预处理（缩放+颜色转换）与推理延迟，关键点换算回全画面"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    pool = FrameBufferPool()
+    full = prepare_inference_frame(frame, Config.INFERENCE_WIDTH, pool)
+    full_ms = measure(lambda: prepare_inference_frame(frame, Config.INFERENCE_WIDTH, pool))
+    report(f"roi 全画面预处理 {full.shape[1]}x{full.shape[0]}", full_ms)
+
+    # 张开的手（关键点包围盒约占画面宽度的五分之一）
+    pose = hand_pose((True, True, True, True))
+    points = GestureAnalyzer.landmarks_to_array(pose)
+    roi = HandRegionOfInterest()
+    roi.update(points, frame.shape)
+    cropped = roi.crop(frame, pool)
+    roi_ms = measure(lambda: roi.crop(frame, pool))
+    side = roi.region[2]
+    report(f"roi 区域预处理 {side}x{side}->{cropped.shape[1]}x{cropped.shape[0]}", roi_ms,
+           f"推理像素 {full.shape[0] * full.shape[1] / cropped.size * 3:.1f}x 少，预处理加速 {full_ms / roi_ms:.1f}x")
+
+    # 关键点先换算成区域内坐标，再换算回全画面应当还原
+    x0, y0, side = roi.region
+    local = SimpleNamespace(landmark=[SimpleNamespace(x=(p.x * width - x0) / side, y=(p.y * height - y0) / side,
+                                                      z=p.z) for p in pose.landmark])
+    roi.to_frame(local, frame.shape)
+    check_parity("区域关键点换算回全画面", float(np.abs(GestureAnalyzer.landmarks_to_array(local) - points).max()), 1e-6)
+    report("roi 关键点换算回全画面", measure(lambda: roi.to_frame(local, frame.shape)))
+
+    # 720p摄像头上手的大小变化时区域边长各不相同，推理输入仍固定为size×size，缓冲区不重新分配
+    camera = np.zeros((720, 1280, 3), dtype=np.uint8)
+    camera_pool = FrameBufferPool()
+    center = points[:, :2].mean(axis=0)
+    sides, shapes, allocated = set(), set(), 0
+    for frame_index, scale in enumerate(np.linspace(0.2, 1.0, 12)):
+        scaled = points.copy()
+        scaled[:, :2] = center + (points[:, :2] - center) * scale
+        roi.update(scaled, camera.shape)
+        camera_pool.begin_frame()
+        shapes.add(roi.crop(camera, camera_pool).shape)
+        sides.add(roi.region[2])
+        if frame_index > 0:
+            allocated += camera_pool.frame_allocated_bytes
+    print(f"  720p 区域边长 {min(sides)}~{max(sides)}（{len(sides)}种）-> 推理输入 {sorted(shapes)}")
+    check_parity("720p 区域推理输入尺寸种数", float(len(shapes) - 1), 0)
+    check_parity("720p 区域缓冲区稳态重新分配字节数", float(allocated), 0)
+
+    if mp_hands_module is None:
+        return skip("未安装MediaPipe，不测推理延迟")
+    # 推理延迟在有手的画面上测：视频模式只在找不到手时运行手掌检测，噪声画面上测到的不是稳态开销。
+    # 手从左向右慢移，走完整的process_frame路径（区域每帧按上一帧的手重新取景）
+    scenes = []
+    for x in np.linspace(0.4, 0.6, 60):
+        scene = np.full((height, width, 3), 90, dtype=np.uint8)
+        draw_hand(scene, hand_pose((True, True, True, True), center=(x, 0.6)))
+        scenes.append(scene)
+    for roi_crop in (False, True):
+        detector = HandGestureDetector(roi_crop=roi_crop)
+        try:
+            detected = 0
+            start = time.perf_counter()
+            for scene in scenes:
+                detected += detector.get_landmarks(detector.process_frame(scene)) is not None
+            ms = (time.perf_counter() - start) * 1000.0 / len(scenes)
+            extra = f"检测到手 {detected}/{len(scenes)} 帧"
+            if roi_crop:
+                stats = detector.get_roi_stats()
+                extra += f"，区域推理 {stats['roi_ratio']:.0%}，推理两次 {stats['double_process_ratio']:.0%}"
+            report(f"roi 含手画面每帧推理（{'区域+全画面' if roi_crop else '全画面'}）", ms, extra)
+        finally:
+            detector.release()
+        if detected == 0:
+            skip("合成的手没有被检测到，上面的延迟只是手掌检测的开销，不代表跟踪到手时的情况")
+
+
+def bench_particles():
+    """粒子系统：ParticleSystem.update 各模式 × 粒子数量（默认窗口尺寸）"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    for n in (500, 5000, 20000):
+        for mode in ("free", "pointing", "gather", "scatter"):
+            np.random.seed(0)
+            system = ParticleSystem(width, height, n)
+            system.set_mode(mode)
+            system.set_target(width * 0.6, height * 0.4)
+            system.set_direction(1.0, -0.5)
+            system.set_scatter_center(width * 0.5, height * 0.5)
+            report(f"particles update {mode} N={n}", measure(system.update, repeat=3))
+
+
+def bench_monsters():
+    """怪物：逐个Monster.update+check_collision vs MonsterSwarmStage批量（5000粒子）"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    for count in (1, 2, 4, 8):
+        np.random.seed(0)
+        system = ParticleSystem(width, height, 5000)
+        system.set_mode("gather")
+        system.set_target(width * 0.5, height * 0.5)
+        for _ in range(30):
+            system.update()  # 让粒子聚拢，碰撞检测有实际命中
+        monsters = [Monster(width, height) for _ in range(count)]
+        for i, monster in enumerate(monsters):
+            angle = 2 * np.pi * i / count
+            monster.position[:] = (width * 0.5 + 60 * np.cos(angle), height * 0.5 + 60 * np.sin(angle))
+        particles = system.get_particles()
+        stage = MonsterSwarmStage()
+
+        def per_monster():
+            for monster in monsters:
+                monster.update(particles)
+                monster.check_collision(particles)
+
+        report(f"monsters 逐个update+check_collision M={count}", measure(per_monster, repeat=3))
+        report(f"monsters 批量MonsterSwarmStage M={count}", measure(lambda: stage.update(monsters, system), repeat=3))
+
+
+def bench_game():
+    """游戏管理器：GameManager.update 与特效粒子绘制在大量击中特效下的耗时"""
+    layer = np.zeros((Config.WINDOW_HEIGHT, Config.WINDOW_WIDTH, 3), dtype=np.uint8)
+    for count in (100, 1000, 10000):
+        np.random.seed(0)
+        manager = GameManager()
+        manager.effects = EffectParticlePool(count)
+        manager.spawn_hit_effect(np.array([640.0, 400.0]), count)
+        manager.effects.life[:] = 1 << 30  # 测量期间不消失
+        report(f"game update 击中特效={count}", measure(manager.update))
+        report(f"game 绘制特效 击中特效={count}", measure(lambda: manager.effects.draw(layer)))
+
+
+def hand_pose(extended: Tuple[bool, bool, bool, bool], spread: float = 0.06,
+              center: Tuple[float, float] = (0.5, 0.6)) -> SimpleNamespace:
+    """合成一组手部关键点（与MediaPipe结果相同的landmark结构，归一化坐标）
+
+    Args:
+        extended: 食指、中指、无名指、小指是否伸直
+        spread: 相邻手指MCP的水平间距
+        center: 手掌中心
+    """
+    cx, cy = center
+    points = [(cx, cy + 0.12, 0.0)]  # 手腕
+    points += [(cx - 0.06 - 0.03 * k, cy + 0.06 - 0.04 * k, 0.0) for k in range(4)]  # 拇指
+    for finger, is_extended in enumerate(extended):
+        x = cx + (finger - 1.5) * spread
+        step = -0.05 if is_extended else 0.02  # 伸直时向上延伸，弯曲时指尖折回PIP下方
+        mcp_y = cy - 0.04
+        pip_y = mcp_y - 0.05
+        points += [(x, mcp_y, 0.0), (x, pip_y, 0.0), (x, pip_y + step, 0.0), (x, pip_y + 2 * step, 0.0)]
+    return SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in points])
+
+
+def draw_hand(frame: np.ndarray, pose: SimpleNamespace):
+    """按关键点在画面上画一只肤色的手（手掌多边形+粗线手指），作为推理用的含手画面"""
+    height, width = frame.shape[:2]
+    pixels = np.array([(p.x * width, p.y * height) for p in pose.landmark], dtype=np.int32)
+    skin = (120, 160, 215)
+    thickness = max(2, int(np.linalg.norm(pixels[5] - pixels[17]) / 5))
+    cv2.fillConvexPoly(frame, cv2.convexHull(pixels[[0, 1, 2, 5, 9, 13, 17]]), skin, cv2.LINE_AA)
+    for joints in ([0, 1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16], [17, 18, 19, 20]):
+        cv2.polylines(frame, [pixels[joints]], False, skin, thickness, cv2.LINE_AA)
+
+
+# 手势分析用的关键点夹具（覆盖全部手势分支）
+GESTURE_FIXTURES = {
+    "pointing": hand_pose((True, True, False, False), spread=0.01),
+    "open": hand_pose((True, True, True, True)),
+    "gather": hand_pose((False, False, False, False)),
+    "none": hand_pose((True, False, False, True)),
+}
+
+
+def bench_gesture():
+    """手势分析：GestureAnalyzer.analyze 在各手势关键点夹具上的耗时"""
+    analyzer = GestureAnalyzer(Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT)
+    for name, landmarks in GESTURE_FIXTURES.items():
+        state = analyzer.analyze(landmarks)[0]
+        report(f"gesture analyze {name}", measure(lambda: analyzer.analyze(landmarks)), f"结果 {state}")
+    report("gesture analyze 无手", measure(lambda: analyzer.analyze(None)))
+    landmarks = GESTURE_FIXTURES["open"]
+    points = analyzer.landmarks_to_array(landmarks)
+    report("gesture landmarks_to_array", measure(lambda: analyzer.landmarks_to_array(landmarks)))
+    report("gesture analyze_array", measure(lambda: analyzer.analyze_array(points)))
+
+    # 整批分析：随机手型（含越界坐标），逐帧结果应与analyze完全一致
+    rng = np.random.default_rng(0)
+    n = 20000
+    batch = (rng.uniform(0.2, 0.8, (n, 1, 3)) + rng.normal(0.0, 0.03, (n, 21, 3))).astype(np.float32)
+    batch[:n // 4] = rng.uniform(-0.1, 1.1, (n // 4, 21, 3))
+    present = rng.random(n) > 0.1
+    states, targets, directions, palms = analyzer.analyze_batch(batch, present)
+    mismatches = 0
+    for i in range(n):
+        pose = SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=z) for x, y, z in batch[i].tolist()])
+        expected = analyzer.analyze(pose if present[i] else None)
+        state = GestureAnalyzer.GESTURE_STATES[states[i]]
+        if present[i]:
+            direction = tuple(directions[i]) if state in ("pointing", "gather") else None
+            got = (state, tuple(targets[i]), direction, tuple(palms[i]))
+        else:
+            got = (state, None, None, None)
+        mismatches += got != expected
+    check_parity(f"analyze_batch vs analyze（不同帧数，N={n}）", mismatches, 0)
+    per_frame = measure(lambda: [analyzer.analyze_array(batch[i]) for i in range(1000)], repeat=3) / 1000
+    batch_ms = measure(lambda: analyzer.analyze_batch(batch, present), repeat=3)
+    report(f"gesture analyze_batch 每帧 N={n}", batch_ms / n, f"逐帧analyze_array的 {per_frame * n / batch_ms:.1f}x")
+
+
+def track_error(gesture_filter: Optional[GestureFilter], latency: float, noise: float,
+                moving: bool = True, seconds: float = 20.0) -> float:
+    """模拟30 Hz检测、60 Hz渲染时目标位置与手的真实位置的平均误差（像素）
+
+    手沿李萨如曲线移动（最快约2500像素/秒）或静止，检测结果带高斯噪声、在采集latency秒后才可用；
+    gesture_filter为None时直接使用最近一次检测结果。静止时返回的是输出位置的标准差（抖动）
+    """
+    rng = np.random.default_rng(1)
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+
+    def truth(t: float) -> np.ndarray:
+        if not moving:
+            return np.array([width * 0.5, height * 0.5])
+        return np.array([width * 0.5 + 800.0 * np.sin(2 * np.pi * 0.4 * t),
+                         height * 0.5 + 400.0 * np.sin(2 * np.pi * 0.6 * t)])
+
+    errors, outputs = [], []
+    capture_time, measurement = None, None
+    for frame in range(int(seconds * 60)):
+        now = frame / 60.0
+        latest = np.floor((now - latency) * 30.0) / 30.0  # 最近一次已检测完的采集时刻
+        if latest < 0:
+            continue
+        if latest != capture_time:
+            capture_time = latest
+            point = truth(capture_time) + rng.normal(0.0, noise, 2)
+            measurement = (int(point[0]), int(point[1]))
+        gesture = ("pointing", measurement, (1, 0), measurement)
+        if gesture_filter is not None:
+            gesture = gesture_filter.update(gesture, capture_time, now)
+        if now >= 1.0:
+            errors.append(np.linalg.norm(np.asarray(gesture[1]) - truth(now)))
+            outputs.append(gesture[1])
+    return float(np.mean(errors)) if moving else float(np.std(outputs, axis=0).mean())
+
+
+def bench_filter():
+    """手势滤波：模式切换次数（含误判），静止抖动，检测延迟下的目标位置误差，每次更新耗时"""
+    # 三种手势各持续60次检测，10%的检测随机误判
+    rng = np.random.default_rng(0)
+    truth = np.repeat(["pointing", "open", "gather", "none"] * 5, 60)
+    observed = truth.copy()
+    flips = rng.random(len(truth)) < 0.1
+    observed[flips] = rng.choice(["pointing", "open", "gather", "none"], int(flips.sum()))
+    gesture_filter = GestureFilter()
+    filtered = [gesture_filter.update((state, (0, 0), (1, 0), (0, 0)), index / 30.0)[0]
+                for index, state in enumerate(observed)]
+    changes = lambda states: int(np.count_nonzero(np.asarray(states[1:]) != np.asarray(states[:-1])))
+    print(f"  模式切换（每次触发30帧特效）: 真实 {changes(truth)} 次，逐帧判定 {changes(observed)} 次，"
+          f"滤波后 {changes(filtered)} 次")
+
+    raw_jitter = track_error(None, 0.066, 4.0, moving=False)
+    jitter = track_error(GestureFilter(), 0.066, 4.0, moving=False)
+    print(f"  静止时目标抖动: 原始 {raw_jitter:.2f} px，滤波后 {jitter:.2f} px")
+    for latency in (0.033, 0.066, 0.1):
+        raw = track_error(None, latency, 4.0)
+        smoothed = track_error(GestureFilter(max_prediction=0.0), latency, 4.0)
+        predicted = track_error(GestureFilter(), latency, 4.0)
+        print(f"  检测延迟 {latency * 1000:.0f} ms 目标误差: 原始 {raw:.1f} px，仅平滑 {smoothed:.1f} px，"
+              f"平滑+外推 {predicted:.1f} px")
+    check_parity("延迟66 ms时外推后/原始目标误差", track_error(GestureFilter(), 0.066, 4.0) / track_error(None, 0.066, 4.0), 0.5)
+
+    gesture_filter = GestureFilter()
+    gesture = ("pointing", (1280, 800), (1, 0), (1280, 900))
+    clock = iter(range(1 << 30))
+    report("filter update 新检测结果", measure(lambda: gesture_filter.update(gesture, next(clock) / 30.0, 0.0)))
+    report("filter update 重复结果（只外推）", measure(lambda: gesture_filter.update(gesture, 0.0, 0.05)))
+
+
+def bench_recording():
+    """关键点录制与回放：每帧录制开销（相对手势分析），回放后手势一致性，回放驱动的无头模拟"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    analyzer = GestureAnalyzer(width, height)
+    # 依次经过各手势和无手，每种持续30帧（主循环录制的是转换好的关键点数组）
+    poses = [analyzer.landmarks_to_array(pose) for pose in GESTURE_FIXTURES.values()]
+    stream = [points for points in poses + [None] for _ in range(30)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "landmarks.npy")
+        recorder = LandmarkRecorder(path, capacity=1 << 20)
+        clock = iter(range(1 << 30))
+        frame = iter(range(1 << 30))
+        report("recording record 每帧",
+               measure(lambda: recorder.record(stream[next(frame) % len(stream)], next(clock) / 60.0)),
+               f"analyze_array {measure(lambda: analyzer.analyze_array(stream[0])) * 1000.0:.1f} us")
+        recorder.close()
+
+        recorder = LandmarkRecorder(path)
+        for index, landmarks in enumerate(stream):
+            recorder.record(landmarks, index / Config.SIMULATION_HZ)
+        recorder.close()
+        print(f"  录制文件: {len(stream)} 帧 {os.path.getsize(path)} 字节"
+              f"（{LandmarkRecorder.DTYPE.itemsize} 字节/帧）")
+
+        replay = LandmarkReplay(path, width, height)
+        mismatches = sum(replay.at(index) != analyzer.analyze_array(points) for index, points in enumerate(stream))
+        check_parity("回放手势 vs 原始关键点（不同帧数）", mismatches, 0)
+        states = replay.analyze_all()[0]
+        mismatches = sum(GestureAnalyzer.GESTURE_STATES[state] != replay.at(index)[0]
+                         for index, state in enumerate(states))
+        check_parity("整段录制批量分析 vs 逐帧回放（不同帧数）", mismatches, 0)
+        report("recording replay 每帧", measure(lambda: replay.at(next(frame) % len(stream))))
+        stats = run_headless(replay.total_frames, seed=0, script=replay)
+        report("recording 回放无头模拟每帧", stats['seconds'] * 1000.0 / stats['frames'], f"{stats['fps']:.1f} FPS")
+        del replay, stats
+
+        # 推理比渲染慢：每次检测被3个渲染帧重复取用，录下的时间戳相同；
+        # 回放经过手势滤波时只有新检测推进滤波（关闭滤波时不经过）
+        path = os.path.join(directory, "repeated.npy")
+        recorder = LandmarkRecorder(path)
+        for index, landmarks in enumerate(stream):
+            recorder.record(landmarks, index // 3 * 3 / Config.SIMULATION_HZ)
+        recorder.close()
+        detections = (len(stream) + 2) // 3
+        saved = Config.GESTURE_FILTER
+        try:
+            for enabled in (True, False):
+                Config.GESTURE_FILTER = enabled
+                replay = LandmarkReplay(path, width, height)
+                stats = run_headless(replay.total_frames, seed=0, script=replay)
+                check_equal(f"回放经手势滤波（GESTURE_FILTER={enabled}）处理的检测次数",
+                            stats['filtered_detections'], detections if enabled else 0)
+                del replay, stats
+        finally:
+            Config.GESTURE_FILTER = saved
+
+
+class SyntheticHandScene:
+    """合成手部视频：21个带纹理的圆斑按hand_pose排布，手掌沿路径移动（静止、慢移、快扫交替）
+
+    配套的检测器夹具返回被检测那一帧的真实关键点（加上类似MediaPipe的抖动噪声），
+    用于在没有摄像头和MediaPipe时评估检测调度和光流跟踪。帧序号写在左上角两个像素里，
+    后台线程检测较早提交的帧时也能找到对应的真实关键点
+    """
+
+    def __init__(self, width: int, height: int, noise_px: float = 2.0, inference_ms: float = 0.0):
+        """初始化场景
+
+        Args:
+            width, height: 画面尺寸
+            noise_px: 检测结果的噪声（像素）
+            inference_ms: 检测器每次模拟的推理耗时
+        """
+        self.width, self.height = width, height
+        self.noise_px = noise_px
+        self.inference_ms = inference_ms
+        self.rng = np.random.default_rng(0)
+        self.pose = GestureAnalyzer.landmarks_to_array(hand_pose((True, True, True, True), spread=0.05))
+        self.pose[:, :2] -= self.pose[:, :2].mean(axis=0)
+        self.truth = self.pose.copy()
+        self.history: Dict[int, np.ndarray] = {}  # 帧序号 -> 真实关键点
+        self.frame_index = 0
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.background = (np.random.default_rng(1).random((height // 8, width // 8, 3)) * 40).astype(np.uint8)
+        self.background = cv2.resize(self.background, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    def center(self, t: float) -> np.ndarray:
+        """第t秒手掌中心（归一化坐标）：每4秒一轮，静止1秒、慢移1.5秒、快扫1.5秒（最快约4000像素/秒）"""
+        phase = t % 4.0
+        if phase < 1.0:
+            s = 0.0
+        elif phase < 2.5:
+            s = (phase - 1.0) * 0.1
+        else:
+            s = 0.15 + (phase - 2.5) * 0.9
+        return np.array([0.5 + 0.25 * np.sin(2 * np.pi * s), 0.5 + 0.2 * np.sin(4 * np.pi * s)])
+
+    def render(self, t: float) -> np.ndarray:
+        """渲染第t秒的画面，并更新真实关键点"""
+        self.truth[:, :2] = self.pose[:, :2] + self.center(t)
+        np.copyto(self.frame, self.background)
+        scale = np.array([self.width, self.height])
+        for x, y in (self.truth[:, :2] * scale).astype(int).tolist():
+            cv2.circle(self.frame, (x, y), 26, (200, 180, 160), -1)
+            cv2.circle(self.frame, (x, y), 10, (60, 50, 40), -1)
+        self.frame_index += 1
+        self.frame[0, :2, 0] = (self.frame_index & 0xFF, self.frame_index >> 8 & 0xFF)
+        self.history[self.frame_index & 0xFFFF] = self.truth[:, :2].copy()
+        return self.frame
+
+    # 检测器夹具接口（与HandGestureDetector的process_frame/get_landmarks相同）
+    def process_frame(self, frame: np.ndarray) -> SimpleNamespace:
+        if self.inference_ms:
+            time.sleep(self.inference_ms / 1000.0)
+        noise = self.rng.normal(0.0, self.noise_px, (21, 2)) / (self.width, self.height)
+        points = self.history[int(frame[0, 0, 0]) | int(frame[0, 1, 0]) << 8] + noise
+        return SimpleNamespace(multi_hand_landmarks=[
+            SimpleNamespace(landmark=[SimpleNamespace(x=x, y=y, z=0.0) for x, y in points.tolist()])])
+
+    def get_landmarks(self, results: SimpleNamespace):
+        return results.multi_hand_landmarks[0] if results.multi_hand_landmarks else None
+
+
+def adaptive_tracking_error(max_interval: int, inference_ms: float = 0.0, seconds: float = 8.0) -> Tuple[dict, float, float]:
+    """在合成场景上以60 FPS运行自适应检测，返回(调度统计, 与真实关键点的平均误差像素, 每帧耗时毫秒)"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    scene = SyntheticHandScene(width, height, inference_ms=inference_ms)
+    tracker = AdaptiveHandTracker(HandTrackingWorker(scene, threaded=False), max_interval=max_interval)
+    errors, elapsed = [], 0.0
+    for frame_index in range(int(seconds * 60)):
+        t = frame_index / 60.0
+        frame = scene.render(t)
+        start = time.perf_counter()
+        points = tracker.update(frame, t)
+        elapsed += time.perf_counter() - start
+        if points is not None:
+            errors.append(np.linalg.norm((points[:, :2] - scene.truth[:, :2]) * (width, height), axis=1).mean())
+    frames = int(seconds * 60)
+    return tracker.get_stats(), float(np.mean(errors)), elapsed * 1000.0 / frames
+
+
+def bench_adaptive():
+    """自适应检测：每帧检测 vs 每K帧检测+光流跟踪（合成手部视频，检测结果带2像素噪声）"""
+    stats, error, ms = adaptive_tracking_error(1)
+    print(f"  每帧检测: 检测比例 {stats['detection_ratio']:.0%}，与真实关键点误差 {error:.1f} px")
+    for max_interval in (2, 4, 8):
+        stats, error, ms = adaptive_tracking_error(max_interval)
+        report(f"adaptive max_interval={max_interval} 每帧调度+光流", ms,
+               f"检测比例 {stats['detection_ratio']:.0%}，真实误差 {error:.1f} px，"
+               f"光流误差 平均 {stats['tracking_error_mean']:.1f} / p95 {stats['tracking_error_p95']:.1f} px")
+    # 推理20 ms、预算8 ms：预算决定最少每3帧检测一次
+    stats, error, ms = adaptive_tracking_error(4, inference_ms=20.0, seconds=4.0)
+    print(f"  推理20 ms（预算 {Config.DETECTION_BUDGET_MS:.0f} ms/帧）: 检测比例 {stats['detection_ratio']:.0%}，"
+          f"当前间隔 {stats['interval']}，真实误差 {error:.1f} px")
+
+    # 后台线程推理30 ms（按真实时间60 FPS运行）：直接用最新检测结果 vs 光流把滞后的结果推到当前帧
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    for adaptive in (False, True):
+        scene = SyntheticHandScene(width, height, inference_ms=30.0)
+        worker = HandTrackingWorker(scene).start()
+        tracker = AdaptiveHandTracker(worker)
+        errors = []
+        start = time.perf_counter()
+        for frame_index in range(240):
+            t = frame_index / 60.0
+            time.sleep(max(0.0, start + t - time.perf_counter()))
+            frame = scene.render(t)
+            if adaptive:
+                points = tracker.update(frame, t)
+            else:
+                worker.submit(frame, t)
+                results = worker.get_results()
+                landmarks = scene.get_landmarks(results) if results is not None else None
+                points = GestureAnalyzer.landmarks_to_array(landmarks) if landmarks is not None else None
+            if points is not None and t >= 1.0:
+                errors.append(np.linalg.norm((points[:, :2] - scene.truth[:, :2]) * (width, height), axis=1).mean())
+        worker.stop()
+        label = "自适应+光流" if adaptive else "每帧提交，直接用最新结果"
+        print(f"  后台推理30 ms，{label}: 真实误差 {np.mean(errors):.1f} px，"
+              f"实际检测 {worker.frames_processed / 240:.0%} 的帧")
+
+
+def bench_frame():
+    """整帧模拟：无头模式脚本手势驱动的平均每帧耗时（含渲染）"""
+    stats = run_headless(120, seed=0, render=True)
+    report("frame 无头模式每帧", stats['seconds'] * 1000.0 / stats['frames'], f"{stats['fps']:.1f} FPS")
+    for name, stage in stats['stages'].items():
+        report(f"frame 阶段 {name}", stage['mean_ms'])
+
+
+def make_system(n: int, mode: str, backend: str, seed: int = 0, workers: int = 0) -> ParticleSystem:
+    """按固定种子创建粒子系统并设置模式（默认窗口尺寸，workers > 1时为多进程系统，用完需close）"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    np.random.seed(seed)
+    if workers > 1:
+        system = ParallelParticleSystem(width, height, n, workers=workers, backend=backend)
+    else:
+        system = ParticleSystem(width, height, n, backend="numpy")
+        system.backend = backend  # 未安装numba时"numba"内核以纯Python执行，只用于一致性检查
+    system.set_mode(mode)
+    system.set_target(width * 0.6, height * 0.4)
+    system.set_direction(1.0, -0.5)
+    system.set_scatter_center(width * 0.5, height * 0.5)
+    return system
+
+
+def backend_parity(n: int, mode: str, steps: int = 1, previous: Optional[str] = None) -> float:
+    """NumPy与编译内核各更新steps步后的最大位置误差（previous为切换到mode之前的模式，用于触发切换特效）"""
+    reference = make_system(n, previous or mode, "numpy")
+    kernel = make_system(n, previous or mode, "numba")
+    reference.set_mode(mode)
+    kernel.set_mode(mode)
+    for step in range(steps):
+        np.random.seed(step)  # 两边的随机扰动使用相同序列
+        reference.update()
+        np.random.seed(step)
+        kernel.update()
+    return float(np.abs(reference.positions - kernel.positions).max())
+
+
+# 各模式的编译内核一致性检查：(模式, 切换前的模式)；gather→free带release特效的随机力
+BACKEND_PARITY_CASES = (("pointing", None), ("gather", None), ("scatter", None), ("free", None),
+                        ("free", "gather"))
+
+
+def bench_backend():
+    """粒子更新实现：NumPy vs Numba编译内核（耗时与一致性）"""
+    # 状态数组为单精度，坐标上千时一个ulp约1e-4；只有跟随（pointing）模式整步编译，
+    # 其余模式的受力仍由NumPy计算，只有积分在内核中
+    if numba is None:
+        skip("未安装numba，只检查内核与NumPy的一致性（内核以纯Python执行）")
+        for mode, previous in BACKEND_PARITY_CASES:
+            label = f"{previous}→{mode}" if previous else mode
+            check_parity(f"{label} N=300 单步最大位置误差", backend_parity(300, mode, previous=previous), 1e-3)
+        return
+
+    for mode, previous in BACKEND_PARITY_CASES:
+        label = f"{previous}→{mode}" if previous else mode
+        check_parity(f"{label} N=5000 单步最大位置误差", backend_parity(5000, mode, previous=previous), 1e-3)
+
+    for n in (500, 5000, 20000):
+        for mode in ("pointing", "gather", "scatter", "free"):
+            for backend in ("numpy", "numba"):
+                system = make_system(n, mode, backend)
+                report(f"backend {backend} {mode} N={n}", measure(system.update, repeat=3))
+
+
+def bench_parallel():
+    """多进程分块更新：ParallelParticleSystem 进程数 × 粒子数量（相对单进程的加速比）"""
+    cpus = os.cpu_count() or 1
+    worker_counts = [w for w in (2, 4, 8, 16) if w <= max(2, cpus)]
+    print(f"  CPU核数 {cpus}")
+
+    # 命令行 --workers 经 GameSession 真正启动了对应数量的工作进程
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "particle_game.py")
+    for workers in (0, 2):
+        output = subprocess.run([sys.executable, script, "--headless", "--frames", "3", "--workers", str(workers)],
+                                capture_output=True, text=True, timeout=300).stdout
+        found = re.search(r"粒子更新工作进程 (\d+)", output)
+        check_equal(f"--headless --workers {workers} 启动的工作进程数", int(found.group(1)) if found else None,
+                    workers if workers > 1 else 0)
+
+    saved = Config.REPULSION_METHOD
+    try:
+        # barnes_hut模式下工作进程查询主进程构建的同一棵四叉树
+        for method in ("grid", "barnes_hut"):
+            Config.REPULSION_METHOD = method
+            reference = make_system(3000, "pointing", Config.PARTICLE_BACKEND)
+            parallel = make_system(3000, "pointing", Config.PARTICLE_BACKEND, workers=2)
+            for _ in range(10):
+                reference.update()
+                parallel.update()
+            error = float(np.abs(reference.positions - parallel.positions).max())
+            parallel.close()
+            check_parity(f"pointing {method} N=3000 2进程 10步后最大位置误差", error, 1e-4)
+    finally:
+        Config.REPULSION_METHOD = saved
+
+    for n in (5000, 20000, 100000):
+        # pointing模式粒子聚成一团，排斥近似二次方，十万粒子只测gather
+        for mode in ("pointing", "gather") if n <= 20000 else ("gather",):
+            single = measure(make_system(n, mode, Config.PARTICLE_BACKEND).update, repeat=3)
+            report(f"parallel 1进程 {mode} N={n}", single)
+            for workers in worker_counts:
+                system = make_system(n, mode, Config.PARTICLE_BACKEND, workers=workers)
+                try:
+                    ms = measure(system.update, repeat=3)
+                finally:
+                    system.close()
+                report(f"parallel {workers}进程 {mode} N={n}", ms, f"加速 {single / ms:.2f}x")
+
+
+def clumped_system(n: int) -> ParticleSystem:
+    """pointing模式推进40步、粒子聚成一团的系统（软排斥最重的情形）"""
+    system = make_system(n, "pointing", "numba" if numba is not None else "numpy")
+    for _ in range(40):
+        system.update()
+    system.neighbor_grid.build(system.positions)  # 网格与四叉树使用同一组位置
+    return system
+
+
+def tree_repulsion(system: ParticleSystem, theta: float) -> np.ndarray:
+    """在系统当前位置上用指定张角的四叉树计算跟随粒子的软排斥力"""
+    saved = Config.BARNES_HUT_THETA
+    Config.BARNES_HUT_THETA = theta
+    system.repulsion_tree = BarnesHutTree(system.width, system.height, Config.BARNES_HUT_LEAF_SIZE)
+    system.repulsion_tree.build(system.positions)
+    try:
+        return system._soft_repulsion(system.followers)
+    finally:
+        system.repulsion_tree = None
+        Config.BARNES_HUT_THETA = saved
+
+
+def exact_repulsion(system: ParticleSystem, capacity: int = 0) -> np.ndarray:
+    """在系统当前位置上用网格计算跟随粒子的软排斥力（capacity为拥挤网格合并阈值，0为逐对精确计算）"""
+    saved = Config.REPULSION_CELL_CAPACITY
+    Config.REPULSION_CELL_CAPACITY = capacity
+    try:
+        return system._soft_repulsion(system.followers)
+    finally:
+        Config.REPULSION_CELL_CAPACITY = saved
+
+
+def swarm_stats(capacity: int, n: int = 5000, frames: int = 120):
+    """pointing模式推进若干帧后跟随粒子团的大小（到中位中心的距离中位数，不受甩出去的零散粒子影响）和平均速度"""
+    saved = Config.REPULSION_CELL_CAPACITY
+    Config.REPULSION_CELL_CAPACITY = capacity
+    try:
+        system = make_system(n, "pointing", "numpy")
+        for _ in range(frames):
+            system.update()
+    finally:
+        Config.REPULSION_CELL_CAPACITY = saved
+    positions = system.positions[system.followers]
+    spread = float(np.median(np.linalg.norm(positions - np.median(positions, axis=0), axis=1)))
+    speed = float(np.linalg.norm(system.velocities[system.followers], axis=1).mean())
+    return spread, speed
+
+
+def bench_barnes_hut():
+    """软排斥：逐对精确计算 vs 拥挤网格按质心合并 vs Barnes–Hut四叉树近似（误差与耗时）"""
+    # 相对误差 = ‖近似 - 精确‖ / ‖精确‖（整组粒子）
+    system = clumped_system(5000)
+    exact = exact_repulsion(system)
+    # theta=0不做近似，误差只来自单精度位置下的求和顺序
+    for theta, bound in ((0.0, 1e-6), (0.3, 5e-3), (0.5, 1e-2), (0.8, 3e-2)):
+        error = float(np.linalg.norm(tree_repulsion(system, theta) - exact) / np.linalg.norm(exact))
+        check_parity(f"theta={theta} N=5000 软排斥相对误差", error, bound)
+    capacity = Config.REPULSION_CELL_CAPACITY
+    # 团内的排斥力大多互相抵消、且远超MAX_FORCE被截断，合并后逐粒子的力向量误差很大（约7倍）；
+    # 这里检查的是群体表现：同样推进后粒子团的大小和平均速度
+    error = float(np.linalg.norm(exact_repulsion(system, capacity) - exact) / np.linalg.norm(exact))
+    print(f"  拥挤网格合并(>{capacity}个粒子) N=5000 软排斥力向量相对误差 {error:.2e}（仅供参考）")
+    spread, speed = swarm_stats(0)
+    merged_spread, merged_speed = swarm_stats(capacity)
+    check_parity("拥挤网格合并 N=5000 粒子团大小相对偏差", abs(merged_spread - spread) / spread, 0.2)
+    check_parity("拥挤网格合并 N=5000 平均速度相对偏差", abs(merged_speed - speed) / speed, 0.2)
+
+    for n in (5000, 20000):
+        system = clumped_system(n)
+        exact_ms = measure(lambda: exact_repulsion(system), repeat=3)
+        report(f"repulsion grid pointing N={n}", exact_ms)
+        ms = measure(lambda: exact_repulsion(system, capacity), repeat=3)
+        report(f"repulsion grid 合并拥挤网格 N={n}", ms, f"加速 {exact_ms / ms:.2f}x")
+        for theta in (0.5, 0.8):
+            ms = measure(lambda: tree_repulsion(system, theta), repeat=3)
+            report(f"repulsion barnes_hut theta={theta} N={n}", ms, f"加速 {exact_ms / ms:.2f}x")
+
+
+def bench_memory():
+    """内存：每个粒子的字节数（单精度状态数组，粒子视图按需创建）"""
+    width, height = Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT
+    for n in (5000, 100000):
+        system = ParticleSystem(width, height, n)
+        system.update()  # 建好邻居网格
+        stats = system.memory_report()
+        print(f"  N={n}: 状态 {stats['state_bytes'] / n:.1f} B/粒子，索引 {stats['index_bytes'] / n:.1f} B/粒子，"
+              f"Python对象 {stats['object_bytes'] / n:.1f} B/粒子，合计 {stats['bytes_per_particle']:.1f} B/粒子")
+    # 十万粒子（含每帧重建的网格，不含按需创建的粒子视图）
+    check_budget("N=100000 粒子系统", system.memory_report()['total_bytes'], 8_000_000)
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "noise": bench_noise,
+    "render": bench_render,
+    "trails": bench_trails,
+    "buffers": bench_buffers,
+    "detection": bench_detection,
+    "roi": bench_roi,
+    "particles": bench_particles,
+    "monsters": bench_monsters,
+    "game": bench_game,
+    "gesture": bench_gesture,
+    "filter": bench_filter,
+    "recording": bench_recording,
+    "adaptive": bench_adaptive,
+    "frame": bench_frame,
+    "backend": bench_backend,
+    "parallel": bench_parallel,
+    "barnes_hut": bench_barnes_hut,
+    "memory": bench_memory,
+}
+
+
+def save_baseline(path: str):
+    """把本次结果保存为JSON基线"""
+    data = {
+        'meta': {
+            'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+        },
+        'results': RESULTS,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n基线已保存: {path}（{len(RESULTS)} 项）")
+
+
+def compare_baseline(path: str, threshold: float) -> int:
+    """与JSON基线对比，返回变慢超过阈值的项数
+
+    Args:
+        path: 基线文件
+        threshold: 允许的变慢比例（0.1表示10%）
+    """
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)['results']
+
+    print(f"\n与基线对比: {path}（阈值 {threshold:.0%}）")
+    regressions = 0
+    for name, ms in RESULTS.items():
+        base: Optional[float] = baseline.get(name)
+        if not base:
+            continue
+        change = ms / base - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "变慢"
+            regressions += 1
+        elif change < -threshold:
+            flag = "变快"
+        print(f"  {name:<44s} {base:10.3f} -> {ms:10.3f} ms  {change:+7.1%}  {flag}")
+    print(f"变慢超过阈值: {regressions} 项")
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="粒子游戏性能基准测试")
+    parser.add_argument("groups", nargs="*", help=f"要运行的基准分组（默认全部）: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--save", metavar="PATH", help="把结果保存为JSON基线")
+    parser.add_argument("--compare", metavar="PATH", help="与JSON基线对比")
+    parser.add_argument("--threshold", type=float, default=0.1, help="对比时允许的变慢比例（默认0.1）")
+    args = parser.parse_args(argv)
+    unknown = [group for group in args.groups if group not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准分组: {', '.join(unknown)}")
+
+    print("=" * 60)
+    print("粒子游戏性能基准测试")
+    print(f"NumPy {np.__version__}")
+    print("=" * 60)
+    for group in args.groups or list(BENCHMARKS):
+        print(f"\n[{group}] {BENCHMARKS[group].__doc__}")
+        BENCHMARKS[group]()
+
+    if args.save:
+        save_baseline(args.save)
+    if CHECK_FAILURES:
+        print(f"\n{len(CHECK_FAILURES)} 项检查未通过: {', '.join(CHECK_FAILURES)}")
+    if args.compare and compare_baseline(args.compare, args.threshold):
+        return 1
+    return 1 if CHECK_FAILURES else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,36 +2,58 @@
 手势控制粒子互动游戏 - 万剑归宗
 使用OpenCV和MediaPipe实现手势识别，控制粒子群运动
 """
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
 import cv2
 import numpy as np
-import mediapipe as mp
+from collections import deque
+from itertools import chain
+from operator import attrgetter
 from typing import List, Tuple, Optional
 
-# MediaPipe版本兼容性处理
 try:
-    # 尝试新版本API (mediapipe >= 0.10.8)
-    from mediapipe.tasks.python import vision
-    # 如果导入成功，使用新版API（这里我们先用旧版兼容方式）
-    mp_hands_module = mp.solutions.hands
-    mp_drawing_module = mp.solutions.drawing_utils
-    mp_drawing_styles_module = mp.solutions.drawing_styles
-except (AttributeError, ImportError):
-    # 尝试标准旧版导入
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None  # Python 3.8之前没有共享内存模块，只能单进程更新
+
+try:
+    import mediapipe as mp
+except ImportError:
+    mp = None  # 无头模式不需要MediaPipe
+
+# MediaPipe版本兼容性处理
+if mp is None:
+    mp_hands_module = mp_drawing_module = mp_drawing_styles_module = None
+else:
     try:
+        # 尝试新版本API (mediapipe >= 0.10.8)
+        from mediapipe.tasks.python import vision
+        # 如果导入成功，使用新版API（这里我们先用旧版兼容方式）
         mp_hands_module = mp.solutions.hands
         mp_drawing_module = mp.solutions.drawing_utils
         mp_drawing_styles_module = mp.solutions.drawing_styles
-    except AttributeError:
-        # 如果mp.solutions不存在，尝试直接导入
+    except (AttributeError, ImportError):
+        # 尝试标准旧版导入
         try:
-            from mediapipe.python.solutions import hands as mp_hands_module
-            from mediapipe.python.solutions import drawing_utils as mp_drawing_module
-            from mediapipe.python.solutions import drawing_styles as mp_drawing_styles_module
-        except ImportError:
-            # 最后尝试完整路径导入
-            import mediapipe.python.solutions.hands as mp_hands_module
-            import mediapipe.python.solutions.drawing_utils as mp_drawing_module
-            import mediapipe.python.solutions.drawing_styles as mp_drawing_styles_module
+            mp_hands_module = mp.solutions.hands
+            mp_drawing_module = mp.solutions.drawing_utils
+            mp_drawing_styles_module = mp.solutions.drawing_styles
+        except AttributeError:
+            # 如果mp.solutions不存在，尝试直接导入
+            try:
+                from mediapipe.python.solutions import hands as mp_hands_module
+                from mediapipe.python.solutions import drawing_utils as mp_drawing_module
+                from mediapipe.python.solutions import drawing_styles as mp_drawing_styles_module
+            except ImportError:
+                # 最后尝试完整路径导入
+                import mediapipe.python.solutions.hands as mp_hands_module
+                import mediapipe.python.solutions.drawing_utils as mp_drawing_module
+                import mediapipe.python.solutions.drawing_styles as mp_drawing_styles_module
 
 
 # 配置参数
@@ -44,12 +66,21 @@ class Config:
     
     # 摄像头设置
     CAMERA_INDEX = 0
+    ASYNC_CAPTURE = True  # 后台线程采集摄像头，主循环按自身帧率运行
+    TARGET_FPS = 60  # 主循环目标帧率（异步采集时生效）
+    SIMULATION_HZ = 60  # 固定模拟步频（按帧计的速度、计时器都以每秒60步为准）
+    MAX_SUBSTEPS = 5  # 单个渲染帧最多推进的模拟步数
+    RENDER_INTERPOLATION = True  # 渲染时在前后两个模拟状态之间插值
     
     # 粒子系统参数
     NUM_PARTICLES = 500
     MAX_SPEED = 15.0  # 提高最大速度
     MIN_SPEED = 1.0  # 提高最小速度
     SOFT_REPULSION_RADIUS = 25.0  # 粒子间软排斥半径
+    REPULSION_CELL_CAPACITY = 32  # 网格内粒子超过该数时整格按质心合并为一个排斥源（聚团时开销随N线性，0为不合并）
+    REPULSION_METHOD = "grid"  # 粒子间软排斥："grid" 邻居网格（拥挤网格按质心合并），"barnes_hut" 四叉树近似（比逐对精确计算快1.3~2.8倍，仍达不到实时）
+    BARNES_HUT_THETA = 0.5  # Barnes–Hut张角阈值（越大越快、误差越大，0为不近似）
+    BARNES_HUT_LEAF_SIZE = 2.0  # 四叉树叶子节点边长（像素）
     
     # 意念操控算法参数
     ATTRACTION_STRENGTH = 0.6  # 目标吸引力强度
@@ -57,6 +88,10 @@ class Config:
     PARTICLE_REPULSION = 15.0  # 粒子间排斥力（降低）
     NOISE_SCALE = 0.002  # 有机噪声缩放
     NOISE_STRENGTH = 1.0  # 有机噪声强度
+    NOISE_USE_LUT = False  # 使用预计算噪声查找表（粒子数量很大时更快）
+    NOISE_LUT_SIZE = 1024  # 噪声查找表分辨率（每个周期的采样数）
+    PARTICLE_BACKEND = "numpy"  # 粒子更新实现："numpy" 或 "numba"（编译内核，未安装numba时回退到numpy）
+    PARALLEL_WORKERS = 0  # 跟随粒子分块并行更新的进程数（0/1为单进程，粒子数上万时再开启）
     ORBIT_STRENGTH = 0.15  # 轨道旋转强度
     ARRIVE_RADIUS = 100.0  # 到达半径
     DIRECTION_STRENGTH = 0.6  # 方向控制强度
@@ -65,16 +100,44 @@ class Config:
     FINGER_DISTANCE_THRESHOLD = 55  # 放宽到55像素，更容易触发
     MIN_DETECTION_CONFIDENCE = 0.6
     MIN_TRACKING_CONFIDENCE = 0.5
+    ASYNC_INFERENCE = True  # 手部检测在后台线程运行，主循环取用最新结果
+    INFERENCE_WIDTH = 640  # 送入MediaPipe的画面宽度（按比例缩放，0为不缩放）
+    ROI_CROP = False  # 检测到手后只把手周围的区域送去推理，丢失时回到全画面
+    ROI_PADDING = 0.6  # 区域在关键点包围盒每边外扩的比例（相对包围盒较长边）
+    ROI_MIN_FRACTION = 0.25  # 区域边长下限（相对画面短边）
+    ROI_INFERENCE_SIZE = 256  # 区域缩放到的推理输入边长
+    ROI_MISS_COOLDOWN = 30  # 区域内丢失后隔多少次检测再裁剪（丢失的那一帧要推理两次，限制其频率）
+    ADAPTIVE_DETECTION = False  # 自适应检测：每K帧检测一次，其余帧用光流跟踪关键点
+    DETECTION_MAX_INTERVAL = 4  # 最多隔几帧检测一次
+    DETECTION_MOTION_PIXELS = 40.0  # 两次检测之间手最多移动的像素数（手动得越快检测越频繁）
+    DETECTION_BUDGET_MS = 8.0  # 推理耗时分摊到每帧的上限（推理慢时拉长检测间隔，0为不限制）
+    DETECTION_MAX_ERROR = 15.0  # 光流跟踪误差（像素）超过该值时缩短检测间隔
+    TRACKING_FLOW_WIDTH = 320  # 光流跟踪的画面宽度
+    GESTURE_FILTER = True  # 手势滤波：位置去抖、手势切换迟滞、按检测延迟外推目标位置
+    GESTURE_CONFIRM_FRAMES = 3  # 新手势连续出现几次检测结果后才切换模式
+    GESTURE_MIN_CUTOFF = 1.0  # One Euro滤波静止时的截止频率（Hz，越小越稳、越滞后）
+    GESTURE_BETA = 0.01  # 截止频率随手部速度（像素/秒）增加的系数（越大快速移动时滞后越小）
+    GESTURE_DERIVATIVE_CUTOFF = 3.0  # 速度估计的截止频率（Hz）
+    GESTURE_MAX_PREDICTION = 0.1  # 目标位置最多外推的时间（秒，0为不外推）
+    GESTURE_PREDICTION_MIN_SPEED = 150.0  # 外推前速度先减去的量（像素/秒），手静止时不把噪声外推成抖动
+    LANDMARK_RECORD_PATH = None  # 手部关键点录制文件（.npy，可回放），None为不录制
+    LANDMARK_RECORD_CAPACITY = 216000  # 录制文件预分配的帧数（60 FPS下1小时，未写入部分不占磁盘）
     
     # 视觉效果
     PARTICLE_RADIUS = 2
     PARTICLE_COLOR = (100, 200, 255)  # BGR格式：橙黄色
     LEADER_RADIUS = 6  # 核心粒子半径
     LEADER_COLOR = (255, 255, 255)  # 核心粒子颜色：白色
-    PARTICLE_TRAIL_LENGTH = 0  # 禁用拖尾效果
+    PARTICLE_TRAIL_LENGTH = 0  # 拖尾帧数（0为禁用；环形缓冲区记录、按批绘制，16帧×数千粒子也负担得起）
+    TRAIL_FADE_STEPS = 4  # 拖尾渐隐分几段（每段一次批量绘制，段数越多越平滑、越慢）
+    MOTION_BLUR = False  # 运动模糊：粒子画在跨帧保留的图层上逐帧变暗（开销与拖影长度无关）
+    MOTION_BLUR_DECAY = 0.85  # 运动模糊每个模拟步的亮度保留比例（越大拖影越长）
     SHOW_HAND_LANDMARKS = True
     SHOW_VIDEO = False  # 不显示视频画面
     DEBUG_MODE = False  # 调试模式
+    PROFILER_WINDOW = 300  # 分阶段计时的滚动窗口帧数（计算p50/p95/p99）
+    PROFILE_LOG_PATH = None  # 逐帧计时日志路径（.csv 或 .jsonl），None为不记录
+    MAX_EFFECT_PARTICLES = 2048  # 击中/死亡特效粒子上限（满了覆盖最早的）
     
     # 核心粒子参数
     LEADER_ATTRACTION = 0.25  # 核心粒子基础引力强度
@@ -83,125 +146,862 @@ class Config:
     SCATTER_REPULSION = 0.3  # 张开时的轻微排斥力
 
 
+def _state_property(array_name: str, column: Optional[int] = None, doc: str = ""):
+    """生成把粒子视图属性映射到ParticleSystem状态数组的property
+
+    Args:
+        array_name: ParticleSystem上的数组属性名
+        column: 二维数组的列号，None表示取整行
+        doc: 属性说明
+    """
+    if column is None:
+        def getter(self):
+            return getattr(self._system, array_name)[self.index]
+
+        def setter(self, value):
+            getattr(self._system, array_name)[self.index] = value
+    else:
+        def getter(self):
+            return getattr(self._system, array_name)[self.index, column]
+
+        def setter(self, value):
+            getattr(self._system, array_name)[self.index, column] = value
+
+    return property(getter, setter, doc=doc)
+
+
 class Particle:
-    """粒子类"""
-    
-    def __init__(self, x: float, y: float, width: int, height: int):
-        """初始化粒子
-        
-        Args:
-            x: 初始x坐标
-            y: 初始y坐标
-            width: 场景宽度
-            height: 场景高度
-        """
-        self.position = np.array([x, y], dtype=float)
-        self.velocity = np.random.randn(2) * np.random.uniform(3.0, 8.0)  # 随机初始速度
-        self.acceleration = np.zeros(2, dtype=float)
-        self.max_speed = Config.MAX_SPEED
-        self.width = width
-        self.height = height
-        
-        # 粒子轨迹（用于绘制拖尾效果）
-        self.trail: List[np.ndarray] = []
-    
-    def apply_force(self, force: np.ndarray):
-        """施加力到粒子
-        
+    """粒子视图类
+
+    粒子状态以结构化数组(SoA)形式保存在ParticleSystem中，
+    该类只记录粒子索引，供Monster和渲染代码按对象方式读写单个粒子
+    """
+
+    __slots__ = ("_system", "index")
+
+    def __init__(self, system: "ParticleSystem", index: int):
+        """初始化粒子视图
+
         Args:
-            force: 力向量
+            system: 所属粒子系统
+            index: 粒子在状态数组中的索引
         """
-        # 限制力的大小，避免异常抖动
-        force_mag = np.linalg.norm(force)
-        max_force = 3.5  # 提高最大力
-        if force_mag > max_force:
-            force = (force / force_mag) * max_force
-        self.acceleration += force
-    
-    def update(self, is_leader: bool = False):
-        """更新粒子位置和速度"""
-        # 更新速度
-        self.velocity += self.acceleration
-        
-        # 限制速度（上限和下限）
-        speed = np.linalg.norm(self.velocity)
-        if speed > self.max_speed:
-            self.velocity = (self.velocity / speed) * self.max_speed
-        elif speed < Config.MIN_SPEED and speed > 0:
-            self.velocity = (self.velocity / speed) * Config.MIN_SPEED
-        elif speed == 0:
-            # 添加随机扰动避免静止
-            self.velocity = np.random.randn(2) * Config.MIN_SPEED
-        
-        # 平滑处理：轻微阻尼
-        damping = 0.97  # 降低阻尼，保持速度
-        self.velocity *= damping
-        
-        # 记录轨迹（如果启用）
-        if Config.PARTICLE_TRAIL_LENGTH > 0:
-            if len(self.trail) > Config.PARTICLE_TRAIL_LENGTH:
-                self.trail.pop(0)
-            self.trail.append(self.position.copy())
-        
-        # 更新位置
-        self.position += self.velocity
-        
-        # 边界处理：穿透效果（从一边消失，从另一边出现）
-        if self.position[0] < 0:
-            self.position[0] = self.width
-        elif self.position[0] > self.width:
-            self.position[0] = 0
-        
-        if self.position[1] < 0:
-            self.position[1] = self.height
-        elif self.position[1] > self.height:
-            self.position[1] = 0
-        
-        # 重置加速度
-        self.acceleration = np.zeros(2, dtype=float)
-    
+        self._system = system
+        self.index = index
+
+    position = _state_property("positions", doc="粒子位置 (2,)，为状态数组的视图")
+    velocity = _state_property("velocities", doc="粒子速度 (2,)，为状态数组的视图")
+    acceleration = _state_property("accelerations", doc="粒子加速度 (2,)")
+    phase = _state_property("phases", doc="相位偏移")
+    noise_offset_x = _state_property("noise_offsets", 0, doc="噪声x偏移")
+    noise_offset_y = _state_property("noise_offsets", 1, doc="噪声y偏移")
+    orbit_radius = _state_property("orbit_radii", doc="轨道半径")
+    orbit_speed = _state_property("orbit_speeds", doc="角速度倍率")
+    orbit_angle = _state_property("orbit_angles", doc="轨道角度")
+
+    @property
+    def is_leader(self) -> bool:
+        """是否为核心粒子"""
+        return bool(self._system.leader_mask[self.index])
+
+    @property
+    def trail(self) -> np.ndarray:
+        """粒子轨迹 (k, 2)，旧→新（用于绘制拖尾效果，未启用拖尾时为空）"""
+        return self._system.get_trails(self.index)
+
+    @property
+    def max_speed(self) -> float:
+        """最大速度"""
+        return Config.MAX_SPEED
+
     def get_position(self) -> np.ndarray:
         """获取粒子位置"""
         return self.position
-    
+
     def get_velocity(self) -> np.ndarray:
         """获取粒子速度"""
         return self.velocity
 
 
+class SpatialHashGrid:
+    """均匀网格邻居索引
+
+    把场景划分为边长不小于查询半径的网格，每帧按网格编号对粒子排序一次，
+    之后可对任意一批查询点批量取出半径内的全部邻居对。
+    开启wrap时网格和距离都按环形场景处理（与粒子的穿透边界一致）。
+    同时记录每个网格的质心，粒子聚成一团时拥挤的网格可以整体当作一个排斥源
+    """
+
+    def __init__(self, width: int, height: int, cell_size: float, wrap: bool = True):
+        """初始化网格
+
+        Args:
+            width: 场景宽度
+            height: 场景高度
+            cell_size: 最小网格边长（通常取排斥半径）
+            wrap: 是否按环形场景处理边界
+        """
+        self.width = width
+        self.height = height
+        self.wrap = wrap
+        self.cols = max(1, int(width // cell_size))
+        self.rows = max(1, int(height // cell_size))
+        self.cell_width = width / self.cols
+        self.cell_height = height / self.rows
+
+        self.order = np.empty(0, dtype=np.intp)  # 按网格编号排序后的粒子索引
+        self.sorted_positions = np.empty((0, 2), dtype=float)
+        self.cell_start = np.zeros(self.cols * self.rows, dtype=np.intp)
+        self.cell_count = np.zeros(self.cols * self.rows, dtype=np.intp)
+        self.cell_centers = np.zeros((self.cols * self.rows, 2), dtype=float)  # 网格内粒子的质心
+
+    def _cell_coords(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """计算点所在的网格坐标（越界的点按wrap回绕或夹到边缘网格）"""
+        cx = np.floor(points[:, 0] / self.cell_width).astype(np.intp)
+        cy = np.floor(points[:, 1] / self.cell_height).astype(np.intp)
+        if self.wrap:
+            cx %= self.cols
+            cy %= self.rows
+        else:
+            np.clip(cx, 0, self.cols - 1, out=cx)
+            np.clip(cy, 0, self.rows - 1, out=cy)
+        return cx, cy
+
+    def build(self, positions: np.ndarray):
+        """根据当前粒子位置重建索引
+
+        Args:
+            positions: (N, 2) 粒子位置
+        """
+        cx, cy = self._cell_coords(positions)
+        cell_ids = cy * self.cols + cx
+        self.order = np.argsort(cell_ids, kind="stable")
+        # 按网格顺序保存位置快照，同一网格的粒子在内存中连续
+        self.sorted_positions = positions[self.order]
+        self.cell_count = np.bincount(cell_ids, minlength=self.cols * self.rows)
+        self.cell_start = np.cumsum(self.cell_count) - self.cell_count
+        # 质心按回绕后的坐标计算（恰好在边界上的粒子归入对边网格）
+        points = np.mod(positions, (self.width, self.height)) if self.wrap else positions
+        occupied = np.maximum(self.cell_count, 1)
+        self.cell_centers[:, 0] = np.bincount(cell_ids, points[:, 0], minlength=len(occupied)) / occupied
+        self.cell_centers[:, 1] = np.bincount(cell_ids, points[:, 1], minlength=len(occupied)) / occupied
+
+    def neighbour_offsets(self, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """半径radius覆盖的网格列偏移和行偏移"""
+        reach_x = int(np.ceil(radius / self.cell_width))
+        reach_y = int(np.ceil(radius / self.cell_height))
+        offsets_x = np.arange(-reach_x, reach_x + 1)
+        offsets_y = np.arange(-reach_y, reach_y + 1)
+        if self.wrap:
+            # 场景很小时偏移在取模后会重复，去重避免重复计数
+            offsets_x = np.unique(offsets_x % self.cols)
+            offsets_y = np.unique(offsets_y % self.rows)
+        return offsets_x, offsets_y
+
+    def _neighbour_cells(self, cx: np.ndarray, cy: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """列出每个查询点需要检查的网格
+
+        Returns:
+            (cells, valid) 形状均为 (Q, K)，valid标记非wrap模式下越界的网格
+        """
+        offsets_x, offsets_y = self.neighbour_offsets(radius)
+        off_x, off_y = np.meshgrid(offsets_x, offsets_y)
+        nx = cx[:, np.newaxis] + off_x.ravel()
+        ny = cy[:, np.newaxis] + off_y.ravel()
+        if self.wrap:
+            nx %= self.cols
+            ny %= self.rows
+            valid = np.ones(nx.shape, dtype=bool)
+        else:
+            valid = (nx >= 0) & (nx < self.cols) & (ny >= 0) & (ny < self.rows)
+            np.clip(nx, 0, self.cols - 1, out=nx)
+            np.clip(ny, 0, self.rows - 1, out=ny)
+        return ny * self.cols + nx, valid
+
+    def query_pairs(self, points: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """批量查询半径内的邻居
+
+        Args:
+            points: (Q, 2) 查询点
+            radius: 查询半径
+
+        Returns:
+            (query_ids, neighbour_ids, diff, dist_sq)
+            query_ids: 每个邻居对对应的查询点序号
+            neighbour_ids: 邻居粒子索引
+            diff: (P, 2) 邻居位置（建索引时的快照）减查询点位置，wrap模式下取最短环形差
+            dist_sq: 距离平方
+        """
+        cx, cy = self._cell_coords(points)
+        cells, valid = self._neighbour_cells(cx, cy, radius)
+        counts = np.where(valid, self.cell_count[cells], 0)
+        query_ids, slots, diff, dist_sq = self._expand_cells(points, cells, counts, radius)
+        return query_ids, self.order[slots], diff, dist_sq
+
+    def query_repulsors(self, points: np.ndarray, radius: float,
+                        capacity: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """批量查询半径内的排斥源：粒子数不超过capacity的网格逐个粒子，
+        更拥挤的网格整体当作一个位于质心、质量为粒子数的排斥源
+
+        每个查询点最多检查 网格数 × capacity 个粒子，粒子聚成一团时开销仍与粒子数成线性
+
+        Args:
+            points: (Q, 2) 查询点
+            radius: 查询半径
+            capacity: 逐个粒子计算的网格粒子数上限（0为不合并，等同query_pairs）
+
+        Returns:
+            (query_ids, masses, diff, dist_sq)，含义同BarnesHutTree.query_interactions
+        """
+        cx, cy = self._cell_coords(points)
+        cells, valid = self._neighbour_cells(cx, cy, radius)
+        counts = np.where(valid, self.cell_count[cells], 0)
+        crowded = counts > capacity if capacity > 0 else np.zeros(counts.shape, dtype=bool)
+        query_ids, _, diff, dist_sq = self._expand_cells(points, cells, np.where(crowded, 0, counts), radius)
+        masses = np.ones(len(query_ids))
+        if not crowded.any():
+            return query_ids, masses, diff, dist_sq
+
+        # 拥挤网格：质心在半径内时作为一个排斥源
+        crowded_query, crowded_slot = np.nonzero(crowded)
+        crowded_cells = cells[crowded_query, crowded_slot]
+        center_diff = self._wrap_diff(self.cell_centers[crowded_cells] - points[crowded_query])
+        center_dist_sq = center_diff[:, 0] ** 2 + center_diff[:, 1] ** 2
+        close = center_dist_sq < radius * radius
+        return (np.concatenate((query_ids, crowded_query[close])),
+                np.concatenate((masses, self.cell_count[crowded_cells[close]].astype(float))),
+                np.concatenate((diff, center_diff[close])), np.concatenate((dist_sq, center_dist_sq[close])))
+
+    def _wrap_diff(self, diff: np.ndarray) -> np.ndarray:
+        """wrap模式下把差向量换成最短环形差（原地修改）"""
+        if self.wrap:
+            diff[:, 0] -= self.width * np.round(diff[:, 0] / self.width)
+            diff[:, 1] -= self.height * np.round(diff[:, 1] / self.height)
+        return diff
+
+    def _expand_cells(self, points: np.ndarray, cells: np.ndarray, counts: np.ndarray,
+                      radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """把每个(查询点, 网格)的连续区间展开成候选邻居，只保留半径内的
+
+        Returns:
+            (query_ids, slots, diff, dist_sq) slots为邻居在sorted_positions中的下标
+        """
+        counts = counts.ravel()
+        starts = self.cell_start[cells].ravel()
+        total = int(counts.sum())
+        query_ids = np.repeat(np.repeat(np.arange(len(points)), cells.shape[1]), counts)
+        run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        slots = np.repeat(starts, counts) + run_offsets
+
+        diff = self._wrap_diff(self.sorted_positions[slots] - points[query_ids])
+        dist_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+
+        close = dist_sq < radius * radius
+        return query_ids[close], slots[close], diff[close], dist_sq[close]
+
+
+class BarnesHutTree:
+    """Barnes–Hut四叉树（线性存储）
+
+    粒子按Morton编码排序后，每层只保存非空节点：粒子区间、粒子数、质心和子节点区间。
+    查询时自上而下逐层批量遍历：离查询点超过半径的节点剪掉；查询点在节点外、
+    质心在半径内且 节点边长 < theta × 质心距离 时，把整个节点当作一个位于质心、
+    质量为粒子数的排斥源；其余节点继续展开，到叶子层逐个粒子精确计算。
+    theta=0时不做近似，结果与SpatialHashGrid.query_pairs一致
+    """
+
+    MAX_DEPTH = 15  # 每个坐标最多16位，Morton编码放得进int64
+
+    def __init__(self, width: int, height: int, leaf_size: float, wrap: bool = True):
+        """初始化四叉树
+
+        Args:
+            width: 场景宽度
+            height: 场景高度
+            leaf_size: 叶子节点的最大边长
+            wrap: 是否按环形场景处理边界
+        """
+        self.width = width
+        self.height = height
+        self.wrap = wrap
+        self.depth = int(np.clip(np.ceil(np.log2(max(width, height) / leaf_size)), 1, self.MAX_DEPTH))
+        self.leaf_width = width / (1 << self.depth)
+        self.leaf_height = height / (1 << self.depth)
+
+        self.sorted_positions = np.empty((0, 2), dtype=float)
+        # 每层（0为根）的节点数组
+        self.node_start: List[np.ndarray] = []  # 节点在sorted_positions中的起点
+        self.node_count: List[np.ndarray] = []  # 节点内粒子数
+        self.node_centers: List[np.ndarray] = []  # (M, 2) 节点包围盒中心
+        self.node_mass_centers: List[np.ndarray] = []  # (M, 2) 节点质心
+        self.child_start: List[np.ndarray] = []  # 子节点在下一层中的起点
+        self.child_count: List[np.ndarray] = []  # 非空子节点数
+
+    @staticmethod
+    def _spread_bits(values: np.ndarray) -> np.ndarray:
+        """把16位整数的各位间隔展开（用于交织成Morton编码）"""
+        values = values.astype(np.int64) & 0xFFFF
+        values = (values | (values << 8)) & 0x00FF00FF
+        values = (values | (values << 4)) & 0x0F0F0F0F
+        values = (values | (values << 2)) & 0x33333333
+        values = (values | (values << 1)) & 0x55555555
+        return values
+
+    def build(self, positions: np.ndarray):
+        """根据当前粒子位置重建四叉树
+
+        Args:
+            positions: (N, 2) 粒子位置
+        """
+        points = positions
+        if self.wrap:
+            # 穿透边界上的粒子（坐标恰好等于宽/高）归入对边，质心才落在节点内
+            points = np.mod(positions, (self.width, self.height))
+        side = 1 << self.depth
+        cx = np.clip(np.floor(points[:, 0] / self.leaf_width).astype(np.int64), 0, side - 1)
+        cy = np.clip(np.floor(points[:, 1] / self.leaf_height).astype(np.int64), 0, side - 1)
+        codes = self._spread_bits(cx) | (self._spread_bits(cy) << 1)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        cx = cx[order]
+        cy = cy[order]
+        self.sorted_positions = points[order]
+
+        for levels in (self.node_start, self.node_count, self.node_centers, self.node_mass_centers,
+                       self.child_start, self.child_count):
+            levels.clear()
+        if len(points) == 0:
+            return
+
+        # 从叶子层向上逐层合并：父节点编号 = 子节点编号 >> 2
+        child_keys = None
+        for level in range(self.depth, -1, -1):
+            shift = self.depth - level
+            level_codes = codes >> (2 * shift)
+            boundaries = np.flatnonzero(level_codes[1:] != level_codes[:-1]) + 1
+            starts = np.concatenate(([0], boundaries))
+            counts = np.diff(np.append(starts, len(codes)))
+            keys = level_codes[starts]
+
+            node_width = self.width / (1 << level)
+            node_height = self.height / (1 << level)
+            centers = np.empty((len(starts), 2), dtype=float)
+            centers[:, 0] = ((cx[starts] >> shift) + 0.5) * node_width
+            centers[:, 1] = ((cy[starts] >> shift) + 0.5) * node_height
+            mass_centers = np.add.reduceat(self.sorted_positions, starts, axis=0) / counts[:, np.newaxis]
+
+            if child_keys is None:
+                first_child = np.zeros(len(starts), dtype=np.intp)
+                children = np.zeros(len(starts), dtype=np.intp)
+            else:
+                first_child = np.searchsorted(child_keys, keys << 2)
+                children = np.searchsorted(child_keys, (keys + 1) << 2) - first_child
+            child_keys = keys
+
+            self.node_start.insert(0, starts)
+            self.node_count.insert(0, counts)
+            self.node_centers.insert(0, centers)
+            self.node_mass_centers.insert(0, mass_centers)
+            self.child_start.insert(0, first_child)
+            self.child_count.insert(0, children)
+
+    def level_offsets(self, num_points: int) -> np.ndarray:
+        """各层节点在扁平缓冲区中的起点（第level层最多min(4^level, 粒子数)个节点），末项为总容量"""
+        capacities = [min(4 ** level, num_points) for level in range(self.depth + 1)]
+        return np.concatenate(([0], np.cumsum(capacities))).astype(np.intp)
+
+    def export(self, positions: np.ndarray, nodes: np.ndarray, points: np.ndarray,
+               offsets: np.ndarray) -> List[int]:
+        """把build的结果写入预先分配的扁平缓冲区（供其他进程attach）
+
+        Args:
+            positions: (N, 2) 排序后的粒子位置
+            nodes: (4, 总容量) 粒子区间起点、粒子数、子节点起点、子节点数
+            points: (2, 总容量, 2) 节点包围盒中心、质心
+            offsets: level_offsets的结果
+
+        Returns:
+            各层的节点数
+        """
+        positions[:len(self.sorted_positions)] = self.sorted_positions
+        sizes = []
+        for level, offset in enumerate(offsets[:-1]):
+            size = len(self.node_start[level])
+            stop = offset + size
+            nodes[0, offset:stop] = self.node_start[level]
+            nodes[1, offset:stop] = self.node_count[level]
+            nodes[2, offset:stop] = self.child_start[level]
+            nodes[3, offset:stop] = self.child_count[level]
+            points[0, offset:stop] = self.node_centers[level]
+            points[1, offset:stop] = self.node_mass_centers[level]
+            sizes.append(size)
+        return sizes
+
+    def attach(self, positions: np.ndarray, nodes: np.ndarray, points: np.ndarray,
+               offsets: np.ndarray, sizes: List[int]):
+        """把各层数组指向export写好的扁平缓冲区（只建视图、不复制、不重建），之后可直接查询"""
+        self.sorted_positions = positions
+        self.node_start = [nodes[0, offset:offset + size] for offset, size in zip(offsets, sizes)]
+        self.node_count = [nodes[1, offset:offset + size] for offset, size in zip(offsets, sizes)]
+        self.child_start = [nodes[2, offset:offset + size] for offset, size in zip(offsets, sizes)]
+        self.child_count = [nodes[3, offset:offset + size] for offset, size in zip(offsets, sizes)]
+        self.node_centers = [points[0, offset:offset + size] for offset, size in zip(offsets, sizes)]
+        self.node_mass_centers = [points[1, offset:offset + size] for offset, size in zip(offsets, sizes)]
+
+    def _wrap_diff(self, diff: np.ndarray) -> np.ndarray:
+        """wrap模式下把差向量换成最短环形差（原地修改）"""
+        if self.wrap:
+            diff[:, 0] -= self.width * np.round(diff[:, 0] / self.width)
+            diff[:, 1] -= self.height * np.round(diff[:, 1] / self.height)
+        return diff
+
+    @staticmethod
+    def _expand(owners: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """把每个(所属查询点, 连续区间)展开成逐项列表
+
+        Returns:
+            (owner_ids, slots) 每一项对应的查询点序号和区间内的下标
+        """
+        total = int(counts.sum())
+        owner_ids = np.repeat(owners, counts)
+        run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return owner_ids, np.repeat(starts, counts) + run_offsets
+
+    def query_interactions(self, points: np.ndarray, radius: float,
+                           theta: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """批量查询半径内的排斥源（单个粒子或近似成质心的节点）
+
+        Args:
+            points: (Q, 2) 查询点
+            radius: 查询半径
+            theta: 张角阈值（节点边长/质心距离），越大越快、越不精确，0为精确计算
+
+        Returns:
+            (query_ids, masses, diff, dist_sq)
+            query_ids: 每个排斥源对应的查询点序号
+            masses: 排斥源包含的粒子数
+            diff: (P, 2) 排斥源位置（粒子或质心）减查询点位置，wrap模式下取最短环形差
+            dist_sq: 距离平方
+        """
+        radius_sq = radius * radius
+        theta_sq = theta * theta
+        found_ids, found_masses, found_diff, found_dist_sq = [], [], [], []
+
+        # 当前层待检查的(查询点, 节点)对，从根节点开始
+        pair_query = np.arange(len(points)) if self.node_count else np.empty(0, dtype=np.intp)
+        pair_node = np.zeros(len(pair_query), dtype=np.intp)
+        for level in range(self.depth + 1):
+            if len(pair_query) == 0:
+                break
+            half_width = self.width / (1 << level) / 2
+            half_height = self.height / (1 << level) / 2
+            query_points = points[pair_query]
+
+            # 剪掉包围盒与查询圆不相交的节点
+            offset = np.abs(self._wrap_diff(self.node_centers[level][pair_node] - query_points))
+            gap_x = np.maximum(offset[:, 0] - half_width, 0.0)
+            gap_y = np.maximum(offset[:, 1] - half_height, 0.0)
+            gap_sq = gap_x ** 2 + gap_y ** 2
+            reach_sq = (offset[:, 0] + half_width) ** 2 + (offset[:, 1] + half_height) ** 2
+            keep = gap_sq < radius_sq
+            pair_query, pair_node, query_points, gap_sq, reach_sq = (
+                pair_query[keep], pair_node[keep], query_points[keep], gap_sq[keep], reach_sq[keep])
+
+            counts = self.node_count[level][pair_node]
+            if level == self.depth:
+                # 叶子层：逐个粒子精确计算
+                query_ids, slots = self._expand(pair_query, self.node_start[level][pair_node], counts)
+                diff = self._wrap_diff(self.sorted_positions[slots] - points[query_ids])
+                dist_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+                close = dist_sq < radius_sq
+                found_ids.append(query_ids[close])
+                found_masses.append(np.ones(np.count_nonzero(close)))
+                found_diff.append(diff[close])
+                found_dist_sq.append(dist_sq[close])
+                break
+
+            # 单粒子节点（质心即粒子）和足够远的节点直接作为排斥源
+            diff = self._wrap_diff(self.node_mass_centers[level][pair_node] - query_points)
+            dist_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+            size_sq = (2 * max(half_width, half_height)) ** 2
+            distant = (size_sq < theta_sq * gap_sq) & (reach_sq < radius_sq)
+            resolved = (counts == 1) | distant
+            accept = resolved & (dist_sq < radius_sq)
+            found_ids.append(pair_query[accept])
+            found_masses.append(counts[accept].astype(float))
+            found_diff.append(diff[accept])
+            found_dist_sq.append(dist_sq[accept])
+
+            # 其余节点展开到下一层
+            opened = ~resolved
+            pair_query, pair_node = self._expand(pair_query[opened], self.child_start[level][pair_node[opened]],
+                                                 self.child_count[level][pair_node[opened]])
+
+        if not found_ids:
+            return (np.empty(0, dtype=np.intp), np.empty(0), np.empty((0, 2)), np.empty(0))
+        return (np.concatenate(found_ids), np.concatenate(found_masses),
+                np.concatenate(found_diff), np.concatenate(found_dist_sq))
+
+
+class NoiseField:
+    """有机噪声场 - 三层正余弦叠加
+
+    对整组坐标一次求值；可选预计算一张可平铺的二维查找表，
+    用双线性插值代替三角函数，粒子数量很大时更省时。
+    各层频率都是0.1的整数倍，噪声在x、y方向都以20π为周期，
+    因此查找表首尾无缝衔接
+    """
+
+    # 每层: (x频率, x相位, y频率, y相位, 权重)
+    OCTAVES = (
+        (1.0, 0.0, 1.0, 0.0, 0.5),
+        (2.3, 1.3, 2.1, 0.7, 0.3),
+        (4.1, 2.7, 3.9, 1.5, 0.2),
+    )
+    PERIOD = 20 * np.pi
+
+    def __init__(self, use_lut: bool = False, lut_size: int = 1024):
+        """初始化噪声场
+
+        Args:
+            use_lut: 是否使用查找表采样
+            lut_size: 查找表每个周期的采样数
+        """
+        self.use_lut = use_lut
+        self.lut_size = lut_size
+        self.lut: Optional[np.ndarray] = self._build_lut(lut_size) if use_lut else None
+
+    def evaluate(self, x, y):
+        """直接计算噪声值（支持标量或数组输入）"""
+        value = 0.0
+        for fx, px, fy, py, weight in self.OCTAVES:
+            value = value + np.sin(x * fx + px) * np.cos(y * fy + py) * weight
+        return value
+
+    def sample(self, x, y):
+        """采样噪声值，启用查找表时使用双线性插值"""
+        if self.lut is None:
+            return self.evaluate(x, y)
+        return self._sample_lut(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+    def _build_lut(self, size: int) -> np.ndarray:
+        """预计算一个周期的噪声表，多存一行一列便于插值时取右/下邻点"""
+        coords = np.arange(size + 1) * (self.PERIOD / size)
+        table = np.zeros((size + 1, size + 1), dtype=np.float32)
+        # 每层都是x、y可分离的乘积，用外积即可得到整张表
+        for fx, px, fy, py, weight in self.OCTAVES:
+            table += np.outer(np.cos(coords * fy + py), np.sin(coords * fx + px) * weight)
+        return table
+
+    def _sample_lut(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """在查找表上做双线性插值"""
+        size = self.lut_size
+        u = np.mod(x, self.PERIOD) * (size / self.PERIOD)
+        v = np.mod(y, self.PERIOD) * (size / self.PERIOD)
+        i0 = np.minimum(u.astype(np.intp), size - 1)
+        j0 = np.minimum(v.astype(np.intp), size - 1)
+        fu = u - i0
+        fv = v - j0
+
+        flat = self.lut.ravel()
+        idx = j0 * (size + 1) + i0
+        top_left = flat[idx]
+        top_right = flat[idx + 1]
+        bottom_left = flat[idx + size + 1]
+        bottom_right = flat[idx + size + 2]
+        top = top_left + (top_right - top_left) * fu
+        bottom = bottom_left + (bottom_right - bottom_left) * fu
+        return top + (bottom - top) * fv
+
+
+# === 可选的Numba编译内核 ===
+# 内核写成逐粒子循环的普通函数：安装了numba时用@njit(parallel=True)编译，
+# 每个粒子一次遍历完成受力累加、力限幅、速度限幅、阻尼和边界穿透，
+# 不产生中间数组；未安装时ParticleSystem使用NumPy数组实现
+try:
+    import numba
+except ImportError:
+    numba = None
+
+prange = numba.prange if numba is not None else range
+
+
+def _jit(**options):
+    """安装了numba时编译函数（首次调用时编译），否则原样返回普通Python函数"""
+    def decorate(func):
+        return numba.njit(**options)(func) if numba is not None else func
+    return decorate
+
+
+@_jit(inline="always")
+def _integrate_particle(i, fx, fy, positions, velocities, accelerations,
+                        max_force, max_speed, min_speed, damping, width, height, still):
+    """对单个粒子施加力并更新速度和位置（与ParticleSystem._integrate一致）"""
+    # 限制力的大小
+    force_mag = np.sqrt(fx * fx + fy * fy)
+    if force_mag > max_force:
+        fx *= max_force / force_mag
+        fy *= max_force / force_mag
+    ax = accelerations[i, 0] + fx
+    ay = accelerations[i, 1] + fy
+
+    # 更新速度并限幅
+    vx = velocities[i, 0] + ax
+    vy = velocities[i, 1] + ay
+    speed = np.sqrt(vx * vx + vy * vy)
+    if speed == 0.0:
+        # 静止粒子的随机扰动留给调用方（保持与NumPy全局随机数序列一致）
+        still[i] = True
+        accelerations[i, 0] = 0.0
+        accelerations[i, 1] = 0.0
+        return
+    if speed > max_speed:
+        vx *= max_speed / speed
+        vy *= max_speed / speed
+    elif speed < min_speed:
+        vx *= min_speed / speed
+        vy *= min_speed / speed
+    vx *= damping
+    vy *= damping
+    velocities[i, 0] = vx
+    velocities[i, 1] = vy
+
+    # 更新位置，边界穿透
+    x = positions[i, 0] + vx
+    y = positions[i, 1] + vy
+    if x < 0:
+        x = width
+    elif x > width:
+        x = 0.0
+    if y < 0:
+        y = height
+    elif y > height:
+        y = 0.0
+    positions[i, 0] = x
+    positions[i, 1] = y
+    accelerations[i, 0] = 0.0
+    accelerations[i, 1] = 0.0
+
+
+@_jit(parallel=True, cache=True)
+def _integrate_kernel(positions, velocities, accelerations, forces, start,
+                      max_force, max_speed, min_speed, damping, width, height, still):
+    """对粒子start, start+1, ...逐个积分，forces[k]对应粒子start+k"""
+    for k in prange(forces.shape[0]):
+        _integrate_particle(start + k, forces[k, 0], forces[k, 1], positions, velocities, accelerations,
+                            max_force, max_speed, min_speed, damping, width, height, still)
+
+
+@_jit(inline="always")
+def _noise_value(x, y, octaves):
+    """三层正余弦噪声（与NoiseField.evaluate一致）"""
+    value = 0.0
+    for o in range(octaves.shape[0]):
+        value += np.sin(x * octaves[o, 0] + octaves[o, 1]) * np.cos(y * octaves[o, 2] + octaves[o, 3]) * octaves[o, 4]
+    return value
+
+
+@_jit(parallel=True, cache=True)
+def _follow_step_kernel(positions, velocities, accelerations, phases, noise_offsets, start, stop,
+                        leader, target, has_target, effect_strength, attraction, time_value, noise_t, octaves,
+                        sorted_positions, cell_start, cell_count, cell_centers, cell_capacity,
+                        cols, rows, cell_width, cell_height,
+                        offsets_x, offsets_y, wrap, repulsion_radius, repulsion_strength,
+                        noise_strength, min_distance, orbit_strength,
+                        max_force, max_speed, min_speed, damping, width, height, still):
+    """跟随模式的一步：受力（引力/排斥/噪声/晃动/软排斥/轨道）与积分合并为单次遍历
+
+    与ParticleSystem._follow_forces + _integrate一致；软排斥直接遍历邻居网格（拥挤网格按质心合并），
+    邻居位置取自建网格时的快照，因此各粒子可并行地原地更新
+    """
+    radius_sq = repulsion_radius * repulsion_radius
+    for k in prange(stop - start):
+        i = start + k
+        px = positions[i, 0]
+        py = positions[i, 1]
+        phase = phases[i]
+
+        # 指向核心粒子
+        lx = leader[0] - px
+        ly = leader[1] - py
+        dist = np.sqrt(lx * lx + ly * ly)
+        dx = lx / dist if dist > 0 else 0.0
+        dy = ly / dist if dist > 0 else 0.0
+        fx = 0.0
+        fy = 0.0
+
+        # 特效：朝目标方向的爆发力
+        if effect_strength > 0 and has_target:
+            tx = target[0] - px
+            ty = target[1] - py
+            tdist = np.sqrt(tx * tx + ty * ty)
+            if tdist > 0:
+                fx += tx / tdist * effect_strength * 15.0
+                fy += ty / tdist * effect_strength * 15.0
+
+        attract = False
+        if attraction > 0:
+            attract = dist > min_distance
+            if attract:
+                strength = attraction * min(dist / 80.0, 4.0) * max_speed
+                fx += dx * strength
+                fy += dy * strength
+        if attraction < 0:
+            fx -= dx * abs(attraction) * max_speed
+            fy -= dy * abs(attraction) * max_speed
+        elif not attract and dist < min_distance:
+            repel = (min_distance - dist) / min_distance * 2.0
+            fx -= dx * repel
+            fy -= dy * repel
+
+        # 有机噪声
+        ox = noise_offsets[i, 0]
+        oy = noise_offsets[i, 1]
+        fx += _noise_value(ox + noise_t, oy, octaves) * noise_strength
+        fy += _noise_value(ox, oy + noise_t, octaves) * noise_strength
+
+        # 自然晃动
+        fx += np.sin(time_value * 2.0 + phase) * 0.5
+        fy += np.cos(time_value * 1.5 + phase * 1.3) * 0.5
+
+        # 粒子间软排斥：遍历所在网格及周围网格
+        cx = int(np.floor(px / cell_width))
+        cy = int(np.floor(py / cell_height))
+        if wrap:
+            cx %= cols
+            cy %= rows
+        else:
+            cx = min(max(cx, 0), cols - 1)
+            cy = min(max(cy, 0), rows - 1)
+        for oy_index in range(offsets_y.shape[0]):
+            ny = cy + offsets_y[oy_index]
+            if wrap:
+                ny %= rows
+            elif ny < 0 or ny >= rows:
+                continue
+            for ox_index in range(offsets_x.shape[0]):
+                nx = cx + offsets_x[ox_index]
+                if wrap:
+                    nx %= cols
+                elif nx < 0 or nx >= cols:
+                    continue
+                cell = ny * cols + nx
+                if cell_capacity > 0 and cell_count[cell] > cell_capacity:
+                    # 拥挤网格按质心合并为一个排斥源
+                    ddx = cell_centers[cell, 0] - px
+                    ddy = cell_centers[cell, 1] - py
+                    if wrap:
+                        ddx -= width * np.rint(ddx / width)
+                        ddy -= height * np.rint(ddy / height)
+                    dist_sq = ddx * ddx + ddy * ddy
+                    if dist_sq < radius_sq:
+                        weight = cell_count[cell] * repulsion_strength / (dist_sq + 1) / (np.sqrt(dist_sq) + 0.1)
+                        fx -= weight * ddx
+                        fy -= weight * ddy
+                    continue
+                first = cell_start[cell]
+                for slot in range(first, first + cell_count[cell]):
+                    ddx = sorted_positions[slot, 0] - px
+                    ddy = sorted_positions[slot, 1] - py
+                    if wrap:
+                        ddx -= width * np.rint(ddx / width)
+                        ddy -= height * np.rint(ddy / height)
+                    dist_sq = ddx * ddx + ddy * ddy
+                    if dist_sq < radius_sq:
+                        weight = repulsion_strength / (dist_sq + 1) / (np.sqrt(dist_sq) + 0.1)
+                        fx -= weight * ddx
+                        fy -= weight * ddy
+
+        # 轻微的轨道效果
+        if dist > 10:
+            orbit = np.sin(time_value + phase) * orbit_strength / (dist + 1)
+            fx -= ly * orbit
+            fy += lx * orbit
+
+        _integrate_particle(i, fx, fy, positions, velocities, accelerations,
+                            max_force, max_speed, min_speed, damping, width, height, still)
+
+
 class ParticleSystem:
     """粒子系统类 - 核心引导粒子机制
-    
+
     使用一个核心粒子(leader)引导其他粒子，
     手势仅控制核心粒子，其他粒子通过吸引力跟随
+
+    所有粒子状态以连续数组保存（位置/速度/加速度为(N, 2)，
+    相位/轨道参数为(N,)），每种模式的受力都按整个数组计算
     """
-    
-    def __init__(self, width: int, height: int, num_particles: int):
-        """初始化粒子系统"""
+
+    MAX_FORCE = 3.5  # 单帧受力上限，避免异常抖动
+    DAMPING = 0.97  # 速度阻尼
+    REPULSION_BATCH = 4096  # 软排斥每批查询的粒子数（限制邻居对数组的内存）
+    STATE_DTYPE = np.float32  # 状态数组精度（像素坐标用单精度足够，内存减半）
+    # 粒子状态数组
+    STATE_ARRAYS = ("positions", "velocities", "accelerations", "phases", "noise_offsets",
+                    "orbit_radii", "orbit_speeds", "orbit_angles")
+
+    def __init__(self, width: int, height: int, num_particles: int, backend: Optional[str] = None):
+        """初始化粒子系统
+
+        Args:
+            width: 场景宽度
+            height: 场景高度
+            num_particles: 粒子数量（含核心粒子）
+            backend: 更新实现，"numpy" 或 "numba"，None时取Config.PARTICLE_BACKEND
+        """
+        self.backend = self._resolve_backend(backend or Config.PARTICLE_BACKEND)
         self.width = width
         self.height = height
-        self.particles: List[Particle] = []
+        self.num_particles = num_particles
         self.time = 0.0  # 用于有机噪声
-        
+
         # 初始化粒子，在屏幕中心区域随机生成
         center_x, center_y = width // 2, height // 2
-        for i in range(num_particles):
-            x = center_x + np.random.randn() * 80
-            y = center_y + np.random.randn() * 80
-            p = Particle(x, y, width, height)
-            # 为每个粒子分配唯一的相位偏移
-            p.phase = np.random.uniform(0, 2 * np.pi)
-            p.noise_offset_x = np.random.uniform(0, 1000)
-            p.noise_offset_y = np.random.uniform(0, 1000)
-            p.is_leader = False  # 默认不是核心粒子
-            self.particles.append(p)
-        
-        # 指定第一个粒子为核心引导粒子
-        self.leader = self.particles[0]
-        self.leader.is_leader = True
+        dtype = self.STATE_DTYPE
+        self.positions = np.empty((num_particles, 2), dtype=dtype)
+        self.positions[:, 0] = center_x + np.random.randn(num_particles) * 80
+        self.positions[:, 1] = center_y + np.random.randn(num_particles) * 80
+        # 随机初始速度
+        self.velocities = (np.random.randn(num_particles, 2)
+                           * np.random.uniform(3.0, 8.0, (num_particles, 1))).astype(dtype)
+        self.accelerations = np.zeros((num_particles, 2), dtype=dtype)
+
+        # 为每个粒子分配唯一的相位偏移和噪声偏移
+        self.phases = np.random.uniform(0, 2 * np.pi, num_particles).astype(dtype)
+        self.noise_offsets = np.random.uniform(0, 1000, (num_particles, 2)).astype(dtype)
+
+        # 为每个粒子分配轨道半径和角速度
+        self.orbit_radii = np.random.uniform(50, 200, num_particles).astype(dtype)  # 轨道半径
+        self.orbit_speeds = np.random.uniform(0.8, 1.5, num_particles).astype(dtype)  # 角速度倍率
+        self.orbit_angles = np.random.uniform(0, 2 * np.pi, num_particles).astype(dtype)  # 初始角度
+
+        # 粒子轨迹环形缓冲区 (N, L, 2)（仅在启用拖尾时记录）：
+        # trail_head为本步写入的槽位，trail_count为已记录的帧数
+        self.trail_length = Config.PARTICLE_TRAIL_LENGTH
+        self.trail_buffer = np.zeros((num_particles, self.trail_length, 2), dtype=dtype)
+        self.trail_head = -1
+        self.trail_count = 0
+
+        # 粒子视图按需创建（粒子很多时不为每个粒子常驻一个Python对象）
+        self._particles: Optional[List[Particle]] = None
+
+        # 指定第一个粒子为核心引导粒子，其余粒子为跟随粒子
+        self.leader_index = 0
+        self.leader_mask = np.zeros(num_particles, dtype=bool)
+        self.leader_mask[self.leader_index] = True
+        self.followers = slice(1, None)
+        self.leader = Particle(self, self.leader_index)
         # 核心粒子初始位置在中心
         self.leader.position = np.array([center_x, center_y], dtype=float)
-        
+
+        # 有机噪声场
+        self.noise_field = NoiseField(Config.NOISE_USE_LUT, Config.NOISE_LUT_SIZE)
+
+        # 邻居网格（网格边长≈软排斥半径），每帧重建一次
+        self.neighbor_grid = SpatialHashGrid(width, height, Config.SOFT_REPULSION_RADIUS)
+        # 软排斥四叉树（仅barnes_hut模式），与网格同时重建
+        self.repulsion_tree = self._make_repulsion_tree(width, height)
+
         # 目标位置和状态
         self.target: Optional[np.ndarray] = None
         self.direction: Optional[np.ndarray] = None  # pointing方向
@@ -209,21 +1009,37 @@ class ParticleSystem:
         self.mode: str = "free"  # "free", "gather", "scatter", "pointing"
         self.prev_mode: str = "free"  # 上一帧的模式
         self.current_attraction = Config.LEADER_ATTRACTION  # 动态引力
-        
+
         # 特效系统
         self.effect_timer = 0.0  # 特效计时器
         self.effect_type = None  # 特效类型
-        
-        # 为每个粒子分配轨道半径和角速度
-        for p in self.particles:
-            p.orbit_radius = np.random.uniform(50, 200)  # 轨道半径
-            p.orbit_speed = np.random.uniform(0.8, 1.5)  # 角速度倍率
-            p.orbit_angle = np.random.uniform(0, 2 * np.pi)  # 初始角度
-    
+
+        # 编译内核标记的静止粒子（需要随机扰动）
+        self._still = np.zeros(num_particles, dtype=bool)
+
+    @staticmethod
+    def _resolve_backend(backend: str) -> str:
+        """检查更新实现是否可用，numba未安装时回退到numpy"""
+        if backend not in ("numpy", "numba"):
+            raise ValueError(f"未知的粒子更新实现: {backend}")
+        if backend == "numba" and numba is None:
+            print("未安装numba，粒子系统使用NumPy实现")
+            return "numpy"
+        return backend
+
+    @staticmethod
+    def _make_repulsion_tree(width: int, height: int) -> Optional[BarnesHutTree]:
+        """按Config.REPULSION_METHOD创建软排斥四叉树，逐对精确计算时返回None"""
+        if Config.REPULSION_METHOD not in ("grid", "barnes_hut"):
+            raise ValueError(f"未知的软排斥计算方式: {Config.REPULSION_METHOD}")
+        if Config.REPULSION_METHOD == "grid":
+            return None
+        return BarnesHutTree(width, height, Config.BARNES_HUT_LEAF_SIZE)
+
     def set_target(self, x: float, y: float):
         """设置目标位置"""
         self.target = np.array([x, y], dtype=float)
-    
+
     def set_direction(self, dx: float, dy: float):
         """设置指向方向"""
         mag = np.sqrt(dx*dx + dy*dy)
@@ -231,11 +1047,11 @@ class ParticleSystem:
             self.direction = np.array([dx/mag, dy/mag], dtype=float)
         else:
             self.direction = None
-    
+
     def set_scatter_center(self, x: float, y: float):
         """设置scatter模式的圆心位置"""
         self.scatter_center = np.array([x, y], dtype=float)
-    
+
     def set_mode(self, mode: str):
         """设置粒子行为模式"""
         # 检测状态变化，触发特效
@@ -243,11 +1059,11 @@ class ParticleSystem:
             self._trigger_effect(self.mode, mode)
             self.prev_mode = self.mode
         self.mode = mode
-    
+
     def _trigger_effect(self, old_mode: str, new_mode: str):
         """触发状态变化特效"""
         self.effect_timer = 30  # 特效持续约0.5秒（30帧）
-        
+
         if new_mode == "gather" or new_mode == "pointing":
             # 聚集效果：粒子加速向内
             self.effect_type = "gather_pulse"
@@ -257,25 +1073,49 @@ class ParticleSystem:
         elif new_mode == "free":
             # 释放效果：轻微扩散
             self.effect_type = "release"
-    
-    def _simplex_noise(self, x: float, y: float) -> float:
-        """简化的有机噪声函数"""
-        value = np.sin(x * 1.0) * np.cos(y * 1.0) * 0.5
-        value += np.sin(x * 2.3 + 1.3) * np.cos(y * 2.1 + 0.7) * 0.3
-        value += np.sin(x * 4.1 + 2.7) * np.cos(y * 3.9 + 1.5) * 0.2
-        return value
-    
+
+    def _noise_force(self, sl: slice, speed: float) -> np.ndarray:
+        """计算一组粒子的有机噪声力
+
+        Args:
+            sl: 粒子切片
+            speed: 噪声随时间推进的速度倍率
+
+        Returns:
+            (n, 2) 噪声力
+        """
+        offset_x = self.noise_offsets[sl, 0]
+        offset_y = self.noise_offsets[sl, 1]
+        t = self.time * Config.NOISE_SCALE * speed
+        noise = np.empty((len(offset_x), 2), dtype=float)
+        noise[:, 0] = self.noise_field.sample(offset_x + t, offset_y)
+        noise[:, 1] = self.noise_field.sample(offset_x, offset_y + t)
+        return noise
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """逐行归一化向量，零向量保持为零
+
+        Returns:
+            (单位向量, 长度)
+        """
+        lengths = np.hypot(vectors[:, 0], vectors[:, 1])
+        units = np.zeros_like(vectors)
+        np.divide(vectors, lengths[:, np.newaxis], out=units, where=lengths[:, np.newaxis] > 0)
+        return units, lengths
+
     def update(self):
         """更新所有粒子 - 核心引导粒子机制"""
         self.time += 0.02
-        
+        self._advance_trails()
+
         # 更新特效计时器
         if self.effect_timer > 0:
             self.effect_timer -= 1
-        
+
         # === 步骤1: 更新核心粒子 ===
         leader_force = np.zeros(2, dtype=float)
-        
+
         # free模式下 leader也保持惯性或缓慢漂浮
         if self.mode == "free":
             if self.prev_mode == "gather":
@@ -301,12 +1141,12 @@ class ParticleSystem:
         elif self.target is not None and self.mode != "scatter" and self.mode != "gather":
             to_target = self.target - self.leader.position
             distance = np.linalg.norm(to_target)
-            
+
             if distance > 5:
                 direction = to_target / distance
                 speed_factor = min(distance / Config.ARRIVE_RADIUS, 1.0)
                 leader_force += direction * Config.ATTRACTION_STRENGTH * Config.MAX_SPEED * speed_factor * 2.0
-        
+
         # scatter模式：leader围绕中心圆周运动
         if self.mode == "scatter" and self.scatter_center is not None:
             # leader也做圆周运动（加快角速度）
@@ -320,25 +1160,19 @@ class ParticleSystem:
             scatter_x = np.sin(self.time * 1.5 + self.leader.phase) * 2.0
             scatter_y = np.cos(self.time * 1.3 + self.leader.phase * 0.7) * 2.0
             leader_force += np.array([scatter_x, scatter_y])
-        
+
         # 核心粒子的轻微噪声
-        noise_x = self._simplex_noise(
-            self.leader.noise_offset_x + self.time * Config.NOISE_SCALE * 50,
-            self.leader.noise_offset_y
-        )
-        noise_y = self._simplex_noise(
-            self.leader.noise_offset_x,
-            self.leader.noise_offset_y + self.time * Config.NOISE_SCALE * 50
-        )
-        leader_force += np.array([noise_x, noise_y]) * Config.NOISE_STRENGTH * 0.5
-        
-        self.leader.apply_force(leader_force)
-        self.leader.update(is_leader=True)
-        
+        leader_slice = slice(self.leader_index, self.leader_index + 1)
+        leader_force += self._noise_force(leader_slice, 50)[0] * Config.NOISE_STRENGTH * 0.5
+
+        self._integrate(leader_force[np.newaxis, :], leader_slice)
+
         # === 步骤2: 更新其他粒子（动态引力） ===
-        leader_pos = self.leader.position
-        positions = np.array([p.position for p in self.particles])
-        
+        # 按本帧位置重建邻居网格（跟随粒子移动前的快照）
+        self.neighbor_grid.build(self.positions)
+        if self.repulsion_tree is not None:
+            self.repulsion_tree.build(self.positions)
+
         # 动态调节引力
         if self.mode == "gather":
             # gather模式：粒子朝目标方向突然加速
@@ -350,253 +1184,791 @@ class ParticleSystem:
             self.current_attraction = 0.0
         else:
             self.current_attraction = Config.LEADER_ATTRACTION * 0.3
-        
-        for i, particle in enumerate(self.particles):
-            if particle.is_leader:
-                continue
-            
-            force = np.zeros(2, dtype=float)
-            
-            # === scatter模式：圆周运动 ===
-            if self.mode == "scatter" and self.scatter_center is not None:
-                # 更新粒子的轨道角度（加快角速度）
-                particle.orbit_angle += 0.08 * particle.orbit_speed
-                
-                # 计算目标位置（圆周上的点）
-                target_x = self.scatter_center[0] + np.cos(particle.orbit_angle) * particle.orbit_radius
-                target_y = self.scatter_center[1] + np.sin(particle.orbit_angle) * particle.orbit_radius
-                target_pos = np.array([target_x, target_y])
-                
-                # 向目标位置移动的力
-                to_orbit = target_pos - particle.position
-                dist_to_orbit = np.linalg.norm(to_orbit)
-                if dist_to_orbit > 1:
-                    orbit_force = (to_orbit / dist_to_orbit) * min(dist_to_orbit * 0.2, 5.0)
-                    force += orbit_force
-                
-                # 添加切向速度（旋转力）
-                tangent = np.array([-np.sin(particle.orbit_angle), np.cos(particle.orbit_angle)])
-                force += tangent * 4.0 * particle.orbit_speed
-                
-                # 有机噪声扰动
-                noise_x = self._simplex_noise(
-                    particle.noise_offset_x + self.time * Config.NOISE_SCALE * 100,
-                    particle.noise_offset_y
-                ) * 0.5
-                noise_y = self._simplex_noise(
-                    particle.noise_offset_x,
-                    particle.noise_offset_y + self.time * Config.NOISE_SCALE * 100
-                ) * 0.5
-                force += np.array([noise_x, noise_y])
-                
-                # 特效处理
-                if self.effect_timer > 0 and self.effect_type == "scatter_burst":
-                    effect_strength = self.effect_timer / 30.0
-                    to_out = particle.position - self.scatter_center
-                    dist = np.linalg.norm(to_out)
-                    if dist > 0:
-                        force += (to_out / dist) * effect_strength * 3.0
-                
-                particle.apply_force(force)
-                particle.update(is_leader=False)
-                continue
-            
-            # === free模式：保持惯性或缓慢漂浮 ===
-            if self.mode == "free":
-                # 如果是从 gather 模式切换过来，保持冲刺惯性
-                if self.prev_mode == "gather":
-                    # 只施加很小的阻力，让粒子保持惯性继续移动
-                    particle.velocity *= 0.995  # 很小的衰减
-                    
-                    # 极小的随机扰动
-                    noise_x = self._simplex_noise(
-                        particle.noise_offset_x + self.time * Config.NOISE_SCALE * 30,
-                        particle.noise_offset_y
-                    ) * 0.05
-                    noise_y = self._simplex_noise(
-                        particle.noise_offset_x,
-                        particle.noise_offset_y + self.time * Config.NOISE_SCALE * 30
-                    ) * 0.05
-                    force += np.array([noise_x, noise_y])
-                else:
-                    # 正常的缓慢漂浮模式
-                    slow_factor = 0.15  # 15%的速度
-                    scatter_noise_x = self._simplex_noise(
-                        particle.noise_offset_x + self.time * Config.NOISE_SCALE * 50,
-                        particle.noise_offset_y
-                    ) * slow_factor
-                    scatter_noise_y = self._simplex_noise(
-                        particle.noise_offset_x,
-                        particle.noise_offset_y + self.time * Config.NOISE_SCALE * 50
-                    ) * slow_factor
-                    force += np.array([scatter_noise_x, scatter_noise_y])
-                    
-                    # 轻柔的漂浮摆动
-                    sway_mult = 0.1
-                    random_sway_x = np.sin(self.time * 0.5 + particle.phase * 2.0) * sway_mult
-                    random_sway_y = np.cos(self.time * 0.4 + particle.phase * 1.7) * sway_mult
-                    force += np.array([random_sway_x, random_sway_y])
-                    
-                    # 强制降低粒子速度（保持缓慢）
-                    particle.velocity *= 0.92
-                
-                # 特效处理
-                if self.effect_timer > 0 and self.effect_type == "release":
-                    effect_strength = self.effect_timer / 30.0
-                    force += np.random.randn(2) * effect_strength * 0.3
-                
-                # 应用力
-                particle.apply_force(force)
-                particle.update(is_leader=False)
-                continue
-            
-            # === gather模式：猛烈冲刺 ===
-            if self.mode == "gather" and self.target is not None:
-                # 朝目标方向的猛烈冲刺（3-5倍速度）
-                to_target = self.target - particle.position
-                dist_to_target = np.linalg.norm(to_target)
-                
-                # 先计算方向矢量（在任何情况下都定义）
-                if dist_to_target > 0:
-                    burst_dir = to_target / dist_to_target
-                else:
-                    burst_dir = np.array([0.0, 0.0])
-                
-                # 只在距离较远时施加常规冲刺力
-                if dist_to_target > 5:
-                    # 强烈的冲刺力
-                    burst_force = burst_dir * Config.MAX_SPEED * 4.0
-                    force += burst_force
-                
-                # 轻微噪声扰动
-                noise_x = self._simplex_noise(
-                    particle.noise_offset_x + self.time * Config.NOISE_SCALE * 100,
-                    particle.noise_offset_y
-                ) * 0.3
-                noise_y = self._simplex_noise(
-                    particle.noise_offset_x,
-                    particle.noise_offset_y + self.time * Config.NOISE_SCALE * 100
-                ) * 0.3
-                force += np.array([noise_x, noise_y])
-                
-                # 特效处理
-                if self.effect_timer > 0 and self.effect_type == "gather_pulse":
-                    effect_strength = self.effect_timer / 30.0
-                    force += burst_dir * effect_strength * 20.0
-                
-                particle.apply_force(force)
-                particle.update(is_leader=False)
-                continue
-            
-            # === 非scatter/free模式：正常引力逻辑 ===
-            to_leader = leader_pos - particle.position
-            dist_to_leader = np.linalg.norm(to_leader)
-            
-            # 特效处理
-            if self.effect_timer > 0:
-                effect_strength = self.effect_timer / 30.0
-                if self.effect_type == "gather_pulse":
-                    # gather模式：朝目标方向的强烈爆发力
-                    if self.target is not None:
-                        to_target = self.target - particle.position
-                        dist_to_target = np.linalg.norm(to_target)
-                        if dist_to_target > 0:
-                            burst_dir = to_target / dist_to_target
-                            burst_force = burst_dir * effect_strength * 15.0
-                            force += burst_force
-            
-            if self.current_attraction > 0 and dist_to_leader > Config.LEADER_MIN_DISTANCE:
-                # 引力模式：距离越远，吸引力越大
-                attraction_strength = self.current_attraction * min(dist_to_leader / 80.0, 4.0)
-                direction_to_leader = to_leader / dist_to_leader
-                leader_attraction = direction_to_leader * attraction_strength * Config.MAX_SPEED
-                force += leader_attraction
-            elif self.current_attraction < 0:
-                # 排斥模式：轻微远离核心粒子
-                if dist_to_leader > 0:
-                    repel_strength = abs(self.current_attraction) * Config.MAX_SPEED
-                    direction_from_leader = -to_leader / dist_to_leader
-                    force += direction_from_leader * repel_strength
-            elif dist_to_leader > 0 and dist_to_leader < Config.LEADER_MIN_DISTANCE:
-                # 太近时轻微排斥
-                repel_strength = (Config.LEADER_MIN_DISTANCE - dist_to_leader) / Config.LEADER_MIN_DISTANCE
-                direction_from_leader = -to_leader / dist_to_leader
-                force += direction_from_leader * repel_strength * 2.0
-            
-            # === 有机噪声扰动（增添生命力） ===
-            noise_x = self._simplex_noise(
-                particle.noise_offset_x + self.time * Config.NOISE_SCALE * 100,
-                particle.noise_offset_y
-            )
-            noise_y = self._simplex_noise(
-                particle.noise_offset_x,
-                particle.noise_offset_y + self.time * Config.NOISE_SCALE * 100
-            )
-            force += np.array([noise_x, noise_y]) * Config.NOISE_STRENGTH
-            
-            # === 自然晃动效果（围绕核心粒子） ===
-            sway_x = np.sin(self.time * 2.0 + particle.phase) * 0.5
-            sway_y = np.cos(self.time * 1.5 + particle.phase * 1.3) * 0.5
-            force += np.array([sway_x, sway_y])
-            
-            # === 粒子间软排斥（避免重叠） ===
-            diff = positions - particle.position
-            distances = np.linalg.norm(diff, axis=1)
-            distances[i] = np.inf  # 排除自身
-            
-            close_mask = distances < Config.SOFT_REPULSION_RADIUS
-            if np.any(close_mask):
-                close_distances = distances[close_mask]
-                close_diff = diff[close_mask]
-                repulsion_strengths = Config.PARTICLE_REPULSION / (close_distances ** 2 + 1)
-                repulsion_vectors = -close_diff / (close_distances[:, np.newaxis] + 0.1)
-                particle_repulsion = np.sum(repulsion_vectors * repulsion_strengths[:, np.newaxis], axis=0)
-                force += particle_repulsion
-            
-            # === 轻微的轨道效果 ===
-            if dist_to_leader > 10:
-                tangent = np.array([-to_leader[1], to_leader[0]]) / (dist_to_leader + 1)
-                orbit = tangent * np.sin(self.time * 1.0 + particle.phase) * Config.ORBIT_STRENGTH
-                force += orbit
-            
-            # 应用力
-            particle.apply_force(force)
-            particle.update(is_leader=False)
-    
-    def get_particles(self) -> List[Particle]:
-        """获取所有粒子"""
-        return self.particles
-    
-    def get_leader(self) -> Particle:
-        """获取核心粒子"""
-        return self.leader
-    
-    def apply_burst_force(self, direction: np.ndarray):
-        """刨gather模式下施加爆发力，让粒子朝目标方向突然加速"""
-        if direction is None:
-            return
-        # 归一化方向
-        mag = np.linalg.norm(direction)
-        if mag > 0:
-            norm_dir = direction / mag
-            # 对所有粒子施加强烈的爆发力
-            for particle in self.particles:
-                if not particle.is_leader:
-                    burst_force = norm_dir * Config.MAX_SPEED * 5.0
-                    particle.velocity += burst_force
-
 
-class Monster:
-    """怪物类 - 可移动的大球，被粒子击中会扣血"""
+        self._update_followers(self.followers)
 
-    def __init__(self, width: int, height: int, difficulty: int = 1, monster_type: str = "normal"):
-        """初始化怪物
+    def _update_followers(self, sl: slice):
+        """按当前模式计算一组跟随粒子的受力并积分
 
-        Args:
+        邻居网格需已按本帧位置重建；不同切片之间互不依赖，可以分块并行
+        """
+        if self.mode == "scatter" and self.scatter_center is not None:
+            forces = self._scatter_forces(sl)
+        elif self.mode == "free":
+            forces = self._free_forces(sl)
+        elif self.mode == "gather" and self.target is not None:
+            forces = self._gather_forces(sl)
+        elif self.backend == "numba" and self.repulsion_tree is None:
+            # 编译内核一次遍历完成受力和积分（软排斥直接遍历网格，四叉树近似只有NumPy实现）
+            self._follow_step(sl)
+            return
+        else:
+            forces = self._follow_forces(sl)
+
+        self._integrate(forces, sl)
+
+    def _scatter_forces(self, sl: slice) -> np.ndarray:
+        """scatter模式：围绕手掌中心的圆周运动"""
+        # 更新粒子的轨道角度（加快角速度）
+        angles = self.orbit_angles[sl]
+        angles += 0.08 * self.orbit_speeds[sl]
+        cos_a = np.cos(angles)
+        sin_a = np.sin(angles)
+        radii = self.orbit_radii[sl]
+        positions = self.positions[sl]
+
+        # 向圆周上目标位置移动的力
+        to_orbit = np.empty_like(positions)
+        to_orbit[:, 0] = self.scatter_center[0] + cos_a * radii - positions[:, 0]
+        to_orbit[:, 1] = self.scatter_center[1] + sin_a * radii - positions[:, 1]
+        orbit_dir, dist_to_orbit = self._normalize(to_orbit)
+        orbit_mag = np.where(dist_to_orbit > 1, np.minimum(dist_to_orbit * 0.2, 5.0), 0.0)
+        forces = orbit_dir * orbit_mag[:, np.newaxis]
+
+        # 添加切向速度（旋转力）
+        tangent_mag = 4.0 * self.orbit_speeds[sl]
+        forces[:, 0] -= sin_a * tangent_mag
+        forces[:, 1] += cos_a * tangent_mag
+
+        # 有机噪声扰动
+        forces += self._noise_force(sl, 100) * 0.5
+
+        # 特效处理
+        if self.effect_timer > 0 and self.effect_type == "scatter_burst":
+            effect_strength = self.effect_timer / 30.0
+            out_dir, _ = self._normalize(positions - self.scatter_center)
+            forces += out_dir * effect_strength * 3.0
+
+        return forces
+
+    def _free_forces(self, sl: slice) -> np.ndarray:
+        """free模式：保持惯性或缓慢漂浮"""
+        velocities = self.velocities[sl]
+        if self.prev_mode == "gather":
+            # 如果是从 gather 模式切换过来，保持冲刺惯性
+            # 只施加很小的阻力，让粒子保持惯性继续移动
+            velocities *= 0.995  # 很小的衰减
+            # 极小的随机扰动
+            forces = self._noise_force(sl, 30) * 0.05
+        else:
+            # 正常的缓慢漂浮模式
+            slow_factor = 0.15  # 15%的速度
+            forces = self._noise_force(sl, 50) * slow_factor
+
+            # 轻柔的漂浮摆动
+            sway_mult = 0.1
+            phases = self.phases[sl]
+            forces[:, 0] += np.sin(self.time * 0.5 + phases * 2.0) * sway_mult
+            forces[:, 1] += np.cos(self.time * 0.4 + phases * 1.7) * sway_mult
+
+            # 强制降低粒子速度（保持缓慢）
+            velocities *= 0.92
+
+        # 特效处理
+        if self.effect_timer > 0 and self.effect_type == "release":
+            effect_strength = self.effect_timer / 30.0
+            forces += np.random.randn(*forces.shape) * effect_strength * 0.3
+
+        return forces
+
+    def _gather_forces(self, sl: slice) -> np.ndarray:
+        """gather模式：朝目标方向猛烈冲刺"""
+        burst_dir, dist_to_target = self._normalize(self.target - self.positions[sl])
+
+        # 只在距离较远时施加常规冲刺力（3-5倍速度）
+        forces = burst_dir * (Config.MAX_SPEED * 4.0)
+        forces[dist_to_target <= 5] = 0.0
+
+        # 轻微噪声扰动
+        forces += self._noise_force(sl, 100) * 0.3
+
+        # 特效处理
+        if self.effect_timer > 0 and self.effect_type == "gather_pulse":
+            effect_strength = self.effect_timer / 30.0
+            forces += burst_dir * effect_strength * 20.0
+
+        return forces
+
+    def _follow_forces(self, sl: slice) -> np.ndarray:
+        """非scatter/free模式：围绕核心粒子的正常引力逻辑"""
+        positions = self.positions[sl]
+        phases = self.phases[sl]
+        to_leader = self.positions[self.leader_index] - positions
+        dir_to_leader, dist_to_leader = self._normalize(to_leader)
+        forces = np.zeros_like(positions)
+
+        # 特效处理：gather模式朝目标方向的强烈爆发力
+        if self.effect_timer > 0 and self.effect_type == "gather_pulse" and self.target is not None:
+            effect_strength = self.effect_timer / 30.0
+            burst_dir, _ = self._normalize(self.target - positions)
+            forces += burst_dir * effect_strength * 15.0
+
+        if self.current_attraction > 0:
+            # 引力模式：距离越远，吸引力越大
+            attract = dist_to_leader > Config.LEADER_MIN_DISTANCE
+            attraction_strength = self.current_attraction * np.minimum(dist_to_leader / 80.0, 4.0)
+            forces += np.where(attract[:, np.newaxis],
+                               dir_to_leader * (attraction_strength * Config.MAX_SPEED)[:, np.newaxis], 0.0)
+        else:
+            attract = np.zeros(len(positions), dtype=bool)
+
+        if self.current_attraction < 0:
+            # 排斥模式：轻微远离核心粒子
+            forces -= dir_to_leader * abs(self.current_attraction) * Config.MAX_SPEED
+        else:
+            # 太近时轻微排斥
+            too_close = ~attract & (dist_to_leader < Config.LEADER_MIN_DISTANCE)
+            repel_strength = (Config.LEADER_MIN_DISTANCE - dist_to_leader) / Config.LEADER_MIN_DISTANCE
+            forces -= np.where(too_close[:, np.newaxis],
+                               dir_to_leader * (repel_strength * 2.0)[:, np.newaxis], 0.0)
+
+        # === 有机噪声扰动（增添生命力） ===
+        forces += self._noise_force(sl, 100) * Config.NOISE_STRENGTH
+
+        # === 自然晃动效果（围绕核心粒子） ===
+        forces[:, 0] += np.sin(self.time * 2.0 + phases) * 0.5
+        forces[:, 1] += np.cos(self.time * 1.5 + phases * 1.3) * 0.5
+
+        # === 粒子间软排斥（避免重叠） ===
+        forces += self._soft_repulsion(sl)
+
+        # === 轻微的轨道效果 ===
+        orbit_mag = np.sin(self.time * 1.0 + phases) * Config.ORBIT_STRENGTH / (dist_to_leader + 1)
+        orbit_mag[dist_to_leader <= 10] = 0.0
+        forces[:, 0] -= to_leader[:, 1] * orbit_mag
+        forces[:, 1] += to_leader[:, 0] * orbit_mag
+
+        return forces
+
+    def _soft_repulsion(self, sl: slice) -> np.ndarray:
+        """计算一组粒子受到的粒子间软排斥力
+
+        通过本帧的邻居网格只检查排斥半径内的粒子（含核心粒子），
+        自身（以及完全重合的粒子）的差向量为零，对合力没有贡献，无需单独排除。
+        粒子数超过REPULSION_CELL_CAPACITY的网格按质心合并为一个排斥源，粒子聚团时开销不再是二次方。
+        barnes_hut模式下改从四叉树取排斥源，远处的一簇粒子按质心合并为一个；
+        查询分批进行，粒子聚成一团时邻居对数组也不会占满内存
+        """
+        points = self.positions[sl]
+        radius = Config.SOFT_REPULSION_RADIUS
+        repulsion = np.empty_like(points)
+        for start in range(0, len(points), self.REPULSION_BATCH):
+            batch = points[start:start + self.REPULSION_BATCH]
+            if self.repulsion_tree is None:
+                query_ids, masses, diff, dist_sq = self.neighbor_grid.query_repulsors(
+                    batch, radius, Config.REPULSION_CELL_CAPACITY)
+            else:
+                query_ids, masses, diff, dist_sq = self.repulsion_tree.query_interactions(
+                    batch, radius, Config.BARNES_HUT_THETA)
+            weights = masses * Config.PARTICLE_REPULSION / (dist_sq + 1) / (np.sqrt(dist_sq) + 0.1)
+            out = repulsion[start:start + len(batch)]
+            out[:, 0] = -np.bincount(query_ids, weights * diff[:, 0], minlength=len(batch))
+            out[:, 1] = -np.bincount(query_ids, weights * diff[:, 1], minlength=len(batch))
+        return repulsion
+
+    def _follow_step(self, sl: slice):
+        """跟随模式的编译内核路径，与_follow_forces + _integrate一致
+
+        噪声总是按解析式计算（不使用查找表）
+        """
+        self._record_trails(sl)
+        start, stop, _ = sl.indices(self.num_particles)
+        grid = self.neighbor_grid
+        offsets_x, offsets_y = grid.neighbour_offsets(Config.SOFT_REPULSION_RADIUS)
+        has_target = self.target is not None
+        effect_strength = 0.0
+        if self.effect_timer > 0 and self.effect_type == "gather_pulse" and has_target:
+            effect_strength = self.effect_timer / 30.0
+        _follow_step_kernel(
+            self.positions, self.velocities, self.accelerations, self.phases, self.noise_offsets, start, stop,
+            self.positions[self.leader_index].copy(), self.target if has_target else np.zeros(2), has_target,
+            effect_strength, self.current_attraction, self.time, self.time * Config.NOISE_SCALE * 100,
+            np.array(NoiseField.OCTAVES), grid.sorted_positions, grid.cell_start, grid.cell_count,
+            grid.cell_centers, Config.REPULSION_CELL_CAPACITY, grid.cols, grid.rows, grid.cell_width, grid.cell_height, offsets_x, offsets_y, grid.wrap,
+            Config.SOFT_REPULSION_RADIUS, Config.PARTICLE_REPULSION, Config.NOISE_STRENGTH,
+            Config.LEADER_MIN_DISTANCE, Config.ORBIT_STRENGTH,
+            self.MAX_FORCE, Config.MAX_SPEED, Config.MIN_SPEED, self.DAMPING,
+            float(self.width), float(self.height), self._still)
+        self._kick_still()
+
+    def _kick_still(self):
+        """给编译内核标记的静止粒子随机速度（与NumPy路径相同：扰动后阻尼、移动、边界穿透）"""
+        still = np.flatnonzero(self._still)
+        if len(still) == 0:
+            return
+        self._still[still] = False
+        velocities = np.random.randn(len(still), 2) * Config.MIN_SPEED * self.DAMPING
+        self.velocities[still] = velocities
+        positions = self.positions[still] + velocities
+        for axis, limit in ((0, self.width), (1, self.height)):
+            coords = positions[:, axis]
+            coords[coords < 0] = limit
+            coords[coords > limit] = 0
+        self.positions[still] = positions
+
+    def _advance_trails(self):
+        """轨迹环形缓冲区前进一格（每步一次，本步各组粒子都写入同一槽位，最旧的一帧被覆盖）"""
+        if self.trail_length > 0:
+            self.trail_head = (self.trail_head + 1) % self.trail_length
+            self.trail_count = min(self.trail_count + 1, self.trail_length)
+
+    def _record_trails(self, sl: slice):
+        """记录一组粒子移动前的位置（仅在启用拖尾时）"""
+        if self.trail_length > 0:
+            self.trail_buffer[sl, self.trail_head] = self.positions[sl]
+
+    def get_trails(self, index=slice(None)) -> np.ndarray:
+        """按时间顺序（旧→新）取出粒子轨迹
+
+        Args:
+            index: 粒子索引或切片
+
+        Returns:
+            (N, k, 2)，单个粒子时为 (k, 2)，k为已记录的帧数
+        """
+        slots = (self.trail_head - self.trail_count + 1 + np.arange(self.trail_count)) % max(1, self.trail_length)
+        return self.trail_buffer[index, slots]
+
+    def _integrate(self, forces: np.ndarray, sl: slice):
+        """对一组粒子施加力并更新速度和位置
+
+        Args:
+            forces: (n, 2) 力向量
+            sl: 粒子切片
+        """
+        if self.backend == "numba":
+            self._record_trails(sl)
+            _integrate_kernel(self.positions, self.velocities, self.accelerations,
+                              np.ascontiguousarray(forces), range(self.num_particles)[sl].start,
+                              self.MAX_FORCE, Config.MAX_SPEED, Config.MIN_SPEED, self.DAMPING,
+                              float(self.width), float(self.height), self._still)
+            self._kick_still()
+            return
+
+        # 限制力的大小，避免异常抖动
+        max_force = self.MAX_FORCE
+        force_mag = np.hypot(forces[:, 0], forces[:, 1])
+        too_strong = force_mag > max_force
+        forces[too_strong] *= (max_force / force_mag[too_strong])[:, np.newaxis]
+
+        accelerations = self.accelerations[sl]
+        accelerations += forces
+
+        # 更新速度
+        velocities = self.velocities[sl]
+        velocities += accelerations
+
+        # 限制速度（上限和下限）
+        speed = np.hypot(velocities[:, 0], velocities[:, 1])
+        scale = np.ones_like(speed)
+        too_fast = speed > Config.MAX_SPEED
+        scale[too_fast] = Config.MAX_SPEED / speed[too_fast]
+        too_slow = (speed < Config.MIN_SPEED) & (speed > 0)
+        scale[too_slow] = Config.MIN_SPEED / speed[too_slow]
+        velocities *= scale[:, np.newaxis]
+
+        # 添加随机扰动避免静止
+        still = speed == 0
+        if np.any(still):
+            velocities[still] = np.random.randn(np.count_nonzero(still), 2) * Config.MIN_SPEED
+
+        # 平滑处理：轻微阻尼
+        velocities *= self.DAMPING
+
+        # 记录轨迹（如果启用）
+        self._record_trails(sl)
+
+        # 更新位置
+        positions = self.positions[sl]
+        positions += velocities
+
+        # 边界处理：穿透效果（从一边消失，从另一边出现）
+        for axis, limit in ((0, self.width), (1, self.height)):
+            coords = positions[:, axis]
+            coords[coords < 0] = limit
+            coords[coords > limit] = 0
+
+        # 重置加速度
+        accelerations[:] = 0.0
+
+    @property
+    def particles(self) -> List[Particle]:
+        """粒子视图列表（首次访问时创建，之后复用同一个列表）"""
+        if self._particles is None:
+            self._particles = [Particle(self, i) for i in range(self.num_particles)]
+        return self._particles
+
+    def get_particles(self) -> List[Particle]:
+        """获取所有粒子"""
+        return self.particles
+
+    def get_positions(self) -> np.ndarray:
+        """获取所有粒子位置数组 (N, 2)"""
+        return self.positions
+
+    def get_leader(self) -> Particle:
+        """获取核心粒子"""
+        return self.leader
+
+    def memory_report(self) -> dict:
+        """统计粒子系统占用的内存
+
+        Returns:
+            arrays: 各状态数组的字节数
+            state_bytes: 状态数组（含核心粒子掩码）合计
+            index_bytes: 每帧重建的邻居网格/四叉树
+            object_bytes: Python对象（按需创建的粒子视图）的估计值
+            total_bytes: 以上合计
+            bytes_per_particle: 平均每个粒子的字节数
+        """
+        arrays = {name: getattr(self, name).nbytes for name in self.STATE_ARRAYS}
+        arrays['leader_mask'] = self.leader_mask.nbytes
+        arrays['trail_buffer'] = self.trail_buffer.nbytes
+        arrays['_still'] = self._still.nbytes
+        state_bytes = sum(arrays.values())
+
+        grid = self.neighbor_grid
+        index_bytes = sum(a.nbytes for a in (grid.order, grid.sorted_positions, grid.cell_start, grid.cell_count,
+                                             grid.cell_centers))
+        tree = self.repulsion_tree
+        if tree is not None:
+            index_bytes += tree.sorted_positions.nbytes + sum(
+                a.nbytes for levels in (tree.node_start, tree.node_count, tree.node_centers,
+                                        tree.node_mass_centers, tree.child_start, tree.child_count)
+                for a in levels)
+
+        object_bytes = 0
+        if self._particles is not None:
+            object_bytes += sys.getsizeof(self._particles) + sum(sys.getsizeof(p) for p in self._particles)
+
+        total_bytes = state_bytes + index_bytes + object_bytes
+        return {
+            'arrays': arrays,
+            'state_bytes': state_bytes,
+            'index_bytes': index_bytes,
+            'object_bytes': object_bytes,
+            'total_bytes': total_bytes,
+            'bytes_per_particle': total_bytes / max(1, self.num_particles),
+        }
+
+    def apply_burst_force(self, direction: np.ndarray):
+        """刨gather模式下施加爆发力，让粒子朝目标方向突然加速"""
+        if direction is None:
+            return
+        # 归一化方向
+        mag = np.linalg.norm(direction)
+        if mag > 0:
+            norm_dir = direction / mag
+            # 对所有粒子施加强烈的爆发力
+            self.velocities[self.followers] += norm_dir * Config.MAX_SPEED * 5.0
+
+    def close(self):
+        """释放粒子系统占用的外部资源（单进程实现没有需要释放的资源）"""
+
+    def running_workers(self) -> int:
+        """正在运行的工作进程数（单进程实现为0）"""
+        return 0
+
+
+class ParallelParticleSystem(ParticleSystem):
+    """多进程粒子系统
+
+    粒子状态数组放在共享内存中，跟随粒子按索引均分给常驻的工作进程：
+    主进程负责核心粒子、模式状态、邻居网格（barnes_hut模式下还有四叉树）和拖尾，
+    每帧把模式状态发给各工作进程，工作进程只更新自己的分块。网格和四叉树是整帧位置的快照，
+    只在主进程构建一次、经共享内存交给各工作进程查询，排斥力照常跨分块计算，
+    结果与单进程一致（随机扰动除外）
+    """
+
+    # 每帧下发给工作进程的模式状态
+    MODE_STATE = ("time", "mode", "prev_mode", "target", "direction", "scatter_center",
+                  "current_attraction", "effect_timer", "effect_type")
+
+    def __init__(self, width: int, height: int, num_particles: int,
+                 workers: Optional[int] = None, backend: Optional[str] = None):
+        """初始化粒子系统并启动工作进程
+
+        Args:
+            width: 场景宽度
+            height: 场景高度
+            num_particles: 粒子数量（含核心粒子）
+            workers: 工作进程数，None时取Config.PARALLEL_WORKERS（运行时读取，命令行覆盖同样生效）
+            backend: 工作进程内的更新实现，None时取Config.PARTICLE_BACKEND
+        """
+        if shared_memory is None:
+            raise ImportError("多进程粒子系统需要Python 3.8+的multiprocessing.shared_memory")
+        super().__init__(width, height, num_particles, backend)
+        self.workers = max(1, int(Config.PARALLEL_WORKERS if workers is None else workers))
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self._connections = []
+        self._processes = []
+
+        arrays = {}
+        for name in self.STATE_ARRAYS:
+            setattr(self, name, self._share(name, getattr(self, name), arrays))
+
+        # 邻居网格快照（每帧由主进程重建后写入）
+        grid = self.neighbor_grid
+        cells = grid.cols * grid.rows
+        self._grid_order = self._share("grid_order", np.zeros(num_particles, dtype=np.intp), arrays)
+        self._grid_positions = self._share("grid_positions", np.zeros((num_particles, 2), dtype=self.STATE_DTYPE),
+                                           arrays)
+        self._grid_start = self._share("grid_start", np.zeros(cells, dtype=np.intp), arrays)
+        self._grid_count = self._share("grid_count", np.zeros(cells, dtype=np.intp), arrays)
+        self._grid_centers = self._share("grid_centers", np.zeros((cells, 2)), arrays)
+
+        # 四叉树快照：各层节点按最大容量排在扁平数组中，每帧只写入实际节点
+        tree = self.repulsion_tree
+        self._tree_offsets = None if tree is None else tree.level_offsets(num_particles)
+        if tree is not None:
+            capacity = int(self._tree_offsets[-1])
+            self._tree_positions = self._share("tree_positions", np.zeros((num_particles, 2)), arrays)
+            self._tree_nodes = self._share("tree_nodes", np.zeros((4, capacity), dtype=np.intp), arrays)
+            self._tree_points = self._share("tree_points", np.zeros((2, capacity, 2)), arrays)
+
+        # 跟随粒子按索引均分，工作进程按Config快照运行（拖尾由主进程记录）
+        bounds = np.linspace(self.leader_index + 1, num_particles, self.workers + 1).astype(int)
+        config = {key: value for key, value in vars(Config).items() if key.isupper()}
+        context = multiprocessing.get_context("spawn")
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            spec = {
+                "width": width, "height": height, "backend": self.backend,
+                "arrays": arrays, "chunk": (int(start), int(stop)), "tree_offsets": self._tree_offsets,
+                "seed": int(np.random.randint(2 ** 31)), "config": config,
+            }
+            parent, child = context.Pipe()
+            process = context.Process(target=_particle_worker, args=(child, spec), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+
+    def _share(self, name: str, array: np.ndarray, arrays: dict) -> np.ndarray:
+        """把数组复制到新建的共享内存块，返回共享内存上的数组视图"""
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self._blocks.append(block)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        arrays[name] = (block.name, array.shape, array.dtype.str)
+        return shared
+
+    def _update_followers(self, sl: slice):
+        """把本帧网格、四叉树和模式状态发给工作进程，等待各分块更新完成"""
+        if not self._connections:
+            super()._update_followers(sl)
+            return
+
+        grid = self.neighbor_grid
+        self._grid_order[:] = grid.order
+        self._grid_positions[:] = grid.sorted_positions
+        self._grid_start[:] = grid.cell_start
+        self._grid_count[:] = grid.cell_count
+        self._grid_centers[:] = grid.cell_centers
+        self._record_trails(sl)
+
+        state = {name: getattr(self, name) for name in self.MODE_STATE}
+        if self.repulsion_tree is not None:
+            state["tree_sizes"] = self.repulsion_tree.export(self._tree_positions, self._tree_nodes,
+                                                             self._tree_points, self._tree_offsets)
+        for connection in self._connections:
+            connection.send(state)
+        for connection in self._connections:
+            connection.recv()
+
+    def running_workers(self) -> int:
+        """正在运行的工作进程数"""
+        return sum(process.is_alive() for process in self._processes)
+
+    def close(self):
+        """停止工作进程并释放共享内存，之后退回单进程更新"""
+        if not self._blocks:
+            return
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._processes = []
+
+        # 状态复制回进程内数组，粒子视图照常可用（四叉树一直由主进程构建，无需恢复）
+        for name in self.STATE_ARRAYS:
+            setattr(self, name, getattr(self, name).copy())
+        self._grid_order = self._grid_positions = self._grid_start = self._grid_count = self._grid_centers = None
+        self._tree_positions = self._tree_nodes = self._tree_points = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _particle_worker(connection, spec: dict):
+    """ParallelParticleSystem的工作进程：挂接共享内存中的状态，循环更新自己的分块
+
+    Args:
+        connection: 与主进程通信的管道，收到None时退出
+        spec: 场景尺寸、共享数组描述、分块范围、四叉树各层容量（None为不用四叉树）、随机种子和Config快照
+    """
+    for key, value in spec["config"].items():
+        setattr(Config, key, value)
+    np.random.seed(spec["seed"])
+
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in spec["arrays"].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    # 只构造更新跟随粒子需要的部分，状态数组直接使用共享内存
+    system = ParticleSystem.__new__(ParticleSystem)
+    system.backend = ParticleSystem._resolve_backend(spec["backend"])
+    system.width = spec["width"]
+    system.height = spec["height"]
+    system.num_particles = len(arrays["positions"])
+    system.leader_index = 0
+    system.trail_length = 0  # 拖尾由主进程记录
+    for name in ParticleSystem.STATE_ARRAYS:
+        setattr(system, name, arrays[name])
+    system.noise_field = NoiseField(Config.NOISE_USE_LUT, Config.NOISE_LUT_SIZE)
+    system.neighbor_grid = grid = SpatialHashGrid(system.width, system.height, Config.SOFT_REPULSION_RADIUS)
+    grid.order = arrays["grid_order"]
+    grid.sorted_positions = arrays["grid_positions"]
+    grid.cell_start = arrays["grid_start"]
+    grid.cell_count = arrays["grid_count"]
+    grid.cell_centers = arrays["grid_centers"]
+    # 四叉树由主进程构建，这里只挂接共享的快照
+    tree_offsets = spec["tree_offsets"]
+    system.repulsion_tree = None
+    if tree_offsets is not None:
+        system.repulsion_tree = BarnesHutTree(system.width, system.height, Config.BARNES_HUT_LEAF_SIZE)
+    system._still = np.zeros(system.num_particles, dtype=bool)
+    chunk = slice(*spec["chunk"])
+
+    try:
+        while True:
+            state = connection.recv()
+            if state is None:
+                break
+            tree_sizes = state.pop("tree_sizes", None)
+            for name, value in state.items():
+                setattr(system, name, value)
+            if system.repulsion_tree is not None:
+                system.repulsion_tree.attach(arrays["tree_positions"], arrays["tree_nodes"], arrays["tree_points"],
+                                             tree_offsets, tree_sizes)
+            system._update_followers(chunk)
+            connection.send(True)
+    except (EOFError, KeyboardInterrupt):
+        pass  # 主进程已退出
+    finally:
+        del system, grid, arrays
+        for block in blocks:
+            block.close()
+        connection.close()
+
+
+class HitCooldownTable:
+    """碰撞冷却表（数组实现）
+
+    为每个粒子记录冷却结束的帧号，判断是否在冷却中只需比较帧号，
+    不需要每帧逐项递减、清理过期项
+    """
+
+    def __init__(self, duration: int):
+        """初始化冷却表
+
+        Args:
+            duration: 冷却帧数
+        """
+        self.duration = duration
+        self.frame = 0
+        self.expires = np.zeros(0, dtype=np.int64)  # particle_id -> 冷却结束帧号
+
+    def tick(self):
+        """推进一帧"""
+        self.frame += 1
+
+    def ready(self, particle_ids: np.ndarray) -> np.ndarray:
+        """返回每个粒子是否已结束冷却"""
+        particle_ids = np.asarray(particle_ids, dtype=np.intp)
+        result = np.ones(len(particle_ids), dtype=bool)
+        known = particle_ids < len(self.expires)
+        result[known] = self.expires[particle_ids[known]] <= self.frame
+        return result
+
+    def start(self, particle_ids: np.ndarray):
+        """让一组粒子进入冷却"""
+        particle_ids = np.asarray(particle_ids, dtype=np.intp)
+        if len(particle_ids) == 0:
+            return
+        needed = int(particle_ids.max()) + 1
+        if needed > len(self.expires):
+            grown = np.zeros(max(needed, 2 * len(self.expires)), dtype=np.int64)
+            grown[:len(self.expires)] = self.expires
+            self.expires = grown
+        self.expires[particle_ids] = self.frame + self.duration
+
+    def __contains__(self, particle_id: int) -> bool:
+        """粒子是否仍在冷却中"""
+        return not self.ready(np.array([particle_id]))[0]
+
+    def __len__(self) -> int:
+        """处于冷却中的粒子数量"""
+        return int(np.count_nonzero(self.expires > self.frame))
+
+
+class EffectParticlePool:
+    """特效粒子池（击中火花、死亡爆炸）
+
+    固定容量的环形缓冲区，位置、速度、寿命、颜色等按数组存储（SoA），
+    更新和绘制都是整组数组运算，运行中不再分配。满了以后新粒子覆盖最早生成的，
+    存活特效粒子数量不会超过容量
+    """
+
+    def __init__(self, capacity: int = Config.MAX_EFFECT_PARTICLES):
+        """初始化特效粒子池
+
+        Args:
+            capacity: 最多同时存在的特效粒子数
+        """
+        self.capacity = capacity
+        self.positions = np.zeros((capacity, 2))
+        self.velocities = np.zeros((capacity, 2))
+        self.life = np.zeros(capacity, dtype=np.int32)  # 剩余帧数，0为空槽
+        self.fade = np.zeros(capacity)  # 亮度 = 剩余帧数 × fade
+        self.damping = np.ones(capacity)  # 每帧速度衰减
+        self.colors = np.zeros((capacity, 3))
+        self.radii = np.zeros(capacity, dtype=np.int32)
+        self.head = 0  # 下一个写入位置
+
+        # 更新时复用的缓冲区
+        self._alive = np.zeros(capacity, dtype=bool)
+
+        # 各半径的实心圆模板（与cv2.circle填充的像素一致），绘制时按需生成
+        self._stencils = {}
+
+    def spawn(self, position: np.ndarray, count: int, speed_range: Tuple[float, float],
+              life_range: Tuple[int, int], color: tuple, damping: float, radius: int, fade: float) -> int:
+        """从一点向随机方向喷出一组特效粒子
+
+        Args:
+            position: 喷出位置
+            count: 粒子数量（超过容量时只保留最后capacity个）
+            speed_range: 初速度范围
+            life_range: 寿命范围（帧，左闭右开）
+            color: 颜色（BGR）
+            damping: 每帧速度衰减
+            radius: 绘制半径
+            fade: 亮度系数，亮度 = 剩余帧数 × fade
+
+        Returns:
+            本组粒子的最长寿命（帧）
+        """
+        count = min(count, self.capacity)
+        if count <= 0:
+            return 0
+        slots = (self.head + np.arange(count)) % self.capacity
+        self.head = (self.head + count) % self.capacity
+
+        angles = np.random.uniform(0, 2 * np.pi, count)
+        speeds = np.random.uniform(speed_range[0], speed_range[1], count)
+        lives = np.random.randint(life_range[0], life_range[1], count)
+
+        self.positions[slots] = position
+        self.velocities[slots, 0] = np.cos(angles) * speeds
+        self.velocities[slots, 1] = np.sin(angles) * speeds
+        self.life[slots] = lives
+        self.fade[slots] = fade
+        self.damping[slots] = damping
+        self.colors[slots] = color
+        self.radii[slots] = radius
+        return int(lives.max())
+
+    def update(self):
+        """所有存活粒子减速、移动、寿命减一"""
+        np.greater(self.life, 0, out=self._alive)
+        np.multiply(self.velocities, self.damping[:, None], out=self.velocities)
+        np.add(self.positions, self.velocities, out=self.positions)
+        np.subtract(self.life, self._alive, out=self.life)
+
+    def __len__(self) -> int:
+        """存活粒子数"""
+        return int(np.count_nonzero(self.life))
+
+    def clear(self):
+        """清空所有粒子"""
+        self.life[:] = 0
+        self.head = 0
+
+    def _stencil(self, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+        """半径radius的实心圆覆盖的像素偏移 (dy, dx)"""
+        stencil = self._stencils.get(radius)
+        if stencil is None:
+            size = 2 * radius + 1
+            mask = np.zeros((size, size), dtype=np.uint8)
+            cv2.circle(mask, (radius, radius), radius, 1, -1)
+            dy, dx = np.nonzero(mask)
+            stencil = self._stencils[radius] = (dy - radius, dx - radius)
+        return stencil
+
+    def draw(self, frame: np.ndarray):
+        """绘制所有存活粒子（实心圆，随寿命变暗）
+
+        Args:
+            frame: 视频帧图像
+        """
+        alive = np.flatnonzero(self.life)
+        if len(alive) == 0:
+            return
+        height, width = frame.shape[:2]
+        centers = self.positions[alive].astype(np.int64)
+        brightness = np.minimum(self.life[alive] * self.fade[alive], 1.0)
+        colors = (self.colors[alive] * brightness[:, None]).astype(np.uint8)
+        radii = self.radii[alive]
+
+        for radius in np.unique(radii):
+            group = radii == radius
+            dy, dx = self._stencil(int(radius))
+            xs = (centers[group, 0, None] + dx).ravel()
+            ys = (centers[group, 1, None] + dy).ravel()
+            pixel_colors = np.repeat(colors[group], len(dx), axis=0)
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            frame[ys[inside], xs[inside]] = pixel_colors[inside]
+
+
+def _swarm_positions(particles: List[Particle]) -> Tuple[np.ndarray, Optional[int]]:
+    """把粒子视图列表转换为位置数组和核心粒子在列表中的序号
+
+    传入的是ParticleSystem.get_particles()本身时直接复用状态数组，不做拷贝
+    """
+    if particles and particles[0]._system.particles is particles:
+        system = particles[0]._system
+        return system.positions, system.leader_index
+
+    positions = np.array([p.position for p in particles], dtype=float).reshape(-1, 2)
+    leader_index = next((i for i, p in enumerate(particles) if p.is_leader), None)
+    return positions, leader_index
+
+
+class Monster:
+    """怪物类 - 可移动的大球，被粒子击中会扣血"""
+
+    def __init__(self, width: int, height: int, difficulty: int = 1, monster_type: str = "normal",
+                 effects: Optional[EffectParticlePool] = None):
+        """初始化怪物
+
+        Args:
             width: 场景宽度
             height: 场景高度
             difficulty: 难度等级，影响速度和躲避强度
             monster_type: 怪物类型 ("normal", "tank", "fast", "boss")
+            effects: 共享的特效粒子池（由其所有者统一更新和绘制），None时使用自己的粒子池
         """
         self.width = width
         self.height = height
@@ -609,6 +1981,7 @@ class Monster:
             np.random.uniform(margin, width - margin),
             np.random.uniform(margin, height - margin)
         ], dtype=float)
+        self.previous_position = self.position.copy()  # 上一模拟步的位置（渲染插值用）
 
         self.velocity = np.random.randn(2) * 2.0
 
@@ -659,27 +2032,38 @@ class Monster:
         self.hit_flash_duration = 8  # 闪烁持续帧数
 
         # 碰撞冷却（避免同一粒子连续扣血）
-        self.hit_cooldowns = {}  # particle_id -> cooldown_frames
+        self.hit_cooldowns = HitCooldownTable(30)  # 30帧冷却
 
         # 死亡动画
-        self.death_particles = []  # 死亡爆炸粒子
+        self.owns_effects = effects is None
+        self.effects = EffectParticlePool(64) if effects is None else effects  # 死亡爆炸粒子
         self.is_dying = False
         self.death_timer = 0
+        self.death_duration = 0  # 爆炸粒子的最长寿命
     
     def update(self, particles: List[Particle]):
-        """更新怪物状态"""
+        """更新怪物状态
+
+        逐个怪物的接口；主循环中多个怪物使用MonsterSwarmStage批量更新
+        """
         # 如果正在死亡动画中
         if self.is_dying:
-            self.death_timer += 1
-            # 更新死亡粒子
-            for dp in self.death_particles:
-                dp['velocity'] *= 0.95  # 减速
-                dp['position'] += dp['velocity']
-                dp['life'] -= 1
-            # 移除生命结束的粒子
-            self.death_particles = [dp for dp in self.death_particles if dp['life'] > 0]
+            self.update_death_animation()
             return
 
+        self.update_status()
+        positions, leader_index = _swarm_positions(particles)
+        dodge_forces, nearby_counts = MonsterSwarmStage.compute_dodge([self], positions, leader_index)
+        self.move(dodge_forces[0], nearby_counts[0])
+
+    def update_death_animation(self):
+        """更新死亡动画（共享粒子池由其所有者更新）"""
+        self.death_timer += 1
+        if self.owns_effects:
+            self.effects.update()
+
+    def update_status(self):
+        """更新受伤闪烁和碰撞冷却"""
         # 更新受伤闪烁
         if self.hit_timer > 0:
             self.hit_timer -= 1
@@ -692,28 +2076,15 @@ class Monster:
             self.current_color = self.base_color
 
         # 更新碰撞冷却
-        for pid in list(self.hit_cooldowns.keys()):
-            self.hit_cooldowns[pid] -= 1
-            if self.hit_cooldowns[pid] <= 0:
-                del self.hit_cooldowns[pid]
-
-        # 计算躲避力（检测附近粒子）
-        dodge_force = np.zeros(2, dtype=float)
-        nearby_count = 0
+        self.hit_cooldowns.tick()
 
-        for particle in particles:
-            if particle.is_leader:
-                continue
-            diff = particle.position - self.position
-            dist = np.linalg.norm(diff)
-
-            if dist < self.dodge_radius and dist > 0:
-                # 远离粒子的力
-                dodge_dir = -diff / dist
-                strength = (self.dodge_radius - dist) / self.dodge_radius
-                dodge_force += dodge_dir * strength * self.dodge_strength
-                nearby_count += 1
+    def move(self, dodge_force: np.ndarray, nearby_count: int):
+        """根据躲避力移动怪物
 
+        Args:
+            dodge_force: 附近粒子产生的躲避力
+            nearby_count: 躲避半径内的粒子数量
+        """
         # 应用躲避力
         if nearby_count > 0:
             self.velocity += dodge_force
@@ -742,32 +2113,18 @@ class Monster:
             self.position[1] = self.height + self.radius
         elif self.position[1] > self.height + self.radius:
             self.position[1] = -self.radius
-    
+
     def check_collision(self, particles: List[Particle]) -> int:
         """检测与粒子的碰撞，返回碰撞数量"""
-        hit_count = 0
-        for i, particle in enumerate(particles):
-            if particle.is_leader:
-                continue
-            
-            # 检查冷却
-            if i in self.hit_cooldowns:
-                continue
-            
-            diff = particle.position - self.position
-            dist = np.linalg.norm(diff)
-            
-            if dist < self.radius + Config.PARTICLE_RADIUS:
-                hit_count += 1
-                self.hit_cooldowns[i] = 30  # 30帧冷却
-                
-                # 粒子被弹开
-                if dist > 0:
-                    bounce_dir = diff / dist
-                    particle.velocity = bounce_dir * Config.MAX_SPEED * 0.5
-        
-        return hit_count
-    
+        positions, leader_index = _swarm_positions(particles)
+        hit_counts, hit_ids, bounce_velocities = MonsterSwarmStage.compute_collisions([self], positions, leader_index)
+
+        # 粒子被弹开
+        for i, velocity in zip(hit_ids, bounce_velocities):
+            particles[i].velocity = velocity
+
+        return int(hit_counts[0])
+
     def take_damage(self, amount: int):
         """受到伤害"""
         self.health -= amount
@@ -779,96 +2136,978 @@ class Monster:
         if self.health <= 0 and not self.is_dying:
             self.trigger_death_animation()
 
-    def trigger_death_animation(self):
-        """触发死亡动画"""
-        self.is_dying = True
-        # 生成爆炸粒子
-        num_particles = 30
-        for _ in range(num_particles):
-            angle = np.random.uniform(0, 2 * np.pi)
-            speed = np.random.uniform(2, 8)
-            self.death_particles.append({
-                'position': self.position.copy(),
-                'velocity': np.array([np.cos(angle) * speed, np.sin(angle) * speed]),
-                'life': np.random.randint(20, 40),
-                'color': self.base_color
-            })
+    def trigger_death_animation(self):
+        """触发死亡动画"""
+        self.is_dying = True
+        # 生成爆炸粒子
+        self.death_duration = self.effects.spawn(self.position, 30, speed_range=(2, 8), life_range=(20, 40),
+                                                 color=self.base_color, damping=0.95, radius=3, fade=1 / 40.0)
+
+    def is_alive(self) -> bool:
+        """检查是否存活"""
+        return self.health > 0 and not self.is_dying
+
+    def is_dead_animation_done(self) -> bool:
+        """检查死亡动画是否结束"""
+        return self.is_dying and self.death_timer >= self.death_duration
+    
+    def draw(self, frame: np.ndarray, alpha: float = 1.0):
+        """绘制怪物
+
+        Args:
+            frame: 视频帧图像
+            alpha: 渲染插值比例，在上一步位置和当前位置之间插值（1为当前位置）
+        """
+        # 如果正在死亡动画中，绘制爆炸粒子（共享粒子池由其所有者绘制）
+        if self.is_dying:
+            if self.owns_effects:
+                self.effects.draw(frame)
+            return
+
+        position = self.position
+        if alpha < 1.0:
+            position = self.previous_position + (self.position - self.previous_position) * alpha
+        x, y = int(position[0]), int(position[1])
+
+        # 绘制主体
+        cv2.circle(frame, (x, y), self.radius, self.current_color, -1)
+
+        # 绘制外圈发光效果
+        glow_color = tuple(min(255, c + 50) for c in self.current_color)
+        cv2.circle(frame, (x, y), self.radius + 3, glow_color, 2)
+
+        # Boss类型额外发光
+        if self.monster_type == "boss":
+            cv2.circle(frame, (x, y), self.radius + 6, glow_color, 1)
+
+        # 绘制类型标识
+        type_text = ""
+        if self.monster_type == "tank":
+            type_text = "TANK"
+        elif self.monster_type == "fast":
+            type_text = "FAST"
+        elif self.monster_type == "boss":
+            type_text = "BOSS"
+
+        if type_text:
+            text_size = cv2.getTextSize(type_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+            text_x = x - text_size[0] // 2
+            text_y = y + self.radius + 35
+            cv2.putText(frame, type_text, (text_x, text_y),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+        # 绘制血量条
+        bar_width = self.radius * 2
+        bar_height = 6
+        bar_x = x - self.radius
+        bar_y = y - self.radius - 15
+
+        # 背景
+        cv2.rectangle(frame, (bar_x, bar_y),
+                     (bar_x + bar_width, bar_y + bar_height), (50, 50, 50), -1)
+
+        # 血量
+        health_ratio = self.health / self.max_health
+        health_width = int(bar_width * health_ratio)
+        health_color = (0, 255, 0) if health_ratio > 0.5 else (0, 255, 255) if health_ratio > 0.25 else (0, 0, 255)
+        cv2.rectangle(frame, (bar_x, bar_y),
+                     (bar_x + health_width, bar_y + bar_height), health_color, -1)
+
+        # 边框
+        cv2.rectangle(frame, (bar_x, bar_y),
+                     (bar_x + bar_width, bar_y + bar_height), (255, 255, 255), 1)
+
+
+class MonsterSwarmStage:
+    """怪物与粒子群的批量躲避/碰撞阶段
+
+    一次计算所有怪物与粒子的距离，得到每个怪物的躲避力、碰撞次数和
+    被弹开粒子的速度。可以复用粒子系统本帧的邻居网格，只检查怪物附近的粒子
+    """
+
+    @staticmethod
+    def _pairs(points: np.ndarray, radii: np.ndarray, positions: np.ndarray,
+               leader_index: Optional[int], grid: Optional[SpatialHashGrid]
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """找出每个怪物半径内的全部粒子
+
+        Args:
+            points: (M, 2) 怪物位置
+            radii: (M,) 每个怪物的检测半径
+            positions: (N, 2) 粒子位置
+            leader_index: 核心粒子索引（不参与躲避和碰撞）
+            grid: 基于positions建立的邻居网格，None时逐对计算
+
+        Returns:
+            (monster_ids, particle_ids, diff, dist)，diff为粒子位置减怪物位置
+        """
+        if grid is not None:
+            # 网格建立后粒子最多移动约MAX_SPEED（穿透边界时还会多出一小段），
+            # 用放宽后的半径取候选，再按当前位置精确判断
+            slack = Config.MAX_SPEED * 2.0
+            monster_ids, particle_ids, _, _ = grid.query_pairs(points, float(radii.max()) + slack)
+        else:
+            monster_ids = np.repeat(np.arange(len(points)), len(positions))
+            particle_ids = np.tile(np.arange(len(positions)), len(points))
+
+        diff = positions[particle_ids] - points[monster_ids]
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+        close = dist < radii[monster_ids]
+        if leader_index is not None:
+            close &= particle_ids != leader_index
+        return monster_ids[close], particle_ids[close], diff[close], dist[close]
+
+    @staticmethod
+    def compute_dodge(monsters: List["Monster"], positions: np.ndarray, leader_index: Optional[int] = None,
+                      grid: Optional[SpatialHashGrid] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """计算每个怪物远离附近粒子的躲避力
+
+        Returns:
+            (dodge_forces, nearby_counts)，形状分别为(M, 2)和(M,)
+        """
+        num_monsters = len(monsters)
+        dodge_forces = np.zeros((num_monsters, 2), dtype=float)
+        if num_monsters == 0:
+            return dodge_forces, np.zeros(0, dtype=np.intp)
+
+        points = np.array([m.position for m in monsters], dtype=float)
+        dodge_radii = np.array([m.dodge_radius for m in monsters], dtype=float)
+        dodge_strengths = np.array([m.dodge_strength for m in monsters], dtype=float)
+
+        monster_ids, _, diff, dist = MonsterSwarmStage._pairs(points, dodge_radii, positions, leader_index, grid)
+        nonzero = dist > 0
+        monster_ids, diff, dist = monster_ids[nonzero], diff[nonzero], dist[nonzero]
+
+        # 远离粒子的力：越近越强
+        radii = dodge_radii[monster_ids]
+        weights = (radii - dist) / radii * dodge_strengths[monster_ids] / dist
+        dodge_forces[:, 0] = -np.bincount(monster_ids, weights * diff[:, 0], minlength=num_monsters)
+        dodge_forces[:, 1] = -np.bincount(monster_ids, weights * diff[:, 1], minlength=num_monsters)
+        nearby_counts = np.bincount(monster_ids, minlength=num_monsters)
+        return dodge_forces, nearby_counts
+
+    @staticmethod
+    def compute_collisions(monsters: List["Monster"], positions: np.ndarray, leader_index: Optional[int] = None,
+                           grid: Optional[SpatialHashGrid] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """检测所有怪物与粒子的碰撞，并让命中的粒子进入该怪物的冷却
+
+        Returns:
+            (hit_counts, hit_ids, bounce_velocities)
+            hit_counts: (M,) 每个怪物的碰撞数量
+            hit_ids: 被弹开的粒子索引，按怪物顺序排列
+            bounce_velocities: (K, 2) 对应粒子被弹开后的速度
+        """
+        num_monsters = len(monsters)
+        hit_counts = np.zeros(num_monsters, dtype=np.intp)
+        if num_monsters == 0:
+            return hit_counts, np.zeros(0, dtype=np.intp), np.zeros((0, 2), dtype=float)
+
+        points = np.array([m.position for m in monsters], dtype=float)
+        hit_radii = np.array([m.radius + Config.PARTICLE_RADIUS for m in monsters], dtype=float)
+        monster_ids, particle_ids, diff, dist = MonsterSwarmStage._pairs(points, hit_radii, positions,
+                                                                         leader_index, grid)
+
+        # 冷却表按怪物分别检查（怪物数量很少，这里的循环不随粒子数增长）
+        hit = np.zeros(len(particle_ids), dtype=bool)
+        for k, monster in enumerate(monsters):
+            pairs = np.flatnonzero(monster_ids == k)
+            ready = pairs[monster.hit_cooldowns.ready(particle_ids[pairs])]
+            monster.hit_cooldowns.start(particle_ids[ready])
+            hit[ready] = True
+            hit_counts[k] = len(ready)
+
+        # 粒子被弹开（与怪物重合的粒子只计数，不改变速度）
+        bounce = hit & (dist > 0)
+        bounce_velocities = diff[bounce] / dist[bounce, np.newaxis] * (Config.MAX_SPEED * 0.5)
+        return hit_counts, particle_ids[bounce], bounce_velocities
+
+    def update(self, monsters: List["Monster"], particle_system: ParticleSystem) -> np.ndarray:
+        """批量更新所有怪物：躲避、移动、碰撞
+
+        Args:
+            monsters: 怪物列表
+            particle_system: 粒子系统（使用其状态数组和本帧的邻居网格）
+
+        Returns:
+            (M,) 每个怪物本帧的碰撞数量（死亡动画中的怪物为0）
+        """
+        hit_counts = np.zeros(len(monsters), dtype=np.intp)
+        active = []
+        for k, monster in enumerate(monsters):
+            if monster.is_dying:
+                monster.update_death_animation()
+            else:
+                monster.update_status()
+                active.append(k)
+        if not active:
+            return hit_counts
+
+        active_monsters = [monsters[k] for k in active]
+        positions = particle_system.positions
+        leader_index = particle_system.leader_index
+        grid = particle_system.neighbor_grid
+
+        # 碰撞只改变粒子速度，所有怪物的躲避都基于同一份粒子位置
+        dodge_forces, nearby_counts = self.compute_dodge(active_monsters, positions, leader_index, grid)
+        for monster, dodge_force, nearby_count in zip(active_monsters, dodge_forces, nearby_counts):
+            monster.move(dodge_force, nearby_count)
+
+        counts, hit_ids, bounce_velocities = self.compute_collisions(active_monsters, positions, leader_index, grid)
+        hit_counts[active] = counts
+        # 同一粒子被多个怪物击中时，以列表中靠后的怪物为准（与逐个检测一致）
+        _, last = np.unique(hit_ids[::-1], return_index=True)
+        keep = len(hit_ids) - 1 - last
+        particle_system.velocities[hit_ids[keep]] = bounce_velocities[keep]
+        return hit_counts
+
+
+class FrameBufferPool:
+    """帧缓冲池
+
+    预先分配一张渲染图层，每帧原地清零复用（主循环单线程，cv2.imshow会拷贝图像，
+    不存在仍被占用的上一帧图层，轮换多张只会多占内存）；
+    同时为cv2.flip、cv2.cvtColor等函数提供按名称复用的dst输出缓冲区。
+    记录每帧新分配的字节数，稳态下应为0
+    """
+
+    def __init__(self):
+        """初始化缓冲池"""
+        self.layer: Optional[np.ndarray] = None
+        self.buffers: dict = {}  # name -> 复用缓冲区
+
+        # 分配统计
+        self.frame_count = 0
+        self.frame_allocated_bytes = 0  # 本帧新分配的字节数
+        self.total_allocated_bytes = 0
+
+    def begin_frame(self):
+        """开始新的一帧，重置本帧分配统计"""
+        self.frame_count += 1
+        self.frame_allocated_bytes = 0
+
+    def _allocate(self, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        """分配新缓冲区并记录字节数"""
+        buffer = np.zeros(shape, dtype=dtype)
+        self.frame_allocated_bytes += buffer.nbytes
+        self.total_allocated_bytes += buffer.nbytes
+        return buffer
+
+    def acquire_layer(self, height: int, width: int) -> np.ndarray:
+        """取出渲染图层并原地清零
+
+        Args:
+            height: 图层高度
+            width: 图层宽度
+
+        Returns:
+            (height, width, 3) uint8 图层
+        """
+        shape = (height, width, 3)
+        if self.layer is None or self.layer.shape != shape:
+            self.layer = self._allocate(shape, np.uint8)
+        else:
+            self.layer.fill(0)
+        return self.layer
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """取出按名称复用的缓冲区（内容不清零），尺寸或类型变化时重新分配
+
+        Args:
+            name: 缓冲区名称
+            shape: 形状
+            dtype: 数据类型
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = self._allocate(tuple(shape), dtype)
+            self.buffers[name] = buffer
+        return buffer
+
+    def get_stats(self) -> dict:
+        """获取分配统计"""
+        return {
+            'frames': self.frame_count,
+            'frame_allocated_bytes': self.frame_allocated_bytes,
+            'total_allocated_bytes': self.total_allocated_bytes,
+            'pooled_bytes': (0 if self.layer is None else self.layer.nbytes) + sum(b.nbytes for b in self.buffers.values()),
+        }
+
+
+class FrameProfiler:
+    """逐帧分阶段计时
+
+    每帧调用begin_frame()，每个阶段结束时调用mark(阶段名)，该阶段耗时为距上一次
+    标记的时间（perf_counter_ns）。保留最近window帧用于计算滚动分位数
+    （p50/p95/p99），可叠加显示在画面上，并可逐帧写入CSV/JSONL文件供离线分析
+    """
+
+    def __init__(self, stages: List[str], window: int = Config.PROFILER_WINDOW):
+        """初始化计时器
+
+        Args:
+            stages: 阶段名称（按执行顺序）
+            window: 计算滚动分位数的帧数
+        """
+        self.stages = list(stages)
+        self._stage_index = {name: i for i, name in enumerate(self.stages)}
+        self.window = window
+
+        # 最近window帧各阶段耗时（纳秒，环形缓冲）
+        self.samples = np.zeros((window, len(self.stages)), dtype=np.int64)
+        self.frame_count = 0
+        self._current = np.zeros(len(self.stages), dtype=np.int64)
+        self._last_mark = 0
+
+        # 累计统计（整个运行期间）
+        self.totals = np.zeros(len(self.stages), dtype=np.int64)
+        self.maxima = np.zeros(len(self.stages), dtype=np.int64)
+
+        # 分位数缓存（叠加显示时每隔若干帧刷新一次）
+        self._percentiles: Optional[np.ndarray] = None
+        self._percentiles_frame = -1
+
+        self._log_file = None
+        self._log_format = None
+
+    def begin_frame(self):
+        """开始新的一帧"""
+        self._current[:] = 0
+        self._last_mark = time.perf_counter_ns()
+
+    def mark(self, stage: str):
+        """结束一个阶段，把距上一次标记的时间计入该阶段（同一阶段可多次计入）"""
+        now = time.perf_counter_ns()
+        self._current[self._stage_index[stage]] += now - self._last_mark
+        self._last_mark = now
+
+    def end_frame(self):
+        """结束当前帧，记录各阶段耗时"""
+        self.samples[self.frame_count % self.window] = self._current
+        self.totals += self._current
+        np.maximum(self.maxima, self._current, out=self.maxima)
+        if self._log_file is not None:
+            self._write_log_row()
+        self.frame_count += 1
+
+    def percentiles(self, refresh_interval: int = 1) -> np.ndarray:
+        """最近window帧各阶段的p50/p95/p99（毫秒），形状(3, 阶段数+1)，最后一列为整帧
+
+        Args:
+            refresh_interval: 距上次计算不足这么多帧时直接返回缓存结果
+        """
+        if (self._percentiles is None or
+                self.frame_count - self._percentiles_frame >= refresh_interval):
+            count = min(self.frame_count, self.window)
+            if count == 0:
+                return np.zeros((3, len(self.stages) + 1))
+            recent = self.samples[:count]
+            frames = np.concatenate([recent, recent.sum(axis=1, keepdims=True)], axis=1)
+            self._percentiles = np.percentile(frames, (50, 95, 99), axis=0) / 1e6
+            self._percentiles_frame = self.frame_count
+        return self._percentiles
+
+    def get_stats(self) -> dict:
+        """各阶段统计（毫秒）：累计平均、最大、合计，以及最近window帧的分位数"""
+        frames = max(1, self.frame_count)
+        p50, p95, p99 = self.percentiles()
+        return {
+            name: {'mean_ms': self.totals[i] / frames / 1e6,
+                   'max_ms': self.maxima[i] / 1e6,
+                   'total_ms': self.totals[i] / 1e6,
+                   'p50_ms': float(p50[i]), 'p95_ms': float(p95[i]), 'p99_ms': float(p99[i])}
+            for i, name in enumerate(self.stages)
+        }
+
+    def open_log(self, path: str):
+        """逐帧写入计时日志，按扩展名选择格式（.jsonl为JSON Lines，其余为CSV）"""
+        self.close_log()
+        self._log_format = "jsonl" if path.lower().endswith(".jsonl") else "csv"
+        self._log_file = open(path, "w", encoding="utf-8", newline="")
+        if self._log_format == "csv":
+            self._log_file.write(",".join(["frame"] + [f"{name}_ms" for name in self.stages] + ["total_ms"]) + "\n")
+
+    def _write_log_row(self):
+        """写入当前帧的计时"""
+        values = self._current / 1e6
+        total = float(values.sum())
+        if self._log_format == "csv":
+            self._log_file.write(f"{self.frame_count}," + ",".join(f"{v:.4f}" for v in values) + f",{total:.4f}\n")
+        else:
+            row = {'frame': self.frame_count, **{name: round(float(v), 4) for name, v in zip(self.stages, values)},
+                   'total': round(total, 4)}
+            self._log_file.write(json.dumps(row) + "\n")
+
+    def close_log(self):
+        """关闭计时日志"""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def draw_overlay(self, frame: np.ndarray, origin: Tuple[int, int] = (10, 30)):
+        """在画面左上角绘制各阶段p50/p95/p99（毫秒）
+
+        Args:
+            frame: 视频帧图像
+            origin: 第一行文字位置
+        """
+        p50, p95, p99 = self.percentiles(refresh_interval=15)
+        names = self.stages + ["frame"]
+        x, y = origin
+        line_height = 22
+        columns = (0, 110, 180, 250)  # 阶段名和三个分位数的列位置
+        cv2.rectangle(frame, (x - 6, y - 20), (x + 330, y + line_height * len(names) + 4), (0, 0, 0), -1)
+        for column, text in zip(columns, ("stage (ms)", "p50", "p95", "p99")):
+            cv2.putText(frame, text, (x + column, y), cv2.FONT_HERSHEY_PLAIN, 1.1, (200, 200, 200), 1)
+        for i, name in enumerate(names):
+            color = (0, 255, 255) if i == len(names) - 1 else (0, 255, 0)
+            row_y = y + line_height * (i + 1)
+            for column, text in zip(columns, (name, f"{p50[i]:.1f}", f"{p95[i]:.1f}", f"{p99[i]:.1f}")):
+                cv2.putText(frame, text, (x + column, row_y), cv2.FONT_HERSHEY_PLAIN, 1.1, color, 1)
+
+
+class FixedTimestep:
+    """固定步长调度器（累加器）
+
+    模拟按固定的tick频率推进，与渲染帧率无关：每个渲染帧把经过的时间累加，
+    够一个tick就推进一步。单帧最多推进max_substeps步，机器跟不上时丢弃多余的
+    时间（游戏变慢而不是越积越多、每帧步数越来越多）。剩余不足一步的时间
+    比例alpha用于在前后两个状态之间插值渲染
+    """
+
+    def __init__(self, tick_rate: float = Config.SIMULATION_HZ, max_substeps: int = Config.MAX_SUBSTEPS):
+        """初始化调度器
+
+        Args:
+            tick_rate: 每秒模拟步数（所有按帧计的运动常数以此为准）
+            max_substeps: 单个渲染帧最多推进的步数
+        """
+        self.dt = 1.0 / tick_rate
+        self.max_substeps = max_substeps
+        self.accumulator = 0.0
+        self.alpha = 1.0  # 渲染插值比例（0为上一状态，1为当前状态）
+        self._last_time: Optional[float] = None
+
+        # 统计
+        self.ticks = 0
+        self.dropped_time = 0.0  # 超过步数上限被丢弃的时间（秒）
+
+    def advance(self, now: float) -> int:
+        """累加到now为止经过的时间，返回本帧应推进的步数
+
+        Args:
+            now: 当前时间（time.perf_counter）
+        """
+        if self._last_time is None:
+            # 第一帧推进一步，保证开局就有画面变化
+            self._last_time = now
+            self.accumulator = self.dt
+        else:
+            self.accumulator += now - self._last_time
+            self._last_time = now
+
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_substeps:
+            # 防止死亡螺旋：丢弃追不上的时间
+            self.dropped_time += (steps - self.max_substeps) * self.dt
+            self.accumulator -= (steps - self.max_substeps) * self.dt
+            steps = self.max_substeps
+        self.accumulator -= steps * self.dt
+        self.alpha = min(1.0, self.accumulator / self.dt)
+        self.ticks += steps
+        return steps
+
+
+class ParticleRenderer:
+    """批量粒子光栅化
+
+    预先绘制一个粒子精灵（实心核心 + 发光外圈），每帧把所有粒子的精灵
+    一次性累加到强度缓冲区（密度splat），再按颜色加法混合到图层上，
+    不再逐个粒子调用cv2.circle。粒子多时对覆盖的行做稠密混合，粒子少时只按下标混合覆盖的像素
+    """
+
+    # 精灵像素数 × 该值 ≥ 覆盖行的像素数时改用稠密混合（稀疏散射每像素的开销约为稠密遍历的这么多倍）
+    DENSE_PIXELS_PER_STAMP = 25
+
+    def __init__(self, radius: int = Config.PARTICLE_RADIUS, glow_radius: int = Config.PARTICLE_RADIUS + 2):
+        """初始化渲染器
+
+        Args:
+            radius: 粒子核心半径
+            glow_radius: 发光外圈半径
+        """
+        size = glow_radius * 2 + 1
+        sprite = np.zeros((size, size), dtype=np.uint8)
+        cv2.circle(sprite, (glow_radius, glow_radius), radius, 255, -1)
+        cv2.circle(sprite, (glow_radius, glow_radius), glow_radius, 255, 1)
+        self.sprite = sprite
+        self.margin = glow_radius
+
+        # 只保留精灵中非零的像素：(偏移, 强度)
+        ys, xs = np.nonzero(sprite)
+        self.offsets_x = (xs - glow_radius).astype(np.intp)
+        self.offsets_y = (ys - glow_radius).astype(np.intp)
+        self.weights = sprite[ys, xs].astype(np.float32) / 255.0
+
+        # 强度图四周各留两倍margin：中心在画面外margin以内的精灵也整个落在缓冲区里，不需要逐像素判断
+        self.padding = 2 * glow_radius
+        self.shape: Optional[Tuple[int, int]] = None
+        self.intensity = np.zeros((0, 0), dtype=np.float32)
+        self.sprite_offsets = np.zeros(0, dtype=np.intp)
+        self.planes: List[np.ndarray] = []
+        self.colored = np.zeros((0, 0, 3), dtype=np.uint8)
+
+    def _ensure_buffers(self, height: int, width: int):
+        """按图层尺寸分配强度图和着色缓冲区（尺寸不变时复用）"""
+        if self.shape == (height, width):
+            return
+        self.shape = (height, width)
+        padded_width = width + 2 * self.padding
+        self.intensity = np.zeros((height + 2 * self.padding, padded_width), dtype=np.float32)
+        self.sprite_offsets = self.offsets_y * padded_width + self.offsets_x
+        self.planes = [np.zeros((height, width), dtype=np.uint8) for _ in range(3)]
+        self.colored = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def draw(self, layer: np.ndarray, positions: np.ndarray, color: Tuple[int, int, int],
+             offset: Tuple[int, int] = (0, 0)):
+        """把所有粒子叠加到图层上
+
+        Args:
+            layer: (H, W, 3) uint8 连续图层，原地修改
+            positions: (N, 2) 粒子位置
+            color: BGR颜色（随连击切换）
+            offset: 屏幕震动偏移
+        """
+        height, width = layer.shape[:2]
+        self._ensure_buffers(height, width)
+        margin = self.margin
+        padding = self.padding
+
+        xs = positions[:, 0].astype(np.intp) + offset[0]
+        ys = positions[:, 1].astype(np.intp) + offset[1]
+        # 剔除整个精灵都在画面外的粒子
+        visible = (xs >= -margin) & (xs < width + margin) & (ys >= -margin) & (ys < height + margin)
+        xs = xs[visible]
+        ys = ys[visible]
+        if len(xs) == 0:
+            return
+
+        # 所有粒子的精灵像素一次性累加到稠密强度图
+        centers = (ys + padding) * self.intensity.shape[1] + (xs + padding)
+        stamps = (self.sprite_offsets[:, np.newaxis] + centers).ravel()
+        np.add.at(self.intensity.reshape(-1), stamps, np.repeat(self.weights, len(centers)))
+
+        top = max(int(ys.min()) - margin, 0)
+        bottom = min(int(ys.max()) + margin + 1, height)
+        if len(stamps) * self.DENSE_PIXELS_PER_STAMP >= (bottom - top) * width:
+            self._blend_dense(layer, top, bottom, color)
+            # 清空本帧用到的强度行（连续内存，比按下标清零快），留给下一帧复用
+            self.intensity[int(ys.min()) + margin:int(ys.max()) + 3 * margin + 1].fill(0)
+        else:
+            self._blend_sparse(layer, xs, ys, stamps, color)
+            self.intensity.reshape(-1).put(stamps, 0.0)
+
+    def _blend_dense(self, layer: np.ndarray, top: int, bottom: int, color: Tuple[int, int, int]):
+        """逐行稠密混合：强度按通道乘颜色饱和成uint8，合并后一次饱和加法，每个像素只读写一次"""
+        if top >= bottom:
+            return
+        width = layer.shape[1]
+        padding = self.padding
+        region = self.intensity[top + padding:bottom + padding, padding:padding + width]
+        planes = [plane[top:bottom] for plane in self.planes]
+        for plane, channel_color in zip(planes, color):
+            cv2.convertScaleAbs(region, plane, float(channel_color))
+        colored = self.colored[top:bottom]
+        cv2.merge(planes, colored)
+        rows = layer[top:bottom]
+        cv2.add(rows, colored, dst=rows)
+
+    def _blend_sparse(self, layer: np.ndarray, xs: np.ndarray, ys: np.ndarray, stamps: np.ndarray,
+                      color: Tuple[int, int, int]):
+        """按下标稀疏混合：只读写精灵覆盖的像素，粒子少、覆盖面积远小于所在行时更快"""
+        height, width = layer.shape[:2]
+        # 只处理画面内被覆盖的像素（重复像素读到的强度相同，写入结果也相同）
+        sx = (self.offsets_x[:, np.newaxis] + xs).ravel()
+        sy = (self.offsets_y[:, np.newaxis] + ys).ravel()
+        inside = (sx >= 0) & (sx < width) & (sy >= 0) & (sy < height)
+        values = self.intensity.reshape(-1).take(stamps[inside])
+        pixels = (sy[inside] * width + sx[inside]) * 3
+
+        # 加法混合并饱和到255
+        flat = layer.reshape(-1)
+        for channel, channel_color in enumerate(color):
+            idx = pixels + channel
+            blended = np.minimum(flat.take(idx) + values * channel_color, 255.0)
+            flat.put(idx, blended.astype(np.uint8))
+
+    @staticmethod
+    def draw_trails(layer: np.ndarray, trails: np.ndarray, color: Tuple[int, int, int],
+                    offset: Tuple[int, int] = (0, 0), fade_steps: int = Config.TRAIL_FADE_STEPS):
+        """绘制粒子拖尾
+
+        按时间把轨迹分成fade_steps段，越旧的段越暗；每段内所有粒子的折线
+        一次cv2.polylines批量绘制，调用次数与粒子数量无关
+
+        Args:
+            layer: (H, W, 3) uint8 图层，原地修改
+            trails: (N, k, 2) 粒子轨迹，旧→新
+            color: 最新一段的BGR颜色
+            offset: 屏幕震动偏移
+            fade_steps: 渐隐分段数（不超过线段数）
+        """
+        count = trails.shape[1]
+        if count < 2 or len(trails) == 0:
+            return
+        height, width = layer.shape[:2]
+        points = trails.astype(np.int32)
+        points += np.array(offset, dtype=np.int32)
+        # 穿透边界的一步会横跨整个画面，含有这一步的那段折线不画
+        jumps = np.abs(np.diff(points, axis=1))
+        wrapped = (jumps[:, :, 0] >= width // 2) | (jumps[:, :, 1] >= height // 2)
+
+        bounds = np.unique(np.linspace(0, count - 1, min(fade_steps, count - 1) + 1).round().astype(int))
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            keep = ~wrapped[:, start:stop].any(axis=1)
+            alpha = stop / (count - 1)
+            cv2.polylines(layer, np.ascontiguousarray(points[keep, start:stop + 1]), False,
+                          tuple(int(c * alpha) for c in color), 1)
+
+
+class MotionBlurBuffer:
+    """累积缓冲区运动模糊
+
+    粒子画在一张跨帧保留的图层上，每帧先把整张图层按模拟步数衰减再画新位置，
+    旧位置逐渐变暗形成拖影；开销只与画面尺寸有关，与拖影长度和粒子数量无关
+    """
+
+    def __init__(self, decay: float = Config.MOTION_BLUR_DECAY):
+        """初始化运动模糊缓冲区
+
+        Args:
+            decay: 每个模拟步的亮度保留比例
+        """
+        self.decay = decay
+        self.buffer = np.zeros((0, 0, 3), dtype=np.uint8)
+
+    def begin(self, height: int, width: int, elapsed_steps: float = 1.0) -> np.ndarray:
+        """衰减上一帧的内容，返回本帧粒子要画上去的图层
+
+        Args:
+            height: 图层高度
+            width: 图层宽度
+            elapsed_steps: 距上一帧经过的模拟步数（可以是小数，拖影长度与渲染帧率无关）
+        """
+        if self.buffer.shape != (height, width, 3):
+            self.buffer = np.zeros((height, width, 3), dtype=np.uint8)
+        elif elapsed_steps > 0:
+            # 减0.5相当于向下取整，暗像素最终衰减到0，不会残留底色
+            factor = self.decay ** elapsed_steps
+            cv2.addWeighted(self.buffer, factor, self.buffer, 0.0, -0.5, dst=self.buffer)
+        return self.buffer
+
+    def composite(self, layer: np.ndarray):
+        """把拖影图层加法混合到画面上（饱和到255）"""
+        cv2.add(layer, self.buffer, dst=layer)
+
+    def clear(self):
+        """清空拖影（重新开始游戏时）"""
+        self.buffer.fill(0)
+
+
+class CameraCapture:
+    """摄像头采集
+
+    后台线程持续读取摄像头，只保留最新一帧（单槽缓冲，旧帧直接丢弃），
+    主循环按自己的节奏取用，不再被摄像头出帧速度和抖动拖住。
+    三块缓冲区轮换（采集中/最新/读取中），交接时只交换引用，不拷贝图像
+    """
+
+    def __init__(self, cap: "cv2.VideoCapture", width: int, height: int, threaded: bool = True):
+        """初始化采集器
 
-    def is_alive(self) -> bool:
-        """检查是否存活"""
-        return self.health > 0 and not self.is_dying
+        Args:
+            cap: 已打开的摄像头
+            width: 画面宽度
+            height: 画面高度
+            threaded: 是否使用后台线程采集（False时每次read同步读取）
+        """
+        self.cap = cap
+        self.threaded = threaded
+        shape = (height, width, 3)
+        self._write_buffer = np.zeros(shape, dtype=np.uint8)
+        self._latest_buffer = np.zeros(shape, dtype=np.uint8)
+        self._read_buffer = np.zeros(shape, dtype=np.uint8)
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._latest_timestamp = 0.0
+        self._has_new = False  # 最新槽中的帧是否还未被取走
+        self.failed = False  # 摄像头读取失败
+
+        # 当前读取帧的信息
+        self.frame_timestamp = 0.0  # 采集时间（time.perf_counter）
+        self.frame_is_new = False  # 本次read是否拿到了新帧
+
+        # 统计
+        self.frames_captured = 0
+        self.frames_dropped = 0  # 被新帧覆盖、没有被主循环取走的帧
+        self.capture_fps = 0.0
+        self._fps_window_start = time.perf_counter()
+        self._fps_window_frames = 0
+
+    def start(self) -> "CameraCapture":
+        """启动后台采集线程"""
+        if self.threaded and self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._capture_loop, name="CameraCapture", daemon=True)
+            self._thread.start()
+        return self
+
+    def _grab(self) -> bool:
+        """读取一帧到采集缓冲区"""
+        ret, frame = self.cap.read(self._write_buffer)
+        if not ret:
+            return False
+        # 摄像头实际尺寸与预期不同时，OpenCV会返回新数组，之后沿用它
+        self._write_buffer = frame
+        return True
+
+    def _publish(self, timestamp: float):
+        """把刚采集的帧放入最新槽（调用方持有锁）"""
+        if self._has_new:
+            self.frames_dropped += 1
+        self._write_buffer, self._latest_buffer = self._latest_buffer, self._write_buffer
+        self._latest_timestamp = timestamp
+        self._has_new = True
+        self.frames_captured += 1
+
+        # 每秒更新一次采集帧率
+        self._fps_window_frames += 1
+        elapsed = timestamp - self._fps_window_start
+        if elapsed >= 1.0:
+            self.capture_fps = self._fps_window_frames / elapsed
+            self._fps_window_start = timestamp
+            self._fps_window_frames = 0
+
+    def _capture_loop(self):
+        """后台线程：持续采集，只保留最新一帧"""
+        while not self._stop_event.is_set():
+            if not self._grab():
+                with self._lock:
+                    self.failed = True
+                    self._new_frame.notify_all()
+                return
+            timestamp = time.perf_counter()
+            with self._lock:
+                self._publish(timestamp)
+                self._new_frame.notify_all()
+
+    def read(self, timeout: float = 1.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """取出最新一帧
+
+        没有新帧时返回上一次的帧（frame_is_new为False）；尚未采集到任何帧时
+        最多等待timeout秒。返回的数组在下一次read之前不会被采集线程改写
 
-    def is_dead_animation_done(self) -> bool:
-        """检查死亡动画是否结束"""
-        return self.is_dying and len(self.death_particles) == 0
-    
-    def draw(self, frame: np.ndarray):
-        """绘制怪物"""
-        # 如果正在死亡动画中，绘制爆炸粒子
-        if self.is_dying:
-            for dp in self.death_particles:
-                x, y = int(dp['position'][0]), int(dp['position'][1])
-                alpha = dp['life'] / 40.0
-                color = tuple(int(c * alpha) for c in dp['color'])
-                cv2.circle(frame, (x, y), 3, color, -1)
-            return
+        Returns:
+            (ret, frame)，与cv2.VideoCapture.read一致
+        """
+        if not self.threaded:
+            if not self._grab():
+                self.failed = True
+                return False, None
+            with self._lock:
+                self._publish(time.perf_counter())
+
+        with self._lock:
+            if self.frames_captured == 0 and not self.failed:
+                self._new_frame.wait_for(lambda: self.frames_captured > 0 or self.failed, timeout)
+            if self.frames_captured == 0:
+                return False, None
+            if self._has_new:
+                self._read_buffer, self._latest_buffer = self._latest_buffer, self._read_buffer
+                self.frame_timestamp = self._latest_timestamp
+                self._has_new = False
+                self.frame_is_new = True
+            elif self.failed:
+                return False, None
+            else:
+                self.frame_is_new = False
+            return True, self._read_buffer
+
+    def get_frame_age(self) -> float:
+        """当前读取帧距采集时刻的时间（秒）"""
+        return time.perf_counter() - self.frame_timestamp if self.frames_captured else 0.0
+
+    def get_stats(self) -> dict:
+        """获取采集统计"""
+        return {
+            'capture_fps': self.capture_fps,
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'frame_age_ms': self.get_frame_age() * 1000.0,
+        }
+
+    def stop(self):
+        """停止后台采集线程（不释放摄像头）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+
+class HandLandmark:
+    """手部21个关键点的索引（与MediaPipe的HandLandmark一致，不依赖mediapipe）"""
+    WRIST = 0
+    THUMB_CMC = 1
+    THUMB_MCP = 2
+    THUMB_IP = 3
+    THUMB_TIP = 4
+    INDEX_FINGER_MCP = 5
+    INDEX_FINGER_PIP = 6
+    INDEX_FINGER_DIP = 7
+    INDEX_FINGER_TIP = 8
+    MIDDLE_FINGER_MCP = 9
+    MIDDLE_FINGER_PIP = 10
+    MIDDLE_FINGER_DIP = 11
+    MIDDLE_FINGER_TIP = 12
+    RING_FINGER_MCP = 13
+    RING_FINGER_PIP = 14
+    RING_FINGER_DIP = 15
+    RING_FINGER_TIP = 16
+    PINKY_MCP = 17
+    PINKY_PIP = 18
+    PINKY_DIP = 19
+    PINKY_TIP = 20
+    COUNT = 21
+
+
+def prepare_inference_frame(frame: np.ndarray, inference_width: int, buffer_pool: FrameBufferPool) -> np.ndarray:
+    """把视频帧转换为推理输入：缩小到推理分辨率并转换为RGB
+
+    Args:
+        frame: 视频帧图像（BGR格式，可以是裁剪出的视图）
+        inference_width: 推理输入宽度，画面更宽时先按比例缩小（0为不缩放）
+        buffer_pool: 帧缓冲池（缩放和颜色转换写入其中的缓冲区）
+
+    Returns:
+        RGB图像（复用的缓冲区，下次调用时被覆盖）
+    """
+    # 缩小到推理分辨率（关键点是归一化坐标，不受缩放影响）
+    height, width = frame.shape[:2]
+    if 0 < inference_width < width:
+        size = (inference_width, max(1, round(height * inference_width / width)))
+        frame = cv2.resize(frame, size, dst=buffer_pool.get("inference", (size[1], size[0], 3)),
+                           interpolation=cv2.INTER_LINEAR)
 
-        x, y = int(self.position[0]), int(self.position[1])
+    # 转换为RGB（写入复用的缓冲区）
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffer_pool.get("rgb", frame.shape))
 
-        # 绘制主体
-        cv2.circle(frame, (x, y), self.radius, self.current_color, -1)
 
-        # 绘制外圈发光效果
-        glow_color = tuple(min(255, c + 50) for c in self.current_color)
-        cv2.circle(frame, (x, y), self.radius + 3, glow_color, 2)
+class HandRegionOfInterest:
+    """手部感兴趣区域 - 上一次检测到的手周围的正方形区域
 
-        # Boss类型额外发光
-        if self.monster_type == "boss":
-            cv2.circle(frame, (x, y), self.radius + 6, glow_color, 1)
+    手通常只占2560×1600画面的一小块。检测到手之后，下一帧只把关键点包围盒外扩padding后的
+    正方形区域缩放到size×size送去推理，颜色转换和推理的像素数大幅减少；结果中的关键点
+    再换算回全画面的归一化坐标。区域始终是正方形并整体平移到画面内，不论边长多少都缩放
+    （必要时放大）到固定的size×size，推理输入尺寸不变，缓冲区可以复用；
+    区域比画面短边还大时（手离镜头很近）直接用全画面
+    """
 
-        # 绘制类型标识
-        type_text = ""
-        if self.monster_type == "tank":
-            type_text = "TANK"
-        elif self.monster_type == "fast":
-            type_text = "FAST"
-        elif self.monster_type == "boss":
-            type_text = "BOSS"
+    def __init__(self, padding: float = Config.ROI_PADDING, min_fraction: float = Config.ROI_MIN_FRACTION,
+                 size: int = Config.ROI_INFERENCE_SIZE, miss_cooldown: int = Config.ROI_MISS_COOLDOWN):
+        """初始化感兴趣区域
 
-        if type_text:
-            text_size = cv2.getTextSize(type_text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            text_x = x - text_size[0] // 2
-            text_y = y + self.radius + 35
-            cv2.putText(frame, type_text, (text_x, text_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        Args:
+            padding: 包围盒每边外扩的比例（相对包围盒较长边）
+            min_fraction: 区域边长下限（相对画面短边）
+            size: 区域缩放到的推理输入边长
+            miss_cooldown: 区域内丢失后，隔多少次检测再使用区域
+        """
+        self.padding = padding
+        self.min_fraction = min_fraction
+        self.size = size
+        self.miss_cooldown = miss_cooldown
+        self.region: Optional[Tuple[int, int, int]] = None  # (x0, y0, 边长)，None表示全画面
+        self.cooldown = 0  # 剩余的只检测全画面的次数
 
-        # 绘制血量条
-        bar_width = self.radius * 2
-        bar_height = 6
-        bar_x = x - self.radius
-        bar_y = y - self.radius - 15
+    def reset(self):
+        """丢失跟踪，下一帧检测全画面"""
+        self.region = None
 
-        # 背景
-        cv2.rectangle(frame, (bar_x, bar_y),
-                     (bar_x + bar_width, bar_y + bar_height), (50, 50, 50), -1)
+    def miss(self):
+        """区域内没找到手：之后miss_cooldown次检测都用全画面"""
+        self.region = None
+        self.cooldown = self.miss_cooldown
 
-        # 血量
-        health_ratio = self.health / self.max_health
-        health_width = int(bar_width * health_ratio)
-        health_color = (0, 255, 0) if health_ratio > 0.5 else (0, 255, 255) if health_ratio > 0.25 else (0, 0, 255)
-        cv2.rectangle(frame, (bar_x, bar_y),
-                     (bar_x + health_width, bar_y + bar_height), health_color, -1)
+    def update(self, points: Optional[np.ndarray], frame_shape: Tuple[int, ...]):
+        """按本帧检测到的关键点确定下一帧的区域
 
-        # 边框
-        cv2.rectangle(frame, (bar_x, bar_y),
-                     (bar_x + bar_width, bar_y + bar_height), (255, 255, 255), 1)
+        Args:
+            points: (21, 3) 全画面归一化关键点，None表示没有检测到手
+            frame_shape: 画面形状
+        """
+        if points is None or self.cooldown > 0:
+            self.cooldown = max(self.cooldown - 1, 0)
+            self.region = None
+            return
+        height, width = frame_shape[:2]
+        pixels = points[:, :2] * (width, height)
+        low, high = pixels.min(axis=0), pixels.max(axis=0)
+        side = (high - low).max() * (1.0 + 2.0 * self.padding)
+        side = int(max(side, self.min_fraction * min(width, height)))
+        if side >= min(width, height):
+            self.region = None
+            return
+        center = (low + high) / 2
+        x0 = int(np.clip(center[0] - side / 2, 0, width - side))
+        y0 = int(np.clip(center[1] - side / 2, 0, height - side))
+        self.region = (x0, y0, side)
+
+    def crop(self, frame: np.ndarray, buffer_pool: FrameBufferPool) -> np.ndarray:
+        """裁剪出区域，缩放到size×size并转换为推理输入（RGB，复用的缓冲区）"""
+        x0, y0, side = self.region
+        shape = (self.size, self.size, 3)
+        resized = cv2.resize(frame[y0:y0 + side, x0:x0 + side], shape[:2],
+                             dst=buffer_pool.get("roi_inference", shape), interpolation=cv2.INTER_LINEAR)
+        return cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=buffer_pool.get("roi_rgb", shape))
+
+    def to_frame(self, landmarks: any, frame_shape: Tuple[int, ...]):
+        """把区域内的归一化关键点原地换算为全画面归一化坐标"""
+        height, width = frame_shape[:2]
+        x0, y0, side = self.region
+        scale_x, scale_y = side / width, side / height
+        offset_x, offset_y = x0 / width, y0 / height
+        for landmark in landmarks.landmark:
+            landmark.x = offset_x + landmark.x * scale_x
+            landmark.y = offset_y + landmark.y * scale_y
+            landmark.z *= scale_x  # z与x同一尺度
 
 
 class HandGestureDetector:
     """手势识别类，使用MediaPipe检测手部关键点"""
     
-    def __init__(self):
-        """初始化手势检测器"""
+    def __init__(self, buffer_pool: Optional[FrameBufferPool] = None,
+                 inference_width: int = Config.INFERENCE_WIDTH, roi_crop: bool = Config.ROI_CROP):
+        """初始化手势检测器
+
+        Args:
+            buffer_pool: 帧缓冲池（缩放和颜色转换复用其中的缓冲区），None时自行创建
+            inference_width: 推理输入宽度，画面更宽时先按比例缩小（0为不缩放）
+            roi_crop: 检测到手后只对手周围的区域推理
+        """
+        if mp_hands_module is None:
+            raise ImportError("未安装MediaPipe，无法进行手势识别（无头模式 --headless 不需要）")
+        self.buffer_pool = buffer_pool if buffer_pool is not None else FrameBufferPool()
+        self.inference_width = inference_width
+        self.roi = HandRegionOfInterest() if roi_crop else None
+
+        # 统计
+        self.roi_frames = 0  # 在区域内检测到手的帧
+        self.full_frames = 0  # 全画面检测的帧
+        self.roi_misses = 0  # 区域内丢失、改为全画面重新检测的帧（这些帧推理两次）
+
         # 使用兼容的导入方式
         self.mp_hands = mp_hands_module
         self.mp_drawing = mp_drawing_module
@@ -881,6 +3120,15 @@ class HandGestureDetector:
             min_detection_confidence=Config.MIN_DETECTION_CONFIDENCE,
             min_tracking_confidence=Config.MIN_TRACKING_CONFIDENCE
         )
+        # 区域推理用单独的视频模式实例：区域每帧按上一帧的手重新取景，手在区域图像里的位置和大小
+        # 基本不变，上一帧的跟踪框在区域坐标系中仍然有效，不必每帧运行手掌检测；
+        # 与全画面实例分开，两个坐标系的跟踪状态互不干扰
+        self.roi_hands = self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=1,
+            min_detection_confidence=Config.MIN_DETECTION_CONFIDENCE,
+            min_tracking_confidence=Config.MIN_TRACKING_CONFIDENCE
+        ) if roi_crop else None
         
         # 手指关键点索引
         self.INDEX_FINGER_TIP = self.mp_hands.HandLandmark.INDEX_FINGER_TIP
@@ -889,8 +3137,23 @@ class HandGestureDetector:
         self.RING_FINGER_TIP = self.mp_hands.HandLandmark.RING_FINGER_TIP
         self.PINKY_TIP = self.mp_hands.HandLandmark.PINKY_TIP
     
+    def prepare_frame(self, frame: np.ndarray) -> np.ndarray:
+        """把视频帧转换为推理输入：缩小到推理分辨率并转换为RGB
+
+        Args:
+            frame: 视频帧图像（BGR格式）
+
+        Returns:
+            RGB图像（复用的缓冲区，下次调用时被覆盖）
+        """
+        return prepare_inference_frame(frame, self.inference_width, self.buffer_pool)
+
     def process_frame(self, frame: np.ndarray) -> Optional[any]:
         """处理视频帧，检测手部
+
+        启用区域裁剪且上一帧检测到手时，先用区域专用的Hands实例只检测手周围的区域（关键点换算回全画面坐标）；
+        区域内没找到手时本帧改为检测全画面，之后一段时间不再裁剪。全画面和区域各用一个视频模式实例，
+        跟踪状态分别在各自的坐标系中
         
         Args:
             frame: 视频帧图像（BGR格式）
@@ -898,13 +3161,43 @@ class HandGestureDetector:
         Returns:
             手部检测结果，或None
         """
-        # 转换为RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.roi is not None and self.roi.region is not None:
+            results = self.roi_hands.process(self.roi.crop(frame, self.buffer_pool))
+            if results.multi_hand_landmarks:
+                self.roi_frames += 1
+                for hand_landmarks in results.multi_hand_landmarks:
+                    self.roi.to_frame(hand_landmarks, frame.shape)
+                self._update_roi(results, frame.shape)
+                return results
+            self.roi_misses += 1
+            self.roi.miss()
+
+        rgb_frame = self.prepare_frame(frame)
         
         # 处理图像
         results = self.hands.process(rgb_frame)
+        self.full_frames += 1
+        self._update_roi(results, frame.shape)
         
         return results
+
+    def _update_roi(self, results: any, frame_shape: Tuple[int, ...]):
+        """按本帧结果确定下一帧的检测区域"""
+        if self.roi is not None:
+            landmarks = self.get_landmarks(results)
+            self.roi.update(GestureAnalyzer.landmarks_to_array(landmarks) if landmarks is not None else None,
+                            frame_shape)
+
+    def get_roi_stats(self) -> dict:
+        """获取区域裁剪统计"""
+        frames = self.roi_frames + self.full_frames
+        return {
+            'roi_frames': self.roi_frames,
+            'full_frames': self.full_frames,
+            'roi_misses': self.roi_misses,
+            'roi_ratio': self.roi_frames / frames if frames else 0.0,
+            'double_process_ratio': self.roi_misses / frames if frames else 0.0,
+        }
     
     def draw_landmarks(self, frame: np.ndarray, results: any):
         """在画面上绘制手部关键点
@@ -932,18 +3225,349 @@ class HandGestureDetector:
         Returns:
             手部关键点或None
         """
-        if results.multi_hand_landmarks:
+        if results is not None and results.multi_hand_landmarks:
             return results.multi_hand_landmarks[0]
         return None
     
     def release(self):
         """释放资源"""
         self.hands.close()
+        if self.roi_hands is not None:
+            self.roi_hands.close()
+
+
+class HandTrackingWorker:
+    """手部检测工作线程
+
+    MediaPipe推理在后台线程上运行（Hands.process在C++图中执行时释放GIL），
+    主循环提交新帧后立即返回，继续按全帧率模拟和渲染；检测结果带有对应帧的
+    采集时间戳，主循环总是取用最新一次结果。推理跟不上时，未处理的旧帧被
+    新帧覆盖（单槽输入），不会排队积压
+    """
+
+    def __init__(self, detector: HandGestureDetector, threaded: bool = True):
+        """初始化工作线程
+
+        Args:
+            detector: 手势检测器（之后只在工作线程中调用其process_frame）
+            threaded: 是否在后台线程推理（False时submit同步检测）
+        """
+        self.detector = detector
+        self.threaded = threaded
+
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 输入槽：待检测帧及其采集时间，和一块空闲缓冲区用于下次提交
+        self._pending: Optional[np.ndarray] = None
+        self._pending_timestamp = 0.0
+        self._spare: Optional[np.ndarray] = None
+
+        # 输出：最新检测结果
+        self._results = None
+        self._results_timestamp = 0.0
+        self._has_new_results = False
+
+        # 当前取用结果的信息
+        self.results_timestamp = 0.0  # 结果对应帧的采集时间（time.perf_counter）
+        self.results_is_new = False  # 本次get_results是否拿到了新结果
+
+        # 统计
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0  # 还没检测就被新帧覆盖的帧
+        self.last_inference_ms = 0.0  # 最近一次推理耗时
+        self.last_latency_ms = 0.0  # 最近一次结果从采集到检测完成的延迟
+
+    def start(self) -> "HandTrackingWorker":
+        """启动后台推理线程"""
+        if self.threaded and self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._inference_loop, name="HandTracking", daemon=True)
+            self._thread.start()
+        return self
+
+    def _detect(self, frame: np.ndarray, timestamp: float):
+        """检测一帧并发布结果"""
+        start = time.perf_counter()
+        results = self.detector.process_frame(frame)
+        finish = time.perf_counter()
+        with self._lock:
+            self._results = results
+            self._results_timestamp = timestamp
+            self._has_new_results = True
+            self.frames_processed += 1
+            self.last_inference_ms = (finish - start) * 1000.0
+            self.last_latency_ms = (finish - timestamp) * 1000.0
+
+    def _inference_loop(self):
+        """后台线程：等待新帧并检测"""
+        while True:
+            with self._lock:
+                self._frame_ready.wait_for(lambda: self._pending is not None or self._stop_event.is_set())
+                if self._stop_event.is_set():
+                    return
+                frame, timestamp = self._pending, self._pending_timestamp
+                self._pending = None
+            self._detect(frame, timestamp)
+            with self._lock:
+                # 检测完的缓冲区归还，供下次提交复用
+                self._spare = frame
+
+    def submit(self, frame: np.ndarray, timestamp: float):
+        """提交一帧等待检测（拷贝到工作线程自有的缓冲区，调用方可立即复用frame）
+
+        Args:
+            frame: 视频帧图像（BGR格式）
+            timestamp: 帧的采集时间（time.perf_counter）
+        """
+        self.frames_submitted += 1
+        if not self.threaded:
+            self._detect(frame, timestamp)
+            return
+
+        with self._lock:
+            if self._pending is not None:
+                # 上一帧还没开始检测，直接覆盖它的缓冲区
+                self.frames_skipped += 1
+                buffer, self._pending = self._pending, None
+            else:
+                buffer, self._spare = self._spare, None
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        with self._lock:
+            self._pending = buffer
+            self._pending_timestamp = timestamp
+            self._frame_ready.notify()
+
+    def get_results(self) -> Optional[any]:
+        """取用最新的检测结果（还没有任何结果时返回None）"""
+        with self._lock:
+            self.results_is_new = self._has_new_results
+            self._has_new_results = False
+            self.results_timestamp = self._results_timestamp
+            return self._results
+
+    def get_stats(self) -> dict:
+        """获取推理统计"""
+        return {
+            'frames_submitted': self.frames_submitted,
+            'frames_processed': self.frames_processed,
+            'frames_skipped': self.frames_skipped,
+            'inference_ms': self.last_inference_ms,
+            'latency_ms': self.last_latency_ms,
+        }
+
+    def stop(self):
+        """停止后台推理线程（不释放检测器）"""
+        with self._lock:
+            self._stop_event.set()
+            self._frame_ready.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+
+class AdaptiveHandTracker:
+    """自适应检测调度 - 每K帧才把一帧交给MediaPipe完整检测，其余帧用光流把关键点推到当前帧
+
+    包装HandTrackingWorker：每个新摄像头帧先缩小成灰度图，用金字塔LK光流跟踪上一帧的21个关键点；
+    距离上次提交满K帧时才提交检测。检测结果对应的是若干帧之前的采集帧，用历史环形缓冲区里
+    该帧的跟踪结果算出之后光流累计的位移，把检测到的关键点平移到当前帧，同时把该帧跟踪结果与
+    检测结果的差作为跟踪误差。K按三方面调整：
+        手部运动：两次检测之间手最多移动DETECTION_MOTION_PIXELS像素
+        帧预算：推理耗时分摊到每帧不超过DETECTION_BUDGET_MS（预算优先）
+        跟踪误差：误差超过DETECTION_MAX_ERROR时缩短间隔，误差小时逐步放宽
+    光流丢失过半关键点或手离开画面时，下一帧立即检测
+    """
+
+    HISTORY = 16  # 保留最近多少帧的跟踪结果（需覆盖检测延迟）
+
+    def __init__(self, worker: HandTrackingWorker, buffer_pool: Optional[FrameBufferPool] = None,
+                 max_interval: int = Config.DETECTION_MAX_INTERVAL,
+                 flow_width: int = Config.TRACKING_FLOW_WIDTH):
+        """初始化自适应跟踪
+
+        Args:
+            worker: 手部检测工作线程（已启动）
+            buffer_pool: 帧缓冲池（光流用的灰度图复用其中的缓冲区），None时自行创建
+            max_interval: 最多隔几帧检测一次（1为每帧检测，只做延迟补偿）
+            flow_width: 光流跟踪的画面宽度
+        """
+        self.worker = worker
+        self.buffer_pool = buffer_pool if buffer_pool is not None else FrameBufferPool()
+        self.max_interval = max(1, max_interval)
+        self.flow_width = flow_width
+
+        self.points: Optional[np.ndarray] = None  # 当前帧的关键点（21×3 归一化坐标），None表示没有手
+        self.points_timestamp = 0.0  # 当前关键点对应帧的采集时间
+        self.interval = 1  # 当前检测间隔K
+        self._error_limit = self.max_interval  # 按跟踪误差调整的间隔上限
+        self._frames_since_submit = self.max_interval
+        self._force_detect = True
+        self._frame_size = np.ones(2)  # 全画面宽高（误差和运动换算成像素）
+        self._speed = 0.0  # 平滑后的手部运动速度（全画面像素/帧）
+        self._motion = np.zeros((HandLandmark.COUNT, 2), dtype=np.float32)  # 上一帧各关键点的光流位移
+
+        # 跟踪结果的环形缓冲区
+        self._history_timestamps = np.full(self.HISTORY, -np.inf)
+        self._history_points = np.zeros((self.HISTORY, HandLandmark.COUNT, 3), dtype=np.float32)
+        self._history_valid = np.zeros(self.HISTORY, dtype=bool)
+        self._history_head = 0
+
+        # 光流的上一帧灰度图（两块缓冲区交替使用）
+        self._gray_names = ("flow_gray_a", "flow_gray_b")
+        self._prev_gray: Optional[np.ndarray] = None
+
+        # 统计
+        self.frames = 0  # 处理的新摄像头帧
+        self.detections = 0  # 提交检测的帧
+        # 最近PROFILER_WINDOW次检测时光流跟踪结果的平均误差（像素），长时间运行也不增长
+        self.tracking_errors: deque = deque(maxlen=Config.PROFILER_WINDOW)
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """缩小并转换为灰度图（写入与上一帧不同的复用缓冲区）"""
+        height, width = frame.shape[:2]
+        flow_width = min(self.flow_width, width) if self.flow_width > 0 else width
+        size = (flow_width, max(1, round(height * flow_width / width)))
+        small = frame
+        if size[0] != width:
+            small = cv2.resize(frame, size, dst=self.buffer_pool.get("flow_small", (size[1], size[0], 3)),
+                               interpolation=cv2.INTER_LINEAR)
+        name = self._gray_names[self.frames % 2]
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self.buffer_pool.get(name, small.shape[:2]))
+
+    def _propagate(self, gray: np.ndarray):
+        """用LK光流把关键点从上一帧推到当前帧（以上一帧的位移作为初始猜测，快速移动时也能跟上）"""
+        scale = np.array([gray.shape[1], gray.shape[0]], dtype=np.float32)
+        previous = (self.points[:, :2] * scale).reshape(-1, 1, 2)
+        guess = previous + self._motion.reshape(-1, 1, 2)
+        tracked, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, previous, guess,
+                                                      winSize=(15, 15), maxLevel=3,
+                                                      flags=cv2.OPTFLOW_USE_INITIAL_FLOW)
+        found = status.ravel() == 1
+        if found.sum() < HandLandmark.COUNT // 2:
+            self._motion[:] = 0.0
+            self._force_detect = True
+            return
+        # 没跟上的点按跟上的点的平均位移移动
+        moved = tracked.reshape(-1, 2) - previous.reshape(-1, 2)
+        moved[~found] = moved[found].mean(axis=0)
+        self._motion = moved
+        self.points[:, :2] += moved / scale
+        step = float(np.linalg.norm(moved / scale * self._frame_size, axis=1).mean())
+        self._speed += 0.3 * (step - self._speed)
+
+    def _remember(self, timestamp: float):
+        """把当前帧的跟踪结果写入历史"""
+        head = self._history_head
+        self._history_timestamps[head] = timestamp
+        self._history_valid[head] = self.points is not None
+        if self.points is not None:
+            self._history_points[head] = self.points
+        self._history_head = (head + 1) % self.HISTORY
+
+    def _anchor(self, detected: Optional[np.ndarray], timestamp: float):
+        """用检测结果校正当前关键点（检测结果对应timestamp时刻的帧）"""
+        if detected is None:
+            self.points = None
+            self._force_detect = True
+            return
+        matches = np.flatnonzero(self._history_timestamps == timestamp)
+        if self.points is None or len(matches) == 0 or not self._history_valid[matches[0]]:
+            self.points = detected.copy()
+            self._motion[:] = 0.0
+            return
+
+        # 该帧的跟踪结果与检测结果之差即跟踪误差；之后光流累计的位移加到检测结果上
+        estimate = self._history_points[matches[0]]
+        error = float(np.linalg.norm((estimate[:, :2] - detected[:, :2]) * self._frame_size, axis=1).mean())
+        self.tracking_errors.append(error)
+        if error > Config.DETECTION_MAX_ERROR:
+            self._error_limit = max(1, self._error_limit // 2)
+        elif error < Config.DETECTION_MAX_ERROR / 2:
+            self._error_limit = min(self.max_interval, self._error_limit + 1)
+        offset = self.points - estimate
+        self.points = detected + offset
+        self.points[:, 2] = detected[:, 2]
+
+    def _update_interval(self):
+        """按运动速度、帧预算和跟踪误差决定检测间隔K"""
+        motion_interval = int(Config.DETECTION_MOTION_PIXELS / max(self._speed, 1e-3))
+        interval = min(self.max_interval, self._error_limit, max(1, motion_interval))
+        if Config.DETECTION_BUDGET_MS > 0:
+            budget_interval = int(np.ceil(self.worker.last_inference_ms / Config.DETECTION_BUDGET_MS))
+            interval = max(interval, min(self.max_interval, budget_interval))
+        self.interval = interval
+
+    def update(self, frame: np.ndarray, timestamp: float, frame_is_new: bool = True) -> Optional[np.ndarray]:
+        """处理一帧，返回当前帧的关键点（21×3 归一化坐标，None表示没有手）
+
+        Args:
+            frame: 视频帧图像（BGR格式）
+            timestamp: 帧的采集时间（time.perf_counter）
+            frame_is_new: 是否为新的摄像头帧（沿用上一帧时不跟踪也不提交检测）
+        """
+        if frame_is_new:
+            self._frame_size = np.array([frame.shape[1], frame.shape[0]], dtype=np.float64)
+            gray = self._prepare(frame)
+            if self.points is not None and self._prev_gray is not None and gray.shape == self._prev_gray.shape:
+                self._propagate(gray)
+            self._prev_gray = gray
+            self.points_timestamp = timestamp
+            self._remember(timestamp)
+            self.frames += 1
+
+            self._update_interval()
+            self._frames_since_submit += 1
+            if self._force_detect or self.points is None or self._frames_since_submit >= self.interval:
+                self.worker.submit(frame, timestamp)
+                self.detections += 1
+                self._frames_since_submit = 0
+                self._force_detect = False
+
+        results = self.worker.get_results()
+        if self.worker.results_is_new:
+            landmarks = self.worker.detector.get_landmarks(results)
+            detected = GestureAnalyzer.landmarks_to_array(landmarks) if landmarks is not None else None
+            self._anchor(detected, self.worker.results_timestamp)
+        return self.points
+
+    def get_stats(self) -> dict:
+        """获取调度统计：实际检测比例、当前间隔和跟踪误差（像素）"""
+        errors = np.asarray(self.tracking_errors)
+        return {
+            'frames': self.frames,
+            'detections': self.detections,
+            'detection_ratio': self.detections / self.frames if self.frames else 0.0,
+            'interval': self.interval,
+            'tracking_error_mean': float(errors.mean()) if len(errors) else 0.0,
+            'tracking_error_p95': float(np.percentile(errors, 95)) if len(errors) else 0.0,
+        }
+
+
+# 一次取出关键点的x/y/z
+_LANDMARK_XYZ = attrgetter("x", "y", "z")
 
 
 class GestureAnalyzer:
     """手势分析类，判断手势状态和计算目标位置"""
 
+    # 手势状态编码（analyze_batch返回的状态码是该元组的下标）
+    GESTURE_STATES = ("none", "pointing", "open", "gather")
+
+    # 判断伸展用的指尖和PIP关节（食指、中指、无名指、小指）
+    _FINGER_TIPS = [HandLandmark.INDEX_FINGER_TIP, HandLandmark.MIDDLE_FINGER_TIP,
+                    HandLandmark.RING_FINGER_TIP, HandLandmark.PINKY_TIP]
+    _FINGER_PIPS = [HandLandmark.INDEX_FINGER_PIP, HandLandmark.MIDDLE_FINGER_PIP,
+                    HandLandmark.RING_FINGER_PIP, HandLandmark.PINKY_PIP]
+    # 换算成像素的关键点：食指指尖、食指MCP、中指指尖、中指MCP
+    _POINTER_JOINTS = [HandLandmark.INDEX_FINGER_TIP, HandLandmark.INDEX_FINGER_MCP,
+                       HandLandmark.MIDDLE_FINGER_TIP, HandLandmark.MIDDLE_FINGER_MCP]
+
     def __init__(self, width: int, height: int):
         """初始化手势分析器
 
@@ -953,7 +3577,21 @@ class GestureAnalyzer:
         """
         self.width = width
         self.height = height
-        self.mp_hands = mp_hands_module
+        self._scale = np.array([width, height], dtype=np.float64)
+
+    @staticmethod
+    def landmarks_to_array(landmarks: any, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """把MediaPipe的手部关键点转换为 (21, 3) float32 数组（归一化坐标 x/y/z）
+
+        Args:
+            landmarks: 手部关键点（.landmark[i].x/.y/.z）
+            out: 输出数组，None时新建
+        """
+        if out is None:
+            out = np.empty((HandLandmark.COUNT, 3), dtype=np.float32)
+        # 展平的列表整段赋值比逐点元组构造数组快（转换是这里的主要开销）
+        out.flat = list(chain.from_iterable(map(_LANDMARK_XYZ, landmarks.landmark)))
+        return out
 
     def analyze(self, landmarks: any) -> Tuple[str, Optional[Tuple[int, int]], Optional[Tuple[float, float]], Optional[Tuple[int, int]]]:
         """分析手势状态
@@ -968,83 +3606,122 @@ class GestureAnalyzer:
             finger_direction: (dx, dy) 手指指向方向向量
             palm_center: (x, y) 手掌中心位置
         """
-        if landmarks is None:
-            return "none", None, None, None
+        return self.analyze_array(None if landmarks is None else self.landmarks_to_array(landmarks))
+
+    def analyze_array(self, points: Optional[np.ndarray]) -> Tuple[str, Optional[Tuple[int, int]], Optional[Tuple[float, float]], Optional[Tuple[int, int]]]:
+        """分析一只手的 (21, 3) 关键点数组（None表示未检测到手），返回值与analyze相同
 
-        # 获取各手指的关键点
-        index_tip = landmarks.landmark[self.mp_hands.HandLandmark.INDEX_FINGER_TIP]
-        index_mcp = landmarks.landmark[self.mp_hands.HandLandmark.INDEX_FINGER_MCP]
-        index_pip = landmarks.landmark[self.mp_hands.HandLandmark.INDEX_FINGER_PIP]
-        middle_tip = landmarks.landmark[self.mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-        middle_mcp = landmarks.landmark[self.mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-        middle_pip = landmarks.landmark[self.mp_hands.HandLandmark.MIDDLE_FINGER_PIP]
-        ring_tip = landmarks.landmark[self.mp_hands.HandLandmark.RING_FINGER_TIP]
-        ring_mcp = landmarks.landmark[self.mp_hands.HandLandmark.RING_FINGER_MCP]
-        ring_pip = landmarks.landmark[self.mp_hands.HandLandmark.RING_FINGER_PIP]
-        pinky_tip = landmarks.landmark[self.mp_hands.HandLandmark.PINKY_TIP]
-        pinky_mcp = landmarks.landmark[self.mp_hands.HandLandmark.PINKY_MCP]
-        pinky_pip = landmarks.landmark[self.mp_hands.HandLandmark.PINKY_PIP]
-        thumb_tip = landmarks.landmark[self.mp_hands.HandLandmark.THUMB_TIP]
-        wrist = landmarks.landmark[self.mp_hands.HandLandmark.WRIST]
+        单帧只有21个点，每次NumPy调用的固定开销比计算本身大得多（整套数组运算约90 us），
+        所以这里把坐标一次取成列表后按标量计算；判定规则与_classify相同，多帧用analyze_batch
+        """
+        if points is None:
+            return "none", None, None, None
+        x, y = points[:, 0].tolist(), points[:, 1].tolist()
+        width, height = self.width, self.height
 
         # 转换为像素坐标
-        index_tip_x = int(index_tip.x * self.width)
-        index_tip_y = int(index_tip.y * self.height)
-        index_mcp_x = int(index_mcp.x * self.width)
-        index_mcp_y = int(index_mcp.y * self.height)
-        middle_tip_x = int(middle_tip.x * self.width)
-        middle_tip_y = int(middle_tip.y * self.height)
+        index_tip_x = int(x[HandLandmark.INDEX_FINGER_TIP] * width)
+        index_tip_y = int(y[HandLandmark.INDEX_FINGER_TIP] * height)
+        index_mcp_x = int(x[HandLandmark.INDEX_FINGER_MCP] * width)
+        index_mcp_y = int(y[HandLandmark.INDEX_FINGER_MCP] * height)
+        middle_tip_x = int(x[HandLandmark.MIDDLE_FINGER_TIP] * width)
+        middle_tip_y = int(y[HandLandmark.MIDDLE_FINGER_TIP] * height)
+        middle_mcp_x = int(x[HandLandmark.MIDDLE_FINGER_MCP] * width)
+        middle_mcp_y = int(y[HandLandmark.MIDDLE_FINGER_MCP] * height)
 
         # 计算手掌中心（使用各手指MCP关节平均位置）
-        palm_center_x = int((index_mcp.x + middle_mcp.x + ring_mcp.x + pinky_mcp.x + wrist.x) / 5 * self.width)
-        palm_center_y = int((index_mcp.y + middle_mcp.y + ring_mcp.y + pinky_mcp.y + wrist.y) / 5 * self.height)
-        palm_center = (palm_center_x, palm_center_y)
-
-        # 计算食指和中指指尖之间的距离
-        finger_distance = np.sqrt((index_tip_x - middle_tip_x)**2 + (index_tip_y - middle_tip_y)**2)
-
-        # 计算手指指向方向（使用双指中点到MCP中点的方向）
-        mid_tip_x = (index_tip_x + middle_tip_x) // 2
-        mid_tip_y = (index_tip_y + middle_tip_y) // 2
-        mid_mcp_x = (index_mcp_x + int(middle_mcp.x * self.width)) // 2
-        mid_mcp_y = (index_mcp_y + int(middle_mcp.y * self.height)) // 2
-        dir_x = mid_tip_x - mid_mcp_x
-        dir_y = mid_tip_y - mid_mcp_y
-
-        # 目标位置为双指中点
-        target_x = mid_tip_x
-        target_y = mid_tip_y
+        palm_center = (int((x[HandLandmark.INDEX_FINGER_MCP] + x[HandLandmark.MIDDLE_FINGER_MCP]
+                            + x[HandLandmark.RING_FINGER_MCP] + x[HandLandmark.PINKY_MCP]
+                            + x[HandLandmark.WRIST]) / 5 * width),
+                       int((y[HandLandmark.INDEX_FINGER_MCP] + y[HandLandmark.MIDDLE_FINGER_MCP]
+                            + y[HandLandmark.RING_FINGER_MCP] + y[HandLandmark.PINKY_MCP]
+                            + y[HandLandmark.WRIST]) / 5 * height))
+
+        # 目标位置为双指中点，方向为双指中点到MCP中点
+        target_x = (index_tip_x + middle_tip_x) // 2
+        target_y = (index_tip_y + middle_tip_y) // 2
+        dir_x = target_x - (index_mcp_x + middle_mcp_x) // 2
+        dir_y = target_y - (index_mcp_y + middle_mcp_y) // 2
 
         # 判断手指伸展状态（指尖高于PIP表示伸直）
-        index_extended = index_tip.y < index_pip.y
-        middle_extended = middle_tip.y < middle_pip.y
-        ring_extended = ring_tip.y < ring_pip.y
-        pinky_extended = pinky_tip.y < pinky_pip.y
-
-        # 计算伸展的手指数量
-        extended_count = sum([index_extended, middle_extended, ring_extended, pinky_extended])
+        index_extended, middle_extended, ring_extended, pinky_extended = [
+            y[tip] < y[pip] for tip, pip in zip(self._FINGER_TIPS, self._FINGER_PIPS)]
+        extended_count = index_extended + middle_extended + ring_extended + pinky_extended
 
-        # 判断手势状态：三种模式（按优先级排序）
-        # 1. 双指定向模式：食指和中指并拢且都伸出 -> pointing
-        # 2. 握拳聚集模式：伸展手指数量≤1 -> gather
-        # 3. 手掌张开模式：伸展手指数量≥3 -> scatter
-
-        is_fingers_close = finger_distance < Config.FINGER_DISTANCE_THRESHOLD
-
-        # 优先判定：双指并拢且仅这两指伸出
-        if is_fingers_close and index_extended and middle_extended and not ring_extended and not pinky_extended:
-            # 食指和中指并拢（只有这两指伸出） - 定向移动模式
+        finger_distance = ((index_tip_x - middle_tip_x) ** 2 + (index_tip_y - middle_tip_y) ** 2) ** 0.5
+        if (finger_distance < Config.FINGER_DISTANCE_THRESHOLD and index_extended and middle_extended
+                and not ring_extended and not pinky_extended):
             return "pointing", (target_x, target_y), (dir_x, dir_y), palm_center
         elif extended_count >= 3:
-            # 三个以上手指张开 - 圆周运动模式
             return "open", (target_x, target_y), None, palm_center
         elif extended_count <= 1:
-            # 握拳（很少手指伸展） - 聚集加速模式
             return "gather", (target_x, target_y), (dir_x, dir_y), palm_center
         else:
-            # 其他状态（伸展手指数=2但不符合pointing条件）
             return "none", (target_x, target_y), None, palm_center
 
+    def analyze_batch(self, points: np.ndarray, present: Optional[np.ndarray] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """整批分析多帧关键点（例如一整段录制），逐帧结果与analyze一致
+
+        Args:
+            points: (N, 21, 3) 关键点数组
+            present: (N,) 每帧是否检测到手，None表示全部检测到
+
+        Returns:
+            (states, targets, directions, palm_centers)
+            states: (N,) 状态码，GESTURE_STATES[code] 为手势名
+            targets, directions, palm_centers: (N, 2) int64 像素坐标/方向；
+            未检测到手的帧全为0，方向只在pointing和gather时有意义
+        """
+        states, targets, directions, palms = self._classify(points)
+        if present is not None:
+            absent = ~np.asarray(present, dtype=bool)
+            states[absent] = 0
+            targets[absent] = 0
+            directions[absent] = 0
+            palms[absent] = 0
+        return states, targets, directions, palms
+
+    def _classify(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """手势判定的数组实现（points形状为 (..., 21, 3)，返回状态码和像素坐标数组）
+
+        像素坐标按双精度换算后截断取整，与逐点int()的结果完全一致
+        """
+        xy = points[..., :2].astype(np.float64)
+
+        # 食指/中指的指尖和MCP转换为像素坐标
+        pixels = np.trunc(xy[..., self._POINTER_JOINTS, :] * self._scale).astype(np.int64)
+        index_tip, index_mcp = pixels[..., 0, :], pixels[..., 1, :]
+        middle_tip, middle_mcp = pixels[..., 2, :], pixels[..., 3, :]
+
+        # 手掌中心（各手指MCP关节和手腕的平均位置，按逐点实现的顺序相加）
+        palm_sum = (xy[..., HandLandmark.INDEX_FINGER_MCP, :] + xy[..., HandLandmark.MIDDLE_FINGER_MCP, :]
+                    + xy[..., HandLandmark.RING_FINGER_MCP, :] + xy[..., HandLandmark.PINKY_MCP, :]
+                    + xy[..., HandLandmark.WRIST, :])
+        palm_center = np.trunc(palm_sum / 5 * self._scale).astype(np.int64)
+
+        # 食指和中指指尖之间的距离
+        tip_gap = index_tip - middle_tip
+        finger_distance = np.sqrt((tip_gap * tip_gap).sum(axis=-1))
+
+        # 目标位置为双指中点，方向为双指中点到MCP中点
+        target = (index_tip + middle_tip) // 2
+        direction = target - (index_mcp + middle_mcp) // 2
+
+        # 判断手指伸展状态（指尖高于PIP表示伸直）
+        extended = points[..., self._FINGER_TIPS, 1] < points[..., self._FINGER_PIPS, 1]
+        extended_count = extended.sum(axis=-1)
+
+        # 判断手势状态（按优先级）：
+        # 1. 食指和中指并拢且仅这两指伸出 -> pointing
+        # 2. 三个以上手指张开 -> open
+        # 3. 伸展手指数量≤1 -> gather
+        # 4. 其他（伸展手指数=2但不符合pointing条件）-> none
+        is_pointing = ((finger_distance < Config.FINGER_DISTANCE_THRESHOLD)
+                       & extended[..., 0] & extended[..., 1] & ~extended[..., 2] & ~extended[..., 3])
+        states = np.select([is_pointing, extended_count >= 3, extended_count <= 1], [1, 2, 3], 0).astype(np.int8)
+        return states, target, direction, palm_center
+
     def draw_gesture_info(self, frame: np.ndarray, gesture_state: str,
                           target_position: Optional[Tuple[int, int]],
                           finger_direction: Optional[Tuple[float, float]], fps: float):
@@ -1077,6 +3754,321 @@ class GestureAnalyzer:
                     cv2.arrowedLine(frame, target_position, (end_x, end_y), (0, 255, 255), 2, tipLength=0.3)
 
 
+class OneEuroFilter:
+    """One Euro滤波器（二维点）：手移动慢时截止频率低、去抖强，移动快时截止频率随速度升高、滞后小
+
+    同时给出平滑后的速度（像素/秒），用于把位置外推到当前时刻
+    """
+
+    def __init__(self, min_cutoff: float = Config.GESTURE_MIN_CUTOFF, beta: float = Config.GESTURE_BETA,
+                 derivative_cutoff: float = Config.GESTURE_DERIVATIVE_CUTOFF):
+        """初始化滤波器
+
+        Args:
+            min_cutoff: 静止时的截止频率（Hz）
+            beta: 截止频率随速度增加的系数（Hz / (像素/秒)）
+            derivative_cutoff: 速度估计的截止频率（Hz）
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    def reset(self):
+        """清空状态（下一个点直接作为初值）"""
+        self.x = self.y = 0.0
+        self.vx = self.vy = 0.0
+        self.timestamp: Optional[float] = None
+
+    @staticmethod
+    def _smoothing(cutoff: float, dt: float) -> float:
+        """截止频率cutoff、间隔dt时一阶低通的平滑系数"""
+        return 1.0 / (1.0 + 1.0 / (2.0 * np.pi * cutoff * dt))
+
+    def filter(self, x: float, y: float, timestamp: float) -> Tuple[float, float]:
+        """输入一次测量，返回滤波后的位置（同一时间戳的重复测量不更新）
+
+        Args:
+            x, y: 测量位置
+            timestamp: 测量时间（秒）
+        """
+        if self.timestamp is None:
+            self.x, self.y = float(x), float(y)
+            self.timestamp = timestamp
+            return self.x, self.y
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return self.x, self.y
+        self.timestamp = timestamp
+
+        # 先平滑速度，再按速度决定位置的截止频率
+        a = self._smoothing(self.derivative_cutoff, dt)
+        self.vx += a * ((x - self.x) / dt - self.vx)
+        self.vy += a * ((y - self.y) / dt - self.vy)
+        speed = (self.vx * self.vx + self.vy * self.vy) ** 0.5
+        a = self._smoothing(self.min_cutoff + self.beta * speed, dt)
+        self.x += a * (x - self.x)
+        self.y += a * (y - self.y)
+        return self.x, self.y
+
+    def predict(self, now: float, max_lead: float, min_speed: float = 0.0) -> Tuple[float, float]:
+        """按平滑速度把位置外推到now
+
+        Args:
+            now: 外推到的时刻
+            max_lead: 最多外推的时间（秒）
+            min_speed: 速度先减去这么多再外推（像素/秒），手静止时测量噪声带来的速度不会被放大成抖动
+        """
+        lead = min(max(now - self.timestamp, 0.0), max_lead)
+        speed = (self.vx * self.vx + self.vy * self.vy) ** 0.5
+        if speed <= min_speed:
+            return self.x, self.y
+        lead *= 1.0 - min_speed / speed
+        return self.x + self.vx * lead, self.y + self.vy * lead
+
+
+class GestureFilter:
+    """手势滤波 - 位于GestureAnalyzer和粒子系统之间，逐帧独立的判定结果先经过这里
+
+    - 状态迟滞：新手势连续出现confirm_frames次检测后才切换，单帧误判不会来回切换模式
+      （每次切换都会触发粒子系统约30帧的特效）
+    - 目标位置和手掌中心用One Euro滤波去抖
+    - 目标位置按检测延迟外推到当前时刻：推理比渲染慢时，两次检测之间按手的速度预测位置
+    只有新的检测结果（时间戳变化）才推进滤波和计数，同一结果被多个渲染帧重复取用时只重新外推；
+    确认失去手部后清空位置滤波，重新检测到手时不会从旧位置滑过去
+    """
+
+    def __init__(self, confirm_frames: int = Config.GESTURE_CONFIRM_FRAMES,
+                 max_prediction: float = Config.GESTURE_MAX_PREDICTION,
+                 prediction_min_speed: float = Config.GESTURE_PREDICTION_MIN_SPEED):
+        """初始化手势滤波
+
+        Args:
+            confirm_frames: 新手势需要连续出现的检测次数（1为不做迟滞）
+            max_prediction: 目标位置最多外推的时间（秒，0为不外推）
+            prediction_min_speed: 外推前速度先减去的量（像素/秒）
+        """
+        self.confirm_frames = max(1, confirm_frames)
+        self.max_prediction = max_prediction
+        self.prediction_min_speed = prediction_min_speed
+        self.target_filter = OneEuroFilter()
+        self.palm_filter = OneEuroFilter()
+        self.reset()
+
+    def reset(self):
+        """清空全部状态和统计"""
+        self.target_filter.reset()
+        self.palm_filter.reset()
+        self.state = "none"  # 当前输出的手势
+        self.direction: Optional[Tuple[float, float]] = None
+        self._candidate = "none"  # 等待确认的新手势
+        self._candidate_count = 0
+        self._timestamp: Optional[float] = None
+
+        # 统计
+        self.measurements = 0  # 处理的检测结果数
+        self.state_changes = 0  # 输出手势切换次数
+        self.suppressed_changes = 0  # 没坚持到确认就消失的手势变化
+
+    def update(self, gesture: Tuple[str, Optional[Tuple[int, int]], Optional[Tuple[float, float]], Optional[Tuple[int, int]]],
+               timestamp: float, now: Optional[float] = None
+               ) -> Tuple[str, Optional[Tuple[int, int]], Optional[Tuple[float, float]], Optional[Tuple[int, int]]]:
+        """输入一次手势判定，返回滤波后的手势（格式与GestureAnalyzer.analyze的返回值一致）
+
+        Args:
+            gesture: GestureAnalyzer.analyze的结果
+            timestamp: 这次判定所用检测结果对应帧的采集时间（秒）
+            now: 当前时间，目标位置外推到这一时刻（None为不外推）
+        """
+        gesture_state, target_position, finger_direction, palm_center = gesture
+        if timestamp != self._timestamp:
+            self._timestamp = timestamp
+            self.measurements += 1
+            self._update_state(gesture_state)
+            if target_position is not None:
+                self.target_filter.filter(target_position[0], target_position[1], timestamp)
+            if palm_center is not None:
+                self.palm_filter.filter(palm_center[0], palm_center[1], timestamp)
+            if finger_direction is not None:
+                self.direction = finger_direction
+            if self.state == "none" and target_position is None:
+                # 确认手已离开画面
+                self.target_filter.reset()
+                self.palm_filter.reset()
+
+        target = None
+        if self.target_filter.timestamp is not None:
+            if now is None or self.max_prediction <= 0:
+                x, y = self.target_filter.x, self.target_filter.y
+            else:
+                x, y = self.target_filter.predict(now, self.max_prediction, self.prediction_min_speed)
+            target = (int(x), int(y))
+        palm = None
+        if self.palm_filter.timestamp is not None:
+            palm = (int(self.palm_filter.x), int(self.palm_filter.y))
+        direction = self.direction if self.state in ("pointing", "gather") else None
+        return self.state, target, direction, palm
+
+    def _update_state(self, gesture_state: str):
+        """状态迟滞：新手势连续出现confirm_frames次才切换"""
+        if gesture_state == self.state or gesture_state != self._candidate:
+            if self._candidate_count:
+                self.suppressed_changes += 1
+            self._candidate = gesture_state
+            self._candidate_count = 0
+            if gesture_state == self.state:
+                return
+        self._candidate_count += 1
+        if self._candidate_count >= self.confirm_frames:
+            self.state = gesture_state
+            self.state_changes += 1
+            self._candidate_count = 0
+
+
+class LandmarkRecorder:
+    """手部关键点录制器 - 把主循环每帧送入GestureAnalyzer.analyze的关键点写入内存映射文件
+
+    文件是标准.npy结构化数组（np.load(path, mmap_mode="r")即可读取），每帧一条记录:
+        timestamp: 这组关键点所用检测结果对应帧的采集时间，相对第一条记录的秒数（float64）；
+            渲染帧重复取用同一检测结果时与上一条相同，回放和手势滤波据此区分新检测和重复
+        present: 是否检测到手（bool）
+        landmarks: 21个关键点的归一化坐标 x/y/z（float32，未检测到手时为0）
+    文件按容量预分配并内存映射，每帧只把一个关键点数组复制进映射页，不做系统调用也不分配内存；
+    close时把文件头里的形状改为实际帧数，截掉未用的部分
+    """
+
+    DTYPE = np.dtype([('timestamp', np.float64), ('present', np.bool_),
+                      ('landmarks', np.float32, (HandLandmark.COUNT, 3))])
+
+    def __init__(self, path: str, capacity: int = Config.LANDMARK_RECORD_CAPACITY):
+        """创建录制文件
+
+        Args:
+            path: 录制文件路径（.npy）
+            capacity: 预分配的帧数，录满后不再记录
+        """
+        self.path = path
+        self.capacity = capacity
+        self.frames = 0
+        self.frames_dropped = 0  # 录满后没有记录的帧数
+        self._start_time: Optional[float] = None
+
+        # 新文件的内容全为0，未检测到手的帧只需写时间戳
+        self._records = np.lib.format.open_memmap(path, mode="w+", dtype=self.DTYPE, shape=(capacity,))
+        self._timestamps = self._records['timestamp']
+        self._present = self._records['present']
+        self._landmarks = self._records['landmarks']
+
+    def record(self, points: Optional[np.ndarray], timestamp: float):
+        """记录一帧
+
+        Args:
+            points: (21, 3) 关键点数组（GestureAnalyzer.landmarks_to_array的结果），None表示未检测到手
+            timestamp: 关键点对应帧的采集时间（time.perf_counter），重复取用同一检测结果时不变
+        """
+        if self.frames >= self.capacity:
+            self.frames_dropped += 1
+            return
+        if self._start_time is None:
+            self._start_time = timestamp
+        index = self.frames
+        self._timestamps[index] = timestamp - self._start_time
+        if points is not None:
+            self._present[index] = True
+            self._landmarks[index] = points
+        self.frames += 1
+
+    def close(self):
+        """结束录制：文件头的形状改为实际帧数，截掉预分配的剩余部分"""
+        if self._records is None:
+            return
+        offset = self._records.offset
+        self._records.flush()
+        # 释放映射后再改写文件
+        self._records = self._timestamps = self._present = self._landmarks = None
+
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            'descr': np.lib.format.dtype_to_descr(self.DTYPE),
+            'fortran_order': False,
+            'shape': (self.frames,),
+        })
+        header = header.getvalue()
+        if len(header) == offset:
+            with open(self.path, "r+b") as f:
+                f.write(header)
+                f.truncate(offset + self.frames * self.DTYPE.itemsize)
+        else:
+            # 旧版NumPy的文件头没有为形状变化预留空间，长度不同时重写整个文件
+            records = np.load(self.path, mmap_mode="r")[:self.frames]
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.save(f, records)
+            del records
+            os.replace(temp_path, self.path)
+
+
+class LandmarkReplay:
+    """关键点回放 - 读出LandmarkRecorder录制的关键点送入GestureAnalyzer，不需要摄像头和MediaPipe
+
+    文件以只读方式内存映射，按需读取。接口与GestureScript相同（at(frame)返回手势），
+    可以直接传给run_headless：第frame个模拟帧按录制时间戳取对应的记录，
+    speed > 1时按倍速回放；无头模式不等待真实时间，整段录制以模拟速度尽快跑完。
+    超过录制时长后从头循环。at返回的是未滤波的判定，开启Config.GESTURE_FILTER时
+    run_headless再按timing_at给出的录制时间戳把它送入GestureFilter，与摄像头模式一致
+    """
+
+    def __init__(self, path: str, width: int, height: int, speed: float = 1.0):
+        """加载录制文件
+
+        Args:
+            path: 录制文件路径（.npy）
+            width: 画面宽度
+            height: 画面高度
+            speed: 回放倍速
+        """
+        self.records = np.load(path, mmap_mode="r")
+        if self.records.dtype != LandmarkRecorder.DTYPE:
+            raise ValueError(f"{path} 不是手部关键点录制文件")
+        if len(self.records) == 0:
+            raise ValueError(f"{path} 没有录制任何帧")
+        if speed <= 0:
+            raise ValueError("回放倍速必须大于0")
+        self.speed = speed
+        self.timestamps = np.array(self.records['timestamp'])
+        self.analyzer = GestureAnalyzer(width, height)
+
+    @property
+    def duration(self) -> float:
+        """录制时长（秒）"""
+        return float(self.timestamps[-1])
+
+    @property
+    def total_frames(self) -> int:
+        """按当前倍速完整回放一遍需要的模拟帧数"""
+        return int(self.duration * Config.SIMULATION_HZ / self.speed) + 1
+
+    def index_at(self, seconds: float) -> int:
+        """录制开始后seconds秒时的记录下标（超过录制时长后从头循环）"""
+        seconds %= self.total_frames / Config.SIMULATION_HZ * self.speed
+        return max(0, int(np.searchsorted(self.timestamps, seconds, side="right")) - 1)
+
+    def timing_at(self, frame: int) -> Tuple[float, float]:
+        """第frame个模拟帧所用记录的时间戳和此时的回放时刻（秒，循环回放时逐遍累加，保持单调）"""
+        seconds = frame / Config.SIMULATION_HZ * self.speed
+        period = self.total_frames / Config.SIMULATION_HZ * self.speed
+        return float(self.timestamps[self.index_at(seconds)] + seconds // period * period), seconds
+
+    def at(self, frame: int) -> Tuple[str, Optional[Tuple[int, int]], Optional[Tuple[float, float]], Optional[Tuple[int, int]]]:
+        """第frame个模拟帧的手势（格式与GestureAnalyzer.analyze的返回值一致，未经GestureFilter）"""
+        record = self.records[self.index_at(frame / Config.SIMULATION_HZ * self.speed)]
+        return self.analyzer.analyze_array(record['landmarks'] if record['present'] else None)
+
+    def analyze_all(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """整批分析录制的每一帧（GestureAnalyzer.analyze_batch的结果，每条记录一行）"""
+        return self.analyzer.analyze_batch(self.records['landmarks'], self.records['present'])
+
+
 class GameManager:
     """游戏管理器 - 管理波次、得分、连击等"""
 
@@ -1097,8 +4089,8 @@ class GameManager:
         self.wave_intermission_timer = 0  # 波次间休息时间
         self.wave_intermission_duration = 180  # 3秒休息
 
-        # 击中特效粒子
-        self.hit_particles = []
+        # 击中特效和怪物死亡爆炸共用的特效粒子池
+        self.effects = EffectParticlePool()
 
         # 屏幕震动
         self.screen_shake_timer = 0
@@ -1112,12 +4104,8 @@ class GameManager:
             if self.combo_timer <= 0:
                 self.combo = 0
 
-        # 更新击中特效粒子
-        for hp in self.hit_particles:
-            hp['velocity'] *= 0.9
-            hp['position'] += hp['velocity']
-            hp['life'] -= 1
-        self.hit_particles = [hp for hp in self.hit_particles if hp['life'] > 0]
+        # 更新特效粒子
+        self.effects.update()
 
         # 更新屏幕震动
         if self.screen_shake_timer > 0:
@@ -1158,15 +4146,8 @@ class GameManager:
 
     def spawn_hit_effect(self, position: np.ndarray, count: int = 20, color: tuple = (255, 255, 0)):
         """生成击中特效"""
-        for _ in range(count):
-            angle = np.random.uniform(0, 2 * np.pi)
-            speed = np.random.uniform(1, 5)
-            self.hit_particles.append({
-                'position': position.copy(),
-                'velocity': np.array([np.cos(angle) * speed, np.sin(angle) * speed]),
-                'life': np.random.randint(15, 30),
-                'color': color
-            })
+        self.effects.spawn(position, count, speed_range=(1, 5), life_range=(15, 30),
+                           color=color, damping=0.9, radius=2, fade=1 / 30.0)
 
     def trigger_screen_shake(self, duration: int, intensity: int):
         """触发屏幕震动"""
@@ -1269,13 +4250,6 @@ class GameManager:
             cv2.putText(frame, intermission_text, (text_x, text_y),
                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 255, 0), 3)
 
-        # 绘制击中特效粒子
-        for hp in self.hit_particles:
-            x, y = int(hp['position'][0]), int(hp['position'][1])
-            alpha = hp['life'] / 30.0
-            color = tuple(int(c * alpha) for c in hp['color'])
-            cv2.circle(frame, (x, y), 2, color, -1)
-
     def reset_game(self):
         """重置游戏"""
         self.score = 0
@@ -1287,10 +4261,382 @@ class GameManager:
         self.monsters_defeated_this_wave = 0
         self.wave_complete = False
         self.wave_intermission_timer = 0
-        self.hit_particles = []
+        self.effects.clear()
         self.screen_shake_timer = 0
 
 
+
+class GameSession:
+    """游戏会话 - 粒子系统、怪物和游戏管理器的逐帧模拟
+
+    不依赖摄像头和窗口：main()用识别出的手势驱动它，无头模式用脚本手势驱动
+    """
+
+    def __init__(self, width: int, height: int, verbose: bool = True):
+        """初始化游戏会话
+
+        Args:
+            width: 画面宽度
+            height: 画面高度
+            verbose: 是否打印怪物生成、击败和波次信息
+        """
+        self.width = width
+        self.height = height
+        self.verbose = verbose
+
+        # 游戏管理器
+        self.game_manager = GameManager()
+
+        # 怪物系统
+        self.monsters: List[Monster] = []
+        self.swarm_stage = MonsterSwarmStage()  # 怪物与粒子群的批量躲避/碰撞
+
+        self.particle_system: Optional[ParticleSystem] = None
+        self.start()
+
+    def start(self):
+        """开始第一波（粒子系统重新生成）"""
+        if self.particle_system is not None:
+            self.particle_system.close()
+        if Config.PARALLEL_WORKERS > 1:
+            self.particle_system = ParallelParticleSystem(self.width, self.height, Config.NUM_PARTICLES,
+                                                          workers=Config.PARALLEL_WORKERS)
+        else:
+            self.particle_system = ParticleSystem(self.width, self.height, Config.NUM_PARTICLES)
+        self.previous_positions = self.particle_system.get_positions().copy()  # 上一模拟步的粒子位置
+        self.monsters.clear()
+        self.monster_spawn_queue = self.game_manager.start_wave(1)  # 待生成的怪物队列
+        self.monster_spawn_delay = 60  # 1秒后开始生成
+
+    def restart(self):
+        """重新开始游戏"""
+        self.game_manager.reset_game()
+        self.start()
+
+    def close(self):
+        """释放粒子系统的工作进程和共享内存"""
+        self.particle_system.close()
+
+    def _log(self, message: str):
+        """打印游戏事件"""
+        if self.verbose:
+            print(message)
+
+    def apply_gesture(self, gesture_state: str, target_position: Optional[Tuple[int, int]],
+                      finger_direction: Optional[Tuple[float, float]], palm_center: Optional[Tuple[int, int]]):
+        """根据手势更新粒子系统模式（参数与GestureAnalyzer.analyze的返回值一致）"""
+        particle_system = self.particle_system
+        if gesture_state == "pointing" and target_position:
+            # 食指和中指并拢 - 定向移动
+            particle_system.set_mode("pointing")
+            particle_system.set_target(target_position[0], target_position[1])
+            if finger_direction:
+                particle_system.set_direction(finger_direction[0], finger_direction[1])
+        elif gesture_state == "gather" and target_position:
+            # 握拳/双指合并 - 聚集加速
+            particle_system.set_mode("gather")
+            particle_system.set_target(target_position[0], target_position[1])
+        elif gesture_state == "open":
+            # 手掌张开 - 圆周运动
+            particle_system.set_mode("scatter")
+            if palm_center:
+                particle_system.set_scatter_center(palm_center[0], palm_center[1])
+        else:
+            particle_system.set_mode("free")
+            if target_position:
+                particle_system.set_target(target_position[0], target_position[1])
+
+    def update_particles(self):
+        """更新粒子"""
+        self.particle_system.update()
+
+    def update_game(self):
+        """更新游戏管理器"""
+        self.game_manager.update()
+
+    def update_monsters(self):
+        """生成、更新和移除怪物，推进波次"""
+        game_manager = self.game_manager
+
+        # 生成怪物
+        if self.monster_spawn_delay > 0:
+            self.monster_spawn_delay -= 1
+        elif len(self.monster_spawn_queue) > 0:
+            # 从队列中取出一个怪物生成
+            monster_data = self.monster_spawn_queue.pop(0)
+            new_monster = Monster(self.width, self.height,
+                                  monster_data['difficulty'],
+                                  monster_data['type'],
+                                  effects=game_manager.effects)
+            self.monsters.append(new_monster)
+            self._log(f"怪物生成: {monster_data['type']} (难度 {monster_data['difficulty']})")
+            # 间隔0.5秒生成下一个
+            self.monster_spawn_delay = 30
+
+        # 更新所有怪物（躲避和碰撞对全部怪物批量计算）
+        hit_counts = self.swarm_stage.update(self.monsters, self.particle_system)
+        for monster, hits in zip(self.monsters[:], hit_counts):  # 使用副本以便安全删除
+            # 处理碰撞
+            if hits > 0:
+                monster.take_damage(int(hits))
+                game_manager.on_hit(int(hits))
+                # 生成击中特效
+                game_manager.spawn_hit_effect(monster.position, 10, (255, 200, 0))
+
+            # 检查怪物是否被击败
+            if not monster.is_alive() and not monster.is_dying:
+                earned_score = game_manager.on_monster_killed(monster, monster.position)
+                self._log(f"{monster.monster_type} 被击败！获得 {earned_score} 分 (连击 x{game_manager.combo})")
+
+            # 移除完成死亡动画的怪物
+            if monster.is_dead_animation_done():
+                self.monsters.remove(monster)
+
+        # 检查波次完成
+        if game_manager.check_wave_complete(len(self.monsters)):
+            self._log(f"第 {game_manager.wave} 波完成！")
+
+        # 开始下一波
+        if game_manager.can_spawn_next_wave():
+            next_wave = game_manager.wave + 1
+            self.monster_spawn_queue = game_manager.start_wave(next_wave)
+            self.monster_spawn_delay = 60
+            self._log(f"\n=== 第 {next_wave} 波开始！ ==={' BOSS战！' if next_wave % 5 == 0 else ''}")
+
+    def save_previous_state(self):
+        """保存当前位置作为上一状态（每个模拟步开始前调用，渲染时在两步之间插值）"""
+        np.copyto(self.previous_positions, self.particle_system.get_positions())
+        for monster in self.monsters:
+            np.copyto(monster.previous_position, monster.position)
+
+    def interpolated_positions(self, alpha: float) -> np.ndarray:
+        """上一步和当前粒子位置之间的插值（穿过边界回绕的粒子直接用当前位置）
+
+        Args:
+            alpha: 插值比例（0为上一状态，1为当前状态）
+        """
+        current = self.particle_system.get_positions()
+        if alpha >= 1.0:
+            return current
+        delta = current - self.previous_positions
+        wrapped = (np.abs(delta) > (self.width / 2, self.height / 2)).any(axis=1)
+        delta[wrapped] = 0.0
+        return current - delta * (1.0 - alpha)
+
+    def step(self):
+        """模拟一步"""
+        self.save_previous_state()
+        self.update_particles()
+        self.update_game()
+        self.update_monsters()
+
+    def draw(self, layer: np.ndarray, particle_renderer: ParticleRenderer, alpha: float = 1.0,
+             motion_blur: Optional[MotionBlurBuffer] = None, elapsed_steps: float = 1.0):
+        """绘制粒子（含拖尾）、怪物和特效粒子
+
+        Args:
+            layer: 渲染图层
+            particle_renderer: 粒子渲染器
+            alpha: 渲染插值比例，在上一模拟步和当前状态之间插值（1为当前状态）
+            motion_blur: 运动模糊缓冲区，提供时粒子画在上面再叠加到图层
+            elapsed_steps: 距上一次绘制经过的模拟步数（运动模糊按此衰减）
+        """
+        game_manager = self.game_manager
+        particle_system = self.particle_system
+        particle_layer = layer
+        if motion_blur is not None:
+            particle_layer = motion_blur.begin(layer.shape[0], layer.shape[1], elapsed_steps)
+
+        # 应用屏幕震动偏移
+        shake_offset = game_manager.get_screen_shake_offset()
+
+        # 绘制粒子（带连击变色）
+        particle_color = Config.PARTICLE_COLOR
+        if game_manager.combo > 20:
+            particle_color = (150, 100, 255)  # 紫色
+        elif game_manager.combo > 10:
+            particle_color = (100, 150, 255)  # 橙红色
+
+        # 绘制粒子拖尾（如果启用，leader粒子不绘制）
+        if particle_system.trail_length > 0:
+            particle_renderer.draw_trails(particle_layer, particle_system.get_trails(particle_system.followers),
+                                          particle_color, shake_offset)
+
+        # 绘制粒子（核心 + 发光外圈，leader粒子不绘制）
+        particle_renderer.draw(particle_layer, self.interpolated_positions(alpha)[particle_system.followers],
+                               particle_color, shake_offset)
+        if motion_blur is not None:
+            motion_blur.composite(layer)
+
+        # 绘制怪物
+        for monster in self.monsters:
+            monster.draw(layer, alpha)
+
+        # 绘制特效粒子（击中火花和怪物死亡爆炸）
+        game_manager.effects.draw(layer)
+
+
+class GestureScript:
+    """合成手势时间线 - 无头模式下代替摄像头和手势识别
+
+    由若干片段组成，每个片段持续若干帧，字段:
+        gesture: "pointing" / "gather" / "open" / "none"
+        frames: 持续帧数
+        target: 目标位置 [x, y]（可选）
+        target_to: 片段结束时的目标位置（可选，片段内线性移动）
+        direction: 手指方向 [dx, dy]（可选）
+        palm: 手掌中心 [x, y]（可选）
+    超过总帧数后从头循环
+    """
+
+    def __init__(self, segments: List[dict]):
+        """初始化手势时间线
+
+        Args:
+            segments: 片段列表
+        """
+        if not segments:
+            raise ValueError("手势时间线至少需要一个片段")
+        self.segments = segments
+        self.ends = np.cumsum([int(segment['frames']) for segment in segments])
+        self.total_frames = int(self.ends[-1])
+
+    @classmethod
+    def load(cls, path: str) -> "GestureScript":
+        """从JSON文件加载片段列表"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def default(cls, width: int, height: int) -> "GestureScript":
+        """默认时间线：依次经过指向扫过画面、移动聚集、张开手掌、无手势"""
+        return cls([
+            {'gesture': "pointing", 'frames': 180, 'target': [width * 0.2, height * 0.5],
+             'target_to': [width * 0.8, height * 0.5], 'direction': [1.0, 0.0]},
+            {'gesture': "gather", 'frames': 120, 'target': [width * 0.7, height * 0.3],
+             'target_to': [width * 0.4, height * 0.7]},
+            {'gesture': "open", 'frames': 180, 'palm': [width * 0.5, height * 0.5]},
+            {'gesture': "none", 'frames': 120},
+        ])
+
+    def at(self, frame: int) -> Tuple[str, Optional[Tuple[int, int]], Optional[Tuple[float, float]], Optional[Tuple[int, int]]]:
+        """第frame帧的手势（格式与GestureAnalyzer.analyze的返回值一致）"""
+        frame %= self.total_frames
+        index = int(np.searchsorted(self.ends, frame, side="right"))
+        segment = self.segments[index]
+        start = self.ends[index] - int(segment['frames'])
+
+        target_position = None
+        if segment.get('target') is not None:
+            target = np.asarray(segment['target'], dtype=float)
+            if segment.get('target_to') is not None:
+                t = (frame - start) / max(1, int(segment['frames']) - 1)
+                target = target + (np.asarray(segment['target_to'], dtype=float) - target) * t
+            target_position = (int(target[0]), int(target[1]))
+        direction = segment.get('direction')
+        finger_direction = (float(direction[0]), float(direction[1])) if direction is not None else None
+        palm = segment.get('palm')
+        palm_center = (int(palm[0]), int(palm[1])) if palm is not None else None
+        return segment['gesture'], target_position, finger_direction, palm_center
+
+
+def run_headless(num_frames: int = 600, seed: int = 0, script: Optional[GestureScript] = None,
+                 render: bool = False, width: int = Config.WINDOW_WIDTH,
+                 height: int = Config.WINDOW_HEIGHT, verbose: bool = False,
+                 profile_log: Optional[str] = None) -> dict:
+    """无头模式：用脚本手势或录制的关键点尽快模拟num_frames帧，不打开摄像头和窗口
+
+    随机数种子固定，同样的参数得到同样的结果
+
+    Args:
+        num_frames: 模拟帧数
+        seed: 随机数种子
+        script: 手势时间线（GestureScript，或回放录制的LandmarkReplay），None时使用默认时间线
+        render: 是否渲染到离屏图层（计入render阶段耗时）
+        width: 画面宽度
+        height: 画面高度
+        verbose: 是否打印游戏事件
+        profile_log: 逐帧计时日志路径（.csv 或 .jsonl），None为不记录
+
+    Returns:
+        统计信息：总耗时、帧率、各阶段耗时、粒子更新的工作进程数、手势滤波处理的检测次数、最终得分和状态校验和
+    """
+    np.random.seed(seed)
+    session = GameSession(width, height, verbose=verbose)
+    workers = session.particle_system.running_workers()
+    if script is None:
+        script = GestureScript.default(width, height)
+
+    # 回放的是真实检测结果，与摄像头模式一样经过手势滤波（按录制的时间戳区分新检测和重复）；
+    # 脚本手势本身没有抖动，不滤波
+    gesture_filter = GestureFilter() if Config.GESTURE_FILTER and isinstance(script, LandmarkReplay) else None
+
+    def apply_gesture(frame: int):
+        gesture = script.at(frame)
+        if gesture_filter is not None:
+            gesture = gesture_filter.update(gesture, *script.timing_at(frame))
+        session.apply_gesture(*gesture)
+
+    stages = [("gesture", apply_gesture),
+              ("particles", lambda frame: session.update_particles()),
+              ("game", lambda frame: session.update_game()),
+              ("monsters", lambda frame: session.update_monsters())]
+    if render:
+        frame_pool = FrameBufferPool()
+        particle_renderer = ParticleRenderer()
+        motion_blur = MotionBlurBuffer() if Config.MOTION_BLUR else None
+
+        def draw(frame: int):
+            frame_pool.begin_frame()
+            session.draw(frame_pool.acquire_layer(height, width), particle_renderer, motion_blur=motion_blur)
+
+        stages.append(("render", draw))
+
+    profiler = FrameProfiler([name for name, _ in stages], window=max(1, num_frames))
+    if profile_log:
+        profiler.open_log(profile_log)
+    start = time.perf_counter_ns()
+    try:
+        for frame in range(num_frames):
+            profiler.begin_frame()
+            for name, run in stages:
+                run(frame)
+                profiler.mark(name)
+            profiler.end_frame()
+    finally:
+        profiler.close_log()
+        session.close()
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+
+    positions = session.particle_system.get_positions()
+    return {
+        'frames': num_frames,
+        'seconds': elapsed,
+        'fps': num_frames / elapsed if elapsed > 0 else 0.0,
+        'stages': profiler.get_stats(),
+        'workers': workers,
+        'filtered_detections': gesture_filter.measurements if gesture_filter is not None else 0,
+        'score': session.game_manager.score,
+        'wave': session.game_manager.wave,
+        'monsters': len(session.monsters),
+        'checksum': float(np.abs(positions).sum()),
+    }
+
+
+def print_headless_report(stats: dict):
+    """打印无头模式统计"""
+    print(f"模拟 {stats['frames']} 帧，用时 {stats['seconds']:.2f} 秒，{stats['fps']:.1f} FPS，"
+          f"粒子更新工作进程 {stats['workers']}")
+    for name, stage in stats['stages'].items():
+        print(f"  {name:<10s} 平均 {stage['mean_ms']:8.3f} ms  p50 {stage['p50_ms']:8.3f}  "
+              f"p95 {stage['p95_ms']:8.3f}  p99 {stage['p99_ms']:8.3f}  最大 {stage['max_ms']:8.3f} ms  "
+              f"合计 {stage['total_ms']:10.1f} ms")
+    if stats['filtered_detections']:
+        print(f"手势滤波处理了 {stats['filtered_detections']} 次新检测（重复的检测结果只外推）")
+    print(f"得分 {stats['score']}，波次 {stats['wave']}，场上怪物 {stats['monsters']}，"
+          f"状态校验和 {stats['checksum']:.6f}")
+
+
 def main():
     """主函数"""
     print("初始化手势控制粒子游戏...")
@@ -1301,6 +4647,7 @@ def main():
     print("  - 用粒子攻击怪物（大球），击中减血！")
     print("  - 按 'B' 切换辅助线显示")
     print("  - 按 'R' 重新开始游戏")
+    print("  - 按 'P' 切换分阶段性能统计显示")
     print("  - 按 'q'、'ESC' 或 'd' 退出")
     print()
 
@@ -1323,7 +4670,6 @@ def main():
         try:
             input()
         except:
-            import time
             time.sleep(10)
         return
 
@@ -1333,7 +4679,6 @@ def main():
     cap.set(cv2.CAP_PROP_FPS, 30)  # 设置帧率
 
     # 等待摄像头初始化
-    import time
     time.sleep(0.5)
 
     # 获取实际分辨率
@@ -1341,24 +4686,33 @@ def main():
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     print(f"摄像头分辨率: {width}x{height}")
 
+    # 摄像头采集（后台线程只保留最新一帧，主循环不再等待摄像头）
+    camera = CameraCapture(cap, width, height, threaded=Config.ASYNC_CAPTURE).start()
+    frame_interval = 1.0 / Config.TARGET_FPS if Config.ASYNC_CAPTURE else 0.0
+    next_frame_time = time.perf_counter()
+
     # 初始化手势识别
-    hand_detector = HandGestureDetector()
+    # 帧缓冲池（渲染图层、翻转和颜色转换的输出缓冲区每帧复用）
+    frame_pool = FrameBufferPool()
+
+    # 异步推理时检测器在工作线程中运行，使用自己的缓冲池
+    hand_detector = HandGestureDetector(None if Config.ASYNC_INFERENCE else frame_pool)
+    hand_tracker = HandTrackingWorker(hand_detector, threaded=Config.ASYNC_INFERENCE).start()
+    # 自适应检测：每K帧检测一次，其余帧用光流跟踪关键点
+    adaptive_tracker = AdaptiveHandTracker(hand_tracker, frame_pool) if Config.ADAPTIVE_DETECTION else None
     gesture_analyzer = GestureAnalyzer(width, height)
+    gesture_filter = GestureFilter() if Config.GESTURE_FILTER else None
 
-    # 初始化粒子系统
-    particle_system = ParticleSystem(width, height, Config.NUM_PARTICLES)
-
-    # 游戏管理器
-    game_manager = GameManager()
+    # 关键点录制（之后可用 --replay 在无头模式下回放，不需要摄像头和MediaPipe）
+    recorder = LandmarkRecorder(Config.LANDMARK_RECORD_PATH) if Config.LANDMARK_RECORD_PATH else None
 
-    # 怪物系统
-    monsters: List[Monster] = []
-    monster_spawn_queue = []  # 待生成的怪物队列
-    monster_spawn_delay = 0  # 生成延迟计时器
+    # 游戏会话（粒子系统、怪物和游戏管理器，开始第一波）
+    session = GameSession(width, height)
+    game_manager = session.game_manager
 
-    # 开始第一波
-    monster_spawn_queue = game_manager.start_wave(1)
-    monster_spawn_delay = 60  # 1秒后开始生成
+    # 粒子渲染器（运动模糊的拖影图层跨帧复用）
+    particle_renderer = ParticleRenderer()
+    motion_blur = MotionBlurBuffer() if Config.MOTION_BLUR else None
 
     print("游戏准备完成！")
     print("按 'q'、'ESC' 或 'd' 键退出...\n")
@@ -1367,6 +4721,16 @@ def main():
     prev_time = time.time()
     fps = 0
 
+    # 分阶段计时（'P'键切换叠加显示）
+    profiler = FrameProfiler(["wait", "capture", "tracking", "physics", "monsters", "render", "display"])
+    if Config.PROFILE_LOG_PATH:
+        profiler.open_log(Config.PROFILE_LOG_PATH)
+    show_profiler = False
+
+    # 固定步长调度（模拟速度与渲染帧率无关）
+    clock = FixedTimestep()
+    drawn_sim_time = 0.0  # 上一次绘制时的模拟时间（单位：步）
+
     # 辅助线显示状态
     show_helpers = True
     helper_msg_timer = 0  # 提示信息显示计时器
@@ -1374,159 +4738,89 @@ def main():
     # 主循环
     try:
         while True:
-            # 读取摄像头帧
-            ret, frame = cap.read()
+            profiler.begin_frame()
+
+            # 限制主循环帧率（异步采集时主循环不会被摄像头阻塞）
+            if frame_interval:
+                next_frame_time += frame_interval
+                delay = next_frame_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame_time = time.perf_counter()
+            profiler.mark("wait")
+
+            frame_pool.begin_frame()
+
+            # 取出最新的摄像头帧（没有新帧时沿用上一帧）
+            ret, frame = camera.read()
             if not ret:
                 print("错误：无法读取摄像头帧！")
                 break
 
             # 水平翻转画面（镜像效果）
-            frame = cv2.flip(frame, 1)
+            frame = cv2.flip(frame, 1, dst=frame_pool.get("flipped", frame.shape))
+            profiler.mark("capture")
 
-            # 创建粒子渲染层（纯黑色背景）
-            particle_layer = np.zeros((height, width, 3), dtype=np.uint8)
+            # 手部检测（只提交新帧；异步时取用最新一次结果，推理滞后不阻塞主循环）
+            if adaptive_tracker is not None:
+                hand_points = adaptive_tracker.update(frame, camera.frame_timestamp, camera.frame_is_new)
+                points_timestamp = adaptive_tracker.points_timestamp
+            else:
+                if camera.frame_is_new:
+                    hand_tracker.submit(frame, camera.frame_timestamp)
+                results = hand_tracker.get_results()
+
+                # 获取手部关键点
+                landmarks = hand_detector.get_landmarks(results)
+                hand_points = GestureAnalyzer.landmarks_to_array(landmarks) if landmarks is not None else None
+                points_timestamp = hand_tracker.results_timestamp
+            if recorder is not None and points_timestamp > 0:  # 第一次检测完成之前没有可录的结果
+                recorder.record(hand_points, points_timestamp)
+
+            # 分析手势（滤波后再交给粒子系统：去抖、迟滞，目标位置外推到当前时刻）
+            gesture = gesture_analyzer.analyze_array(hand_points)
+            if gesture_filter is not None:
+                gesture = gesture_filter.update(gesture, points_timestamp, time.perf_counter())
+            gesture_state, target_position, finger_direction, palm_center = gesture
 
-            # 手部检测
-            results = hand_detector.process_frame(frame)
+            # 根据手势更新粒子系统
+            session.apply_gesture(gesture_state, target_position, finger_direction, palm_center)
+            profiler.mark("tracking")
 
-            # 获取手部关键点
-            landmarks = hand_detector.get_landmarks(results)
+            # 按固定步长推进模拟（渲染帧率高于步频时本帧可能不推进，低于时推进多步）
+            for _ in range(clock.advance(time.perf_counter())):
+                session.save_previous_state()
 
-            # 分析手势
-            gesture_state, target_position, finger_direction, palm_center = gesture_analyzer.analyze(landmarks)
+                # 更新粒子和游戏管理器
+                session.update_particles()
+                session.update_game()
+                profiler.mark("physics")
 
-            # 根据手势更新粒子系统
-            if gesture_state == "pointing" and target_position:
-                # 食指和中指并拢 - 定向移动
-                particle_system.set_mode("pointing")
-                particle_system.set_target(target_position[0], target_position[1])
-                if finger_direction:
-                    particle_system.set_direction(finger_direction[0], finger_direction[1])
-            elif gesture_state == "gather" and target_position:
-                # 握拳/双指合并 - 聚集加速
-                particle_system.set_mode("gather")
-                particle_system.set_target(target_position[0], target_position[1])
-            elif gesture_state == "open":
-                # 手掌张开 - 圆周运动
-                particle_system.set_mode("scatter")
-                if palm_center:
-                    particle_system.set_scatter_center(palm_center[0], palm_center[1])
-            else:
-                particle_system.set_mode("free")
-                if target_position:
-                    particle_system.set_target(target_position[0], target_position[1])
-
-            # 更新粒子
-            particle_system.update()
-
-            # 更新游戏管理器
-            game_manager.update()
-
-            # === 怪物系统更新 ===
-            # 生成怪物
-            if monster_spawn_delay > 0:
-                monster_spawn_delay -= 1
-            elif len(monster_spawn_queue) > 0:
-                # 从队列中取出一个怪物生成
-                monster_data = monster_spawn_queue.pop(0)
-                new_monster = Monster(width, height,
-                                     monster_data['difficulty'],
-                                     monster_data['type'])
-                monsters.append(new_monster)
-                print(f"怪物生成: {monster_data['type']} (难度 {monster_data['difficulty']})")
-                # 间隔0.5秒生成下一个
-                monster_spawn_delay = 30
-
-            # 更新所有怪物
-            for monster in monsters[:]:  # 使用副本以便安全删除
-                monster.update(particle_system.get_particles())
-
-                # 检测碰撞
-                if not monster.is_dying:
-                    hits = monster.check_collision(particle_system.get_particles())
-                    if hits > 0:
-                        monster.take_damage(hits)
-                        game_manager.on_hit(hits)
-                        # 生成击中特效
-                        game_manager.spawn_hit_effect(monster.position, 10, (255, 200, 0))
-
-                # 检查怪物是否被击败
-                if not monster.is_alive() and not monster.is_dying:
-                    earned_score = game_manager.on_monster_killed(monster, monster.position)
-                    print(f"{monster.monster_type} 被击败！获得 {earned_score} 分 (连击 x{game_manager.combo})")
-
-                # 移除完成死亡动画的怪物
-                if monster.is_dead_animation_done():
-                    monsters.remove(monster)
-
-            # 检查波次完成
-            if game_manager.check_wave_complete(len(monsters)):
-                print(f"第 {game_manager.wave} 波完成！")
-
-            # 开始下一波
-            if game_manager.can_spawn_next_wave():
-                next_wave = game_manager.wave + 1
-                monster_spawn_queue = game_manager.start_wave(next_wave)
-                monster_spawn_delay = 60
-                print(f"\n=== 第 {next_wave} 波开始！ ==={' BOSS战！' if next_wave % 5 == 0 else ''}")
-
-            # 应用屏幕震动偏移
-            shake_offset = game_manager.get_screen_shake_offset()
-
-            # 绘制粒子（带连击变色）
-            particle_color = Config.PARTICLE_COLOR
-            if game_manager.combo > 20:
-                particle_color = (150, 100, 255)  # 紫色
-            elif game_manager.combo > 10:
-                particle_color = (100, 150, 255)  # 橙红色
-
-            for particle in particle_system.get_particles():
-                if particle.is_leader:
-                    continue  # leader粒子不绘制
-                pos = particle.get_position()
-                x, y = int(pos[0]) + shake_offset[0], int(pos[1]) + shake_offset[1]
-
-                # 绘制粒子拖尾（如果启用）
-                if Config.PARTICLE_TRAIL_LENGTH > 0 and len(particle.trail) > 1:
-                    for i in range(1, len(particle.trail)):
-                        pt1 = (int(particle.trail[i-1][0]) + shake_offset[0],
-                              int(particle.trail[i-1][1]) + shake_offset[1])
-                        pt2 = (int(particle.trail[i][0]) + shake_offset[0],
-                              int(particle.trail[i][1]) + shake_offset[1])
-                        alpha = i / len(particle.trail)
-                        color = tuple(int(c * alpha) for c in particle_color)
-                        cv2.line(particle_layer, pt1, pt2, color, 1)
-
-                # 绘制粒子
-                cv2.circle(particle_layer, (x, y), Config.PARTICLE_RADIUS,
-                          particle_color, -1)
-                # 发光效果
-                cv2.circle(particle_layer, (x, y), Config.PARTICLE_RADIUS + 2,
-                          particle_color, 1)
-
-            # 绘制怪物
-            for monster in monsters:
-                monster.draw(particle_layer)
+                # 更新怪物
+                session.update_monsters()
+                profiler.mark("monsters")
+
+            # 取出粒子渲染层（原地清零为纯黑色背景）
+            particle_layer = frame_pool.acquire_layer(height, width)
+
+            # 绘制粒子和怪物（在最近两个模拟步之间插值）
+            sim_time = clock.ticks + clock.alpha
+            session.draw(particle_layer, particle_renderer,
+                         clock.alpha if Config.RENDER_INTERPOLATION else 1.0,
+                         motion_blur, sim_time - drawn_sim_time)
+            drawn_sim_time = sim_time
 
             # 绘制手部关键点（在黑色背景上用明亮颜色）
-            if show_helpers and Config.SHOW_HAND_LANDMARKS and results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # 手动绘制关键点，使用明亮颜色
-                    for landmark in hand_landmarks.landmark:
-                        x = int(landmark.x * width)
-                        y = int(landmark.y * height)
-                        cv2.circle(particle_layer, (x, y), 3, (0, 255, 0), -1)
-
-                    # 绘制连接线
-                    connections = hand_detector.mp_hands.HAND_CONNECTIONS
-                    for connection in connections:
-                        start_idx = connection[0]
-                        end_idx = connection[1]
-                        start_point = hand_landmarks.landmark[start_idx]
-                        end_point = hand_landmarks.landmark[end_idx]
-                        start_x, start_y = int(start_point.x * width), int(start_point.y * height)
-                        end_x, end_y = int(end_point.x * width), int(end_point.y * height)
-                        cv2.line(particle_layer, (start_x, start_y), (end_x, end_y), (0, 255, 0), 2)
+            if show_helpers and Config.SHOW_HAND_LANDMARKS and hand_points is not None:
+                # 手动绘制关键点，使用明亮颜色（光流跟踪的帧也有关键点）
+                pixels = (hand_points[:, :2] * (width, height)).astype(np.int32).tolist()
+                for x, y in pixels:
+                    cv2.circle(particle_layer, (x, y), 3, (0, 255, 0), -1)
+
+                # 绘制连接线
+                for start_idx, end_idx in hand_detector.mp_hands.HAND_CONNECTIONS:
+                    cv2.line(particle_layer, tuple(pixels[start_idx]), tuple(pixels[end_idx]), (0, 255, 0), 2)
 
             # 计算FPS
             current_time = time.time()
@@ -1548,11 +4842,18 @@ def main():
                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
                 helper_msg_timer -= 1
 
+            # 分阶段性能统计
+            if show_profiler:
+                profiler.draw_overlay(particle_layer, (10, 130))
+            profiler.mark("render")
+
             # 显示画面
             cv2.imshow(Config.WINDOW_NAME, particle_layer)
 
             # 检测按键
             key = cv2.waitKey(1) & 0xFF
+            profiler.mark("display")
+            profiler.end_frame()
             if key == ord('q') or key == 27 or key == ord('d'):  # 'q'、ESC 或 'd'
                 print("退出游戏...")
                 break
@@ -1564,11 +4865,11 @@ def main():
                 print(f"最终得分: {game_manager.score}")
                 print(f"最高连击: {game_manager.max_combo}")
                 print(f"到达波次: {game_manager.wave}\n")
-                game_manager.reset_game()
-                monsters.clear()
-                monster_spawn_queue = game_manager.start_wave(1)
-                monster_spawn_delay = 60
-                particle_system = ParticleSystem(width, height, Config.NUM_PARTICLES)
+                session.restart()
+                if motion_blur is not None:
+                    motion_blur.clear()
+            elif key == ord('p') or key == ord('P'):  # 'P'键切换性能统计
+                show_profiler = not show_profiler
 
     except KeyboardInterrupt:
         print("\n程序被中断")
@@ -1576,22 +4877,93 @@ def main():
     finally:
         # 释放资源
         print("释放资源...")
+        profiler.close_log()
+        camera.stop()
         cap.release()
+        hand_tracker.stop()
         hand_detector.release()
+        session.close()
+        if recorder is not None:
+            recorder.close()
         cv2.destroyAllWindows()
         print(f"\n=== 游戏统计 ===")
         print(f"最终得分: {game_manager.score}")
         print(f"最高分: {game_manager.high_score}")
         print(f"最高连击: {game_manager.max_combo}")
         print(f"到达波次: {game_manager.wave}")
+        pool_stats = frame_pool.get_stats()
+        print(f"帧缓冲: 复用 {pool_stats['pooled_bytes'] / 1e6:.1f} MB，"
+              f"最后一帧新分配 {pool_stats['frame_allocated_bytes']} 字节")
+        capture_stats = camera.get_stats()
+        print(f"摄像头采集: {capture_stats['capture_fps']:.1f} FPS，"
+              f"共 {capture_stats['frames_captured']} 帧，丢弃 {capture_stats['frames_dropped']} 帧，"
+              f"帧龄 {capture_stats['frame_age_ms']:.1f} ms")
+        tracking_stats = hand_tracker.get_stats()
+        print(f"手部检测: 提交 {tracking_stats['frames_submitted']} 帧，检测 {tracking_stats['frames_processed']} 帧，"
+              f"跳过 {tracking_stats['frames_skipped']} 帧，推理 {tracking_stats['inference_ms']:.1f} ms，"
+              f"延迟 {tracking_stats['latency_ms']:.1f} ms")
+        if hand_detector.roi is not None:
+            roi_stats = hand_detector.get_roi_stats()
+            print(f"区域裁剪: {roi_stats['roi_ratio']:.0%} 的检测只处理手周围区域，"
+                  f"全画面 {roi_stats['full_frames']} 帧（其中区域内丢失后重新检测 {roi_stats['roi_misses']} 帧，"
+                  f"同一帧推理两次的比例 {roi_stats['double_process_ratio']:.1%}）")
+        if adaptive_tracker is not None:
+            adaptive_stats = adaptive_tracker.get_stats()
+            print(f"自适应检测: {adaptive_stats['frames']} 帧中检测 {adaptive_stats['detections']} 帧"
+                  f"（{adaptive_stats['detection_ratio']:.0%}），当前间隔 {adaptive_stats['interval']}，"
+                  f"光流跟踪误差 平均 {adaptive_stats['tracking_error_mean']:.1f} px、"
+                  f"p95 {adaptive_stats['tracking_error_p95']:.1f} px")
+        if recorder is not None:
+            print(f"关键点录制: {recorder.frames} 帧写入 {recorder.path}"
+                  + (f"，录满后丢弃 {recorder.frames_dropped} 帧" if recorder.frames_dropped else ""))
+        if gesture_filter is not None:
+            print(f"手势滤波: 检测结果 {gesture_filter.measurements} 次，手势切换 {gesture_filter.state_changes} 次，"
+                  f"滤掉抖动 {gesture_filter.suppressed_changes} 次")
+        print(f"固定步长模拟: {clock.ticks} 步（{Config.SIMULATION_HZ} Hz），"
+              f"因步数上限丢弃 {clock.dropped_time:.2f} 秒")
+        print(f"分阶段耗时（最近 {min(profiler.frame_count, profiler.window)} 帧，ms）:")
+        for name, stage in profiler.get_stats().items():
+            print(f"  {name:<10s} p50 {stage['p50_ms']:7.2f}  p95 {stage['p95_ms']:7.2f}  p99 {stage['p99_ms']:7.2f}")
         print("感谢游玩！")
 
 
 if __name__ == "__main__":
+    import argparse
     import sys
     import traceback
     import platform
 
+    multiprocessing.freeze_support()  # 打包后的可执行文件启动并行粒子工作进程时需要
+    parser = argparse.ArgumentParser(description="手势控制粒子游戏 - 万剑归宗")
+    parser.add_argument("--headless", action="store_true", help="无头模式：用脚本手势模拟，不打开摄像头和窗口")
+    parser.add_argument("--frames", type=int, help="无头模式模拟帧数（默认600，回放时默认为整段录制）")
+    parser.add_argument("--seed", type=int, default=0, help="无头模式随机数种子")
+    parser.add_argument("--script", help="无头模式手势时间线（JSON片段列表），默认使用内置时间线")
+    parser.add_argument("--record", help="把每帧的手部关键点录制到该文件（.npy）")
+    parser.add_argument("--replay", help="无头模式回放录制的关键点文件（代替手势时间线）")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="回放倍速")
+    parser.add_argument("--render", action="store_true", help="无头模式下同时渲染到离屏图层")
+    parser.add_argument("--profile-log", help="逐帧分阶段计时写入该文件（.csv 或 .jsonl）")
+    parser.add_argument("--workers", type=int, help="跟随粒子并行更新的进程数（覆盖Config.PARALLEL_WORKERS）")
+    args = parser.parse_args()
+    if args.profile_log:
+        Config.PROFILE_LOG_PATH = args.profile_log
+    if args.workers is not None:
+        Config.PARALLEL_WORKERS = args.workers
+    if args.record:
+        Config.LANDMARK_RECORD_PATH = args.record
+
+    if args.headless or args.replay:
+        if args.replay:
+            script = LandmarkReplay(args.replay, Config.WINDOW_WIDTH, Config.WINDOW_HEIGHT, args.replay_speed)
+            num_frames = args.frames if args.frames is not None else script.total_frames
+        else:
+            script = GestureScript.load(args.script) if args.script else None
+            num_frames = args.frames if args.frames is not None else 600
+        print_headless_report(run_headless(num_frames, args.seed, script, render=args.render,
+                                           profile_log=Config.PROFILE_LOG_PATH))
+        sys.exit(0)
+
     # 显示启动信息
     print("="*60)
     print("手势控制粒子游戏 - 万剑归宗")